@@ -0,0 +1,155 @@
+'''Synthetic boards for the benchmarks, built from the `pcbnew` stand-in.'''
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import random
+
+# Interaction with KiCad, or its stand-in.
+import pcbnew  # type: ignore
+
+MM = 1000000
+
+# rotations of placed footprints, the off-axis ones are picked with the given ratio
+CARDINAL_ROTATIONS = [0.0, 90.0, 180.0, -90.0]
+OFF_AXIS_ROTATIONS = [45.0, -45.0, 30.0, 15.0, 135.0, -22.5]
+
+EXTRA_FIELDS = ['LCSC', 'MPN', 'Manufacturer', 'Datasheet', 'Tolerance', 'Voltage', 'Description', 'Supplier']
+VALUES = {'R': ['10k', '4k7', '100R', '1M'], 'C': ['100n', '1u', '10u', '22p'], 'D': ['RED', 'GREEN', 'BAV99'],
+          'U': ['NE555', 'LM358', 'STM32F103C8T6'], 'J': ['CONN'], 'Q': ['BSS138', 'MMBT3904']}
+
+
+def _two_terminal(pitch, width, height, shape=pcbnew.PAD_SHAPE_ROUNDRECT):
+    return [('1', (-pitch // 2, 0), (width, height), shape), ('2', (pitch // 2, 0), (width, height), shape)]
+
+def _dual_row(count, pitch, span, width, height):
+    rows = count // 2
+    first = -(rows - 1) * pitch // 2
+    pads = [(str(i + 1), (-span // 2, first + i * pitch), (width, height), pcbnew.PAD_SHAPE_ROUNDRECT) for i in range(rows)]
+    pads += [(str(rows + i + 1), (span // 2, first + (rows - 1 - i) * pitch), (width, height), pcbnew.PAD_SHAPE_ROUNDRECT) for i in range(rows)]
+    return pads
+
+def _quad(count, pitch, span, width, height):
+    side = count // 4
+    first = -(side - 1) * pitch // 2
+    pads = []
+    for i in range(side):
+        offset = first + i * pitch
+        pads.append((str(i + 1), (-span // 2, offset), (width, height), pcbnew.PAD_SHAPE_ROUNDRECT, 0.0))
+        pads.append((str(side + i + 1), (offset, span // 2), (width, height), pcbnew.PAD_SHAPE_ROUNDRECT, 90.0))
+        pads.append((str(2 * side + i + 1), (span // 2, -offset), (width, height), pcbnew.PAD_SHAPE_ROUNDRECT, 0.0))
+        pads.append((str(3 * side + i + 1), (-offset, -span // 2), (width, height), pcbnew.PAD_SHAPE_ROUNDRECT, 90.0))
+    return pads
+
+def _pin_header(count, pitch=2540000):
+    pads = [('1', (0, 0), (1700000, 1700000), pcbnew.PAD_SHAPE_RECT, 0.0, (0, 0), (1000000, 1000000))]
+    pads += [(str(i + 1), (0, i * pitch), (1700000, 1700000), pcbnew.PAD_SHAPE_OVAL, 0.0, (0, 0), (1000000, 1000000)) for i in range(1, count)]
+    return pads
+
+def _ball_grid(rows, pitch, diameter):
+    first = -(rows - 1) * pitch // 2
+    return [('{}{}'.format(chr(ord('A') + row), column + 1), (first + column * pitch, first + row * pitch), (diameter, diameter), pcbnew.PAD_SHAPE_CIRCLE)
+            for row in range(rows) for column in range(rows)]
+
+# (library, footprint, designator prefix, attributes, pads), pads as `FOOTPRINT.AddPad` arguments without the footprint
+FOOTPRINTS = [
+    ('Resistor_SMD', 'R_0402_1005Metric', 'R', pcbnew.FP_SMD, _two_terminal(1020000, 590000, 640000)),
+    ('Resistor_SMD', 'R_0603_1608Metric', 'R', pcbnew.FP_SMD, _two_terminal(1650000, 800000, 950000)),
+    ('Capacitor_SMD', 'C_0402_1005Metric', 'C', pcbnew.FP_SMD, _two_terminal(960000, 540000, 640000)),
+    ('Capacitor_SMD', 'C_0805_2012Metric', 'C', pcbnew.FP_SMD, _two_terminal(1900000, 1000000, 1450000)),
+    ('Capacitor_SMD', 'CP_Elec_6.3x5.8', 'C', pcbnew.FP_SMD, _two_terminal(5400000, 3300000, 1600000, pcbnew.PAD_SHAPE_RECT)),
+    ('LED_SMD', 'LED_0805_2012Metric', 'D', pcbnew.FP_SMD, _two_terminal(1875000, 975000, 1400000)),
+    ('Package_TO_SOT_SMD', 'SOT-23', 'Q', pcbnew.FP_SMD,
+     [('1', (-937500, -950000), (1325000, 600000), pcbnew.PAD_SHAPE_ROUNDRECT), ('2', (-937500, 950000), (1325000, 600000), pcbnew.PAD_SHAPE_ROUNDRECT),
+      ('3', (937500, 0), (1325000, 600000), pcbnew.PAD_SHAPE_ROUNDRECT)]),
+    ('Package_SO', 'SOIC-8_3.9x4.9mm_P1.27mm', 'U', pcbnew.FP_SMD, _dual_row(8, 1270000, 4950000, 1950000, 600000)),
+    ('Package_SO', 'TSSOP-20_4.4x6.5mm_P0.65mm', 'U', pcbnew.FP_SMD, _dual_row(20, 650000, 5800000, 1500000, 400000)),
+    ('Package_QFP', 'LQFP-48_7x7mm_P0.5mm', 'U', pcbnew.FP_SMD, _quad(48, 500000, 8400000, 1500000, 300000)),
+    ('Package_QFP', 'LQFP-100_14x14mm_P0.5mm', 'U', pcbnew.FP_SMD, _quad(100, 500000, 15400000, 1500000, 300000)),
+    ('Connector_PinHeader_2.54mm', 'PinHeader_1x04_P2.54mm_Vertical', 'J', pcbnew.FP_THROUGH_HOLE, _pin_header(4)),
+    ('Connector_PinHeader_2.54mm', 'PinHeader_1x10_P2.54mm_Vertical', 'J', pcbnew.FP_THROUGH_HOLE, _pin_header(10)),
+]
+
+
+def make_board(footprints: int = 1000, off_axis_ratio: float = 0.1, bottom_ratio: float = 0.3,
+               duplicate_ratio: float = 0.02, dnp_ratio: float = 0.05, field_density: float = 2.0, center_ratio: float = 0.2,
+               seed: int = 1, filename: str = 'benchmark.kicad_pcb') -> pcbnew.BOARD:
+    '''Build a synthetic board.
+
+    Args:
+        footprints: Number of footprints
+        off_axis_ratio: Share of footprints that are not rotated by a multiple of 90 degrees
+        bottom_ratio: Share of footprints on the bottom side
+        duplicate_ratio: Share of footprints that reuse the designator of another footprint
+        dnp_ratio: Share of footprints that are marked as not populated
+        field_density: Average number of extra fields per footprint, besides reference and value
+        center_ratio: Share of SMD footprints placed by the center of their pads rather than their anchor
+        seed: Seed of the random generator, the same arguments always build the same board
+    '''
+    rnd = random.Random(seed)
+    board = pcbnew.BOARD(filename)
+    board.GetDesignSettings().SetAuxOrigin((10 * MM, 10 * MM))
+    size = max(100, int((footprints ** 0.5) * 5)) * MM
+    numbers = {}
+    designators = []
+
+    for i in range(footprints):
+        library, name, prefix, attributes, pads = rnd.choice(FOOTPRINTS)
+
+        if designators and rnd.random() < duplicate_ratio:
+            reference = rnd.choice(designators)
+        else:
+            numbers[prefix] = numbers.get(prefix, 0) + 1
+            reference = '{}{}'.format(prefix, numbers[prefix])
+            designators.append(reference)
+
+        dnp = rnd.random() < dnp_ratio
+        fields = {}
+        for _ in range(min(len(EXTRA_FIELDS), int(rnd.expovariate(1 / field_density)) if field_density > 0 else 0)):
+            field = rnd.choice(EXTRA_FIELDS)
+            fields[field] = 'C{}'.format(rnd.randrange(100000)) if field == 'LCSC' else '{} {}'.format(field, rnd.randrange(100))
+        if attributes & pcbnew.FP_SMD and rnd.random() < center_ratio:
+            fields['FT Origin'] = 'Center'
+
+        footprint = pcbnew.FOOTPRINT(reference, 'DNP' if dnp and rnd.random() < 0.5 else rnd.choice(VALUES[prefix]),
+                                     pcbnew.LIB_ID(library, name),
+                                     (rnd.randrange(size), rnd.randrange(size)),
+                                     rnd.choice(OFF_AXIS_ROTATIONS if rnd.random() < off_axis_ratio else CARDINAL_ROTATIONS),
+                                     pcbnew.B_Cu if rnd.random() < bottom_ratio else pcbnew.F_Cu,
+                                     attributes, fields, dnp)
+        for pad in pads:
+            footprint.AddPad(*pad)
+
+        board.Add(footprint)
+
+    return board
+
+def make_bga_board(footprints: int = 200, rows: int = 24, off_axis_ratio: float = 0.1, bottom_ratio: float = 0.3,
+                   seed: int = 1, filename: str = 'benchmark-bga.kicad_pcb') -> pcbnew.BOARD:
+    '''Build a synthetic board of identical ball grid arrays, all placed by the center of their pads.
+
+    Args:
+        footprints: Number of footprints
+        rows: Number of ball rows and columns of each footprint, 24 makes 576 balls
+        off_axis_ratio: Share of footprints that are not rotated by a multiple of 90 degrees
+        bottom_ratio: Share of footprints on the bottom side
+        seed: Seed of the random generator, the same arguments always build the same board
+    '''
+    rnd = random.Random(seed)
+    board = pcbnew.BOARD(filename)
+    board.GetDesignSettings().SetAuxOrigin((10 * MM, 10 * MM))
+    size = max(100, int((footprints ** 0.5) * 30)) * MM
+    balls = _ball_grid(rows, 800000, 400000)
+
+    for i in range(footprints):
+        footprint = pcbnew.FOOTPRINT('U{}'.format(i + 1), 'FPGA', pcbnew.LIB_ID('Package_BGA', 'BGA-{}_P0.8mm'.format(rows * rows)),
+                                     (rnd.randrange(size), rnd.randrange(size)),
+                                     rnd.choice(OFF_AXIS_ROTATIONS if rnd.random() < off_axis_ratio else CARDINAL_ROTATIONS),
+                                     pcbnew.B_Cu if rnd.random() < bottom_ratio else pcbnew.F_Cu,
+                                     pcbnew.FP_SMD, {'FT Origin': 'Center'})
+        for pad in balls:
+            footprint.AddPad(*pad)
+
+        board.Add(footprint)
+
+    return board
@@ -0,0 +1,70 @@
+'''Placement of center-origin footprints with and without the pad centroid cache.
+
+Builds a board of identical ball grid arrays from the `pcbnew` stand-in and measures the positions
+of all footprints, once merging the bounding boxes of every pad of every instance as without the
+cache, and once with the cache shared by all instances:
+
+    python benchmarks/centroids.py                 # 200 BGAs of 576 balls
+    python benchmarks/centroids.py -n 1000 -b 30   # 1000 BGAs of 900 balls
+'''
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import sys
+import time
+import argparse
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, 'standin'))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+# the plugin package registers itself with the editor when pcbnew is already loaded, so it goes first
+from plugins import process
+from plugins.placement import PadCentroidCache
+from plugins.utils import footprint_get_fields
+from board import make_bga_board
+
+
+class UncachedPadCentroids(PadCentroidCache):
+    '''Misses on every footprint, so every instance is measured pad by pad.'''
+    def key(self, footprint, pads):
+        return None
+
+
+def measure(board, cache, repeat):
+    '''Get the seconds of the best repeat, and the positions of the footprints.'''
+    best = None
+    footprints = [(footprint, footprint_get_fields(footprint)) for footprint in board.GetFootprints()]
+    for _ in range(repeat):
+        manager = process.ProcessManager(board)
+        manager.pad_centroids = cache()
+        start = time.perf_counter()
+        positions = [manager._get_footprint_position(footprint, fields) for footprint, fields in footprints]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, positions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog="Fabrication Toolkit Pad Centroid Benchmark",
+                                     description="Measures the placement of center-origin footprints with and without the pad centroid cache")
+    parser.add_argument("--footprints", "-n", type=int, default=200, help="Number of footprints")
+    parser.add_argument("--balls",      "-b", type=int, default=24, help="Ball rows and columns of each footprint")
+    parser.add_argument("--repeat",     "-r", type=int, default=3, help="Runs of each measurement, the best one counts")
+    args = parser.parse_args()
+
+    board = make_bga_board(args.footprints, args.balls)
+    before, expected = measure(board, UncachedPadCentroids, args.repeat)
+    after, positions = measure(board, PadCentroidCache, args.repeat)
+
+    print("{} footprints of {} pads".format(args.footprints, args.balls * args.balls))
+    print("{:<10} {:>10} {:>14}".format("cache", "seconds", "footprints/s"))
+    print("{:<10} {:>10.4f} {:>14.0f}".format("off", before, args.footprints / before))
+    print("{:<10} {:>10.4f} {:>14.0f}".format("on", after, args.footprints / after))
+    print("speedup {:.1f}x".format(before / after))
+
+    # off-axis footprints share the box measured rotated back to 0, which is off by the rounding of their pads
+    worst = max(max(abs(a[0] - b[0]), abs(a[1] - b[1])) for a, b in zip(expected, positions))
+    print("largest difference {:.1f} nm".format(worst))
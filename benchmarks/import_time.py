@@ -0,0 +1,87 @@
+'''Import time of the CLI entry point, which must not load the GUI-only modules.
+
+Imports `plugins.cli` in fresh interpreters with `-X importtime`, by default with the `pcbnew`
+stand-in so only the plugin's own import cost is measured:
+
+    python benchmarks/import_time.py               # median of 5 runs, fails if wx or webbrowser is imported
+    python benchmarks/import_time.py --max 0.5     # also fail if importing takes longer than 0.5 seconds
+    python benchmarks/import_time.py --kicad       # use the pcbnew of the KiCad installation instead
+'''
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENTRY_POINT = 'plugins.cli'
+
+# modules only the graphical mode needs
+GUI_MODULES = {'wx', 'webbrowser'}
+
+
+def measure_import(kicad: bool = False):
+    '''Import the entry point in a fresh interpreter.
+
+    Returns:
+        The total import time in seconds, and `(cumulative seconds, module)` of every imported module.
+    '''
+    paths = [os.path.dirname(BENCHMARKS_DIR)]
+    if not kicad:
+        paths.insert(0, os.path.join(BENCHMARKS_DIR, 'standin'))
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(paths + [os.environ.get('PYTHONPATH', '')]).rstrip(os.pathsep))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + ENTRY_POINT],
+                             env=env, stderr=subprocess.PIPE, universal_newlines=True)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+
+    modules = []
+    total = 0.0
+    # lines read "import time: <self us> | <cumulative us> | <indented module name>"
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(cumulative) / 1e6, name.strip()))
+        if not name.startswith('  '):
+            # only modules imported at the top level add up to the total
+            total += int(cumulative) / 1e6
+
+    return total, modules
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog="Fabrication Toolkit Import Time",
+                                     description="Measures the import time of the CLI entry point")
+    parser.add_argument("--repeat",     "-r", type=int, default=5, help="Fresh interpreters to measure, the median counts")
+    parser.add_argument("--top",        "-t", type=int, default=15, help="Number of the slowest modules listed")
+    parser.add_argument("--max",        "-m", type=float, help="Fail if the import takes longer than the given seconds", metavar="SECONDS")
+    parser.add_argument("--kicad",      "-k", action="store_true", help="Use the pcbnew of the KiCad installation instead of the stand-in")
+    args = parser.parse_args()
+
+    try:
+        runs = [measure_import(args.kicad) for _ in range(args.repeat)]
+    except RuntimeError as e:
+        parser.exit(1, "Importing {} failed: {}\n".format(ENTRY_POINT, e))
+
+    total = statistics.median(run[0] for run in runs)
+    modules = min(runs)[1]
+
+    print("Importing {} takes {:.3f} s (median of {} runs)".format(ENTRY_POINT, total, len(runs)))
+    print("{:>10}  {}".format("seconds", "module"))
+    for seconds, name in sorted(modules, reverse=True)[:args.top]:
+        print("{:>10.4f}  {}".format(seconds, name))
+
+    gui_modules = sorted(set(name for _, name in modules if name.split('.')[0] in GUI_MODULES))
+    if gui_modules:
+        print("GUI modules imported: " + ", ".join(gui_modules))
+
+    if gui_modules or (args.max is not None and total > args.max):
+        sys.exit(1)
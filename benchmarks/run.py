@@ -0,0 +1,137 @@
+'''Throughput of the production tables on synthetic boards, compared against a saved baseline.
+
+The boards are built from a pure-Python stand-in of `pcbnew`, so no KiCad installation is needed:
+
+    python benchmarks/run.py                       # 1k, 10k and 100k footprints
+    python benchmarks/run.py --save                # store the results as the baseline
+    python benchmarks/run.py -s 1000 10000         # compare against the baseline, fail on regressions
+    python benchmarks/run.py --check               # as above, and fail if there is no baseline to compare against
+'''
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, 'standin'))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+# the plugin package registers itself with the editor when pcbnew is already loaded, so it goes first
+from plugins import process
+from board import make_board
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+
+
+def bench_rotation_db(board, temp_dir, manager):
+    # the rotation database is read once per process, start from scratch like a new run does
+    process._rotation_dbs.clear()
+    manager = process.ProcessManager(board)
+    for footprint in board.GetFootprints():
+        fpid = footprint.GetFPID()
+        manager._get_transformation_from_db(str(fpid.GetLibItemName()), str(fpid.GetLibNickname()))
+
+def bench_tables(board, temp_dir, manager):
+    process.ProcessManager(board).generate_tables(temp_dir, False, False)
+
+def bench_positions(board, temp_dir, manager):
+    manager.generate_positions(temp_dir)
+
+def bench_bom(board, temp_dir, manager):
+    manager.generate_bom(temp_dir)
+
+BENCHMARKS = [
+    ('rotation_db', bench_rotation_db),
+    ('tables', bench_tables),
+    ('positions', bench_positions),
+    ('bom', bench_bom),
+]
+
+
+def run(sizes, repeat):
+    '''Measure each benchmark on each board size.
+
+    Yields:
+        The board size, benchmark name, seconds of the best repeat and footprints per second.
+    '''
+    for size in sizes:
+        board = make_board(size)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            # the tables the position and BOM files are written from
+            manager = process.ProcessManager(board)
+            manager.generate_tables(temp_dir, False, False)
+
+            for name, benchmark in BENCHMARKS:
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    benchmark(board, temp_dir, manager)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+
+                yield size, name, best, size / best if best else float('inf')
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+def compare(results, baseline, tolerance):
+    '''Get the benchmarks whose throughput dropped by more than the tolerance.'''
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, throughput in benchmarks.items():
+            expected = baseline.get(size, {}).get(name)
+            if expected and throughput < expected * (1 - tolerance):
+                regressions.append((size, name, throughput, expected))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog="Fabrication Toolkit Benchmarks",
+                                     description="Measures the throughput of the production tables on synthetic boards")
+    parser.add_argument("--sizes",      "-s", type=int, nargs="+", default=DEFAULT_SIZES, help="Footprint counts of the boards", metavar="N")
+    parser.add_argument("--repeat",     "-r", type=int, default=3, help="Runs of each benchmark, the best one counts")
+    parser.add_argument("--baseline",   "-b", type=str, default=DEFAULT_BASELINE, help="Results to compare against", metavar="FILE")
+    parser.add_argument("--tolerance",  "-t", type=float, default=0.25, help="Share of the baseline throughput a benchmark may lose before it fails")
+    parser.add_argument("--save",             action="store_true", help="Store the results as the baseline instead of comparing against it")
+    parser.add_argument("--check",            action="store_true", help="Fail if there is no baseline to compare against, e.g. in CI")
+    args = parser.parse_args()
+
+    if args.save and args.check:
+        parser.error("--save and --check are mutually exclusive")
+    if args.check and not os.path.exists(args.baseline):
+        # otherwise the results are only printed, and every regression passes
+        print("No baseline at {}, store one with --save".format(args.baseline), file=sys.stderr)
+        sys.exit(2)
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    results = {}
+    print("{:>8}  {:<12} {:>10} {:>14} {:>10}".format("size", "benchmark", "seconds", "footprints/s", "baseline"))
+    for size, name, seconds, throughput in run(args.sizes, args.repeat):
+        results.setdefault(str(size), {})[name] = throughput
+        expected = baseline.get(str(size), {}).get(name)
+        change = "{:+.0%}".format(throughput / expected - 1) if expected else "-"
+        print("{:>8}  {:<12} {:>10.4f} {:>14.0f} {:>10}".format(size, name, seconds, throughput, change))
+
+    if args.save:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(), 'results': results}, f, indent=4)
+        print("Saved baseline to " + args.baseline)
+    elif baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for size, name, throughput, expected in regressions:
+            print("Regression: {} at {} footprints, {:.0f} footprints/s instead of {:.0f}".format(name, size, throughput, expected))
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,461 @@
+'''Pure-Python stand-in for the parts of the KiCad 8 `pcbnew` module the production tables use.
+
+Boards, footprints, pads and fields behave like their KiCad counterparts as far as the plugin
+observes them: pads are stored at absolute positions and orientations, rotating a footprint
+rotates its pads around the anchor with KiCad's rounding, and pad bounding boxes follow
+`PAD::BuildEffectiveShapes`. Plotting, drilling and zone filling are not available.
+'''
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import math
+import uuid
+from typing import List
+
+_BUILD_VERSION = os.environ.get('PCBNEW_STANDIN_VERSION', '8.0.0')
+
+F_Cu = 0
+B_Cu = 31
+In1_Cu, In2_Cu, In3_Cu, In4_Cu, In5_Cu, In6_Cu, In7_Cu, In8_Cu, In9_Cu, In10_Cu, \
+    In11_Cu, In12_Cu, In13_Cu, In14_Cu, In15_Cu, In16_Cu, In17_Cu, In18_Cu, In19_Cu, In20_Cu, \
+    In21_Cu, In22_Cu, In23_Cu, In24_Cu, In25_Cu, In26_Cu, In27_Cu, In28_Cu, In29_Cu, In30_Cu = range(1, 31)
+B_Paste = 34
+F_Paste = 35
+B_SilkS = 36
+F_SilkS = 37
+B_Mask = 38
+F_Mask = 39
+Edge_Cuts = 44
+User_1 = 50
+User_2 = 51
+PCBNEW_LAYER_ID_START = 0
+PCB_LAYER_ID_COUNT = 60
+
+FP_THROUGH_HOLE = 1
+FP_SMD = 2
+FP_EXCLUDE_FROM_POS_FILES = 4
+FP_EXCLUDE_FROM_BOM = 8
+
+PAD_SHAPE_CIRCLE = 0
+PAD_SHAPE_RECT = 1
+PAD_SHAPE_OVAL = 2
+PAD_SHAPE_TRAPEZOID = 3
+PAD_SHAPE_ROUNDRECT = 4
+PAD_SHAPE_CHAMFERED_RECT = 5
+PAD_SHAPE_CUSTOM = 6
+
+DEGREES_T = 1
+
+_LAYER_NAMES = {F_Cu: 'F.Cu', B_Cu: 'B.Cu', B_Paste: 'B.Paste', F_Paste: 'F.Paste', B_SilkS: 'B.Silkscreen',
+                F_SilkS: 'F.Silkscreen', B_Mask: 'B.Mask', F_Mask: 'F.Mask', Edge_Cuts: 'Edge.Cuts',
+                User_1: 'User.1', User_2: 'User.2'}
+
+
+def GetBuildVersion() -> str:
+    return _BUILD_VERSION
+
+def FromMM(value: float) -> int:
+    return KiROUND(value * 1e6)
+
+def ToMM(value: int) -> float:
+    return value / 1e6
+
+def KiROUND(value: float) -> int:
+    # rounds half away from zero
+    return int(value - 0.5) if value < 0 else int(value + 0.5)
+
+def _normalize(degrees: float) -> float:
+    while degrees < -0.0:
+        degrees += 360.0
+    while degrees >= 360.0:
+        degrees -= 360.0
+    return degrees
+
+def _rotate(x: int, y: int, degrees: float):
+    '''Rotate a point around the origin like `RotatePoint`, exact for multiples of 90 degrees.'''
+    degrees = _normalize(degrees)
+    if degrees == 0.0:
+        return x, y
+    if degrees == 90.0:
+        return y, -x
+    if degrees == 180.0:
+        return -x, -y
+    if degrees == 270.0:
+        return -y, x
+
+    radians = degrees * (math.pi / 180.0)
+    sin, cos = math.sin(radians), math.cos(radians)
+    return KiROUND(y * sin + x * cos), KiROUND(y * cos - x * sin)
+
+
+class VECTOR2I(tuple):
+    def __new__(cls, x: int = 0, y: int = 0):
+        return tuple.__new__(cls, (int(x), int(y)))
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+
+    def __add__(self, other):
+        return VECTOR2I(self[0] + other[0], self[1] + other[1])
+
+    def __sub__(self, other):
+        return VECTOR2I(self[0] - other[0], self[1] - other[1])
+
+
+class EDA_ANGLE:
+    def __init__(self, value: float = 0.0, unit: int = DEGREES_T):
+        self.value = float(value)
+
+    def AsDegrees(self) -> float:
+        return self.value
+
+    def Normalize(self):
+        self.value = _normalize(self.value)
+        return self
+
+
+class BOX2I:
+    def __init__(self, x0: int = 0, y0: int = 0, x1: int = 0, y1: int = 0):
+        self.box = [x0, y0, x1, y1]
+
+    @classmethod
+    def from_segment(cls, start, end, width: int):
+        inflate = (width + 1) // 2
+        return cls(min(start[0], end[0]) - inflate, min(start[1], end[1]) - inflate,
+                   max(start[0], end[0]) + inflate, max(start[1], end[1]) + inflate)
+
+    def Merge(self, other: 'BOX2I'):
+        self.box = [min(self.box[0], other.box[0]), min(self.box[1], other.box[1]),
+                    max(self.box[2], other.box[2]), max(self.box[3], other.box[3])]
+        return self
+
+    def GetX(self) -> int:
+        return self.box[0]
+
+    def GetY(self) -> int:
+        return self.box[1]
+
+    def GetWidth(self) -> int:
+        return self.box[2] - self.box[0]
+
+    def GetHeight(self) -> int:
+        return self.box[3] - self.box[1]
+
+    def GetCenter(self) -> VECTOR2I:
+        return VECTOR2I(self.box[0] + (self.box[2] - self.box[0]) // 2, self.box[1] + (self.box[3] - self.box[1]) // 2)
+
+
+class KIID:
+    def __init__(self):
+        self.value = str(uuid.uuid4())
+
+    def AsString(self) -> str:
+        return self.value
+
+
+class UTF8(str):
+    pass
+
+
+class LIB_ID:
+    def __init__(self, nickname: str, name: str):
+        self.nickname = nickname
+        self.name = name
+
+    def GetLibNickname(self) -> UTF8:
+        return UTF8(self.nickname)
+
+    def GetLibItemName(self) -> UTF8:
+        return UTF8(self.name)
+
+    def Format(self) -> UTF8:
+        return UTF8('{}:{}'.format(self.nickname, self.name) if self.nickname else self.name)
+
+
+class PCB_FIELD:
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+
+    def GetName(self) -> str:
+        return self.name
+
+    def GetCanonicalName(self) -> str:
+        return self.name
+
+    def GetText(self) -> str:
+        return self.text
+
+    def SetText(self, text: str):
+        self.text = text
+
+
+class PAD:
+    '''A pad, defined by its position and orientation relative to the unrotated footprint.'''
+    def __init__(self, footprint: 'FOOTPRINT', number: str, position, size, shape: int = PAD_SHAPE_RECT,
+                 orientation: float = 0.0, offset=(0, 0), drill=(0, 0), roundrect_ratio: float = 0.25):
+        self.number = number
+        self.size = VECTOR2I(*size)
+        self.shape = shape
+        self.offset = VECTOR2I(*offset)
+        self.drill = VECTOR2I(*drill)
+        self.roundrect_ratio = roundrect_ratio
+
+        x, y = _rotate(position[0], position[1], footprint.orientation.value)
+        self.position = footprint.position + (x, y)
+        self.orientation = _normalize(orientation + footprint.orientation.value)
+
+    def GetNumber(self) -> str:
+        return self.number
+
+    def GetPosition(self) -> VECTOR2I:
+        return self.position
+
+    def GetOrientation(self) -> EDA_ANGLE:
+        return EDA_ANGLE(self.orientation)
+
+    def GetShape(self, layer: int = F_Cu) -> int:
+        return self.shape
+
+    def GetSize(self, layer: int = F_Cu) -> VECTOR2I:
+        return self.size
+
+    def GetOffset(self, layer: int = F_Cu) -> VECTOR2I:
+        return self.offset
+
+    def GetDrillSize(self) -> VECTOR2I:
+        return self.drill
+
+    def GetRoundRectCornerRadius(self, layer: int = F_Cu) -> int:
+        return KiROUND(min(self.size) * self.roundrect_ratio)
+
+    def GetBoundingBox(self) -> BOX2I:
+        x, y = self.position
+        if self.offset != (0, 0):
+            dx, dy = _rotate(self.offset[0], self.offset[1], self.orientation)
+            x, y = x + dx, y + dy
+
+        half_x, half_y = int(self.size[0] / 2), int(self.size[1] / 2)
+
+        if self.shape == PAD_SHAPE_CIRCLE or (self.shape == PAD_SHAPE_OVAL and self.size[0] == self.size[1]):
+            bbox = BOX2I(x - half_x, y - half_x, x + half_x, y + half_x)
+        elif self.shape == PAD_SHAPE_OVAL:
+            half_width = min(half_x, half_y)
+            dx, dy = _rotate(half_x - half_width, half_y - half_width, self.orientation)
+            bbox = BOX2I.from_segment((x - dx, y - dy), (x + dx, y + dy), half_width * 2)
+        else:
+            radius = self.GetRoundRectCornerRadius() if self.shape == PAD_SHAPE_ROUNDRECT else 0
+            half_x, half_y = half_x - radius, half_y - radius
+
+            if radius and half_x < 100 and half_y < 100:
+                bbox = BOX2I(x - radius, y - radius, x + radius, y + radius)
+            else:
+                corners = [_rotate(cx, cy, self.orientation) for cx, cy in ((-half_x, half_y), (half_x, half_y), (half_x, -half_y), (-half_x, -half_y))]
+                corners = [(x + cx, y + cy) for cx, cy in corners]
+                bbox = BOX2I(min(c[0] for c in corners), min(c[1] for c in corners), max(c[0] for c in corners), max(c[1] for c in corners))
+                if radius:
+                    for start, end in zip(corners, corners[1:] + corners[:1]):
+                        bbox.Merge(BOX2I.from_segment(start, end, radius * 2))
+
+        # the hole is part of the bounding box too
+        half_x, half_y = int(self.drill[0] / 2), int(self.drill[1] / 2)
+        half_width = min(half_x, half_y)
+        dx, dy = _rotate(half_x - half_width, half_y - half_width, self.orientation)
+        x, y = self.position
+        return bbox.Merge(BOX2I.from_segment((x - dx, y - dy), (x + dx, y + dy), half_width * 2))
+
+
+class FOOTPRINT:
+    def __init__(self, reference: str, value: str, fpid: LIB_ID, position, orientation: float = 0.0,
+                 layer: int = F_Cu, attributes: int = FP_SMD, fields: dict = None, dnp: bool = False):
+        self.fpid = fpid
+        self.position = VECTOR2I(*position)
+        self.orientation = EDA_ANGLE(orientation)
+        self.layer = layer
+        self.attributes = attributes
+        self.dnp = dnp
+        self.fields = [PCB_FIELD('Reference', reference), PCB_FIELD('Value', value)]
+        self.fields += [PCB_FIELD(name, text) for name, text in (fields or {}).items()]
+        self.pads: List[PAD] = []
+        self.m_Uuid = KIID()
+
+    def AddPad(self, *args, **kwargs) -> PAD:
+        '''Add a pad given relative to the unrotated footprint, see `PAD`.'''
+        pad = PAD(self, *args, **kwargs)
+        self.pads.append(pad)
+        return pad
+
+    def GetReference(self) -> str:
+        return self.fields[0].text
+
+    def SetReference(self, reference: str):
+        self.fields[0].text = reference
+
+    def GetValue(self) -> str:
+        return self.fields[1].text
+
+    def GetFPID(self) -> LIB_ID:
+        return self.fpid
+
+    def GetPosition(self) -> VECTOR2I:
+        return self.position
+
+    def GetOrientation(self) -> EDA_ANGLE:
+        return EDA_ANGLE(self.orientation.value)
+
+    def GetOrientationDegrees(self) -> float:
+        return self.orientation.value
+
+    def SetOrientation(self, angle: EDA_ANGLE):
+        self.SetOrientationDegrees(angle.AsDegrees())
+
+    def SetOrientationDegrees(self, degrees: float):
+        # like KiCad, the pads are rotated around the anchor by the change of orientation
+        change = degrees - self.orientation.value
+        for pad in self.pads:
+            x, y = _rotate(pad.position[0] - self.position[0], pad.position[1] - self.position[1], change)
+            pad.position = self.position + (x, y)
+            pad.orientation = _normalize(pad.orientation + change)
+        self.orientation = EDA_ANGLE(degrees)
+
+    def GetLayer(self) -> int:
+        return self.layer
+
+    def IsFlipped(self) -> bool:
+        return self.layer == B_Cu
+
+    def IsOnLayer(self, layer: int) -> bool:
+        return layer == self.layer
+
+    def GetAttributes(self) -> int:
+        return self.attributes
+
+    def IsDNP(self) -> bool:
+        return self.dnp
+
+    def Pads(self) -> List[PAD]:
+        return list(self.pads)
+
+    def GetFields(self) -> List[PCB_FIELD]:
+        return list(self.fields)
+
+    def GetFieldByName(self, name: str):
+        for field in self.fields:
+            if field.name == name:
+                return field
+        return None
+
+    def HasFieldByName(self, name: str) -> bool:
+        return self.GetFieldByName(name) is not None
+
+    def Duplicate(self, *args) -> 'FOOTPRINT':
+        duplicate = FOOTPRINT.__new__(FOOTPRINT)
+        duplicate.__dict__.update(self.__dict__)
+        duplicate.orientation = EDA_ANGLE(self.orientation.value)
+        duplicate.fields = [PCB_FIELD(field.name, field.text) for field in self.fields]
+        duplicate.pads = []
+        for pad in self.pads:
+            copy = PAD.__new__(PAD)
+            copy.__dict__.update(pad.__dict__)
+            duplicate.pads.append(copy)
+        duplicate.m_Uuid = KIID()
+        return duplicate
+
+
+def Cast_to_FOOTPRINT(item):
+    return item
+
+
+class BOARD_DESIGN_SETTINGS:
+    def __init__(self):
+        self.aux_origin = VECTOR2I(0, 0)
+
+    def GetAuxOrigin(self) -> VECTOR2I:
+        return self.aux_origin
+
+    def SetAuxOrigin(self, origin):
+        self.aux_origin = VECTOR2I(*origin)
+
+
+class TITLE_BLOCK:
+    def __init__(self):
+        self.title = ''
+        self.revision = ''
+        self.company = ''
+        self.date = ''
+
+    def GetTitle(self) -> str:
+        return self.title
+
+    def GetRevision(self) -> str:
+        return self.revision
+
+    def GetCompany(self) -> str:
+        return self.company
+
+    def GetDate(self) -> str:
+        return self.date
+
+    def GetComment(self, index: int) -> str:
+        return ''
+
+
+class BOARD:
+    def __init__(self, filename: str = ''):
+        self.footprints: List[FOOTPRINT] = []
+        self.design_settings = BOARD_DESIGN_SETTINGS()
+        self.title_block = TITLE_BLOCK()
+        self.filename = filename
+
+    def Add(self, footprint: FOOTPRINT):
+        self.footprints.append(footprint)
+
+    def GetFootprints(self) -> List[FOOTPRINT]:
+        return list(self.footprints)
+
+    def GetDesignSettings(self) -> BOARD_DESIGN_SETTINGS:
+        return self.design_settings
+
+    def GetTitleBlock(self) -> TITLE_BLOCK:
+        return self.title_block
+
+    def GetFileName(self) -> str:
+        return self.filename
+
+    def SetFileName(self, filename: str):
+        self.filename = filename
+
+    def Zones(self) -> list:
+        return []
+
+    def GetDrawings(self) -> list:
+        return []
+
+    def GetTracks(self) -> list:
+        return []
+
+    def IsLayerEnabled(self, layer: int) -> bool:
+        return layer in _LAYER_NAMES
+
+    def GetLayerName(self, layer: int) -> str:
+        return BOARD.GetStandardLayerName(layer)
+
+    @staticmethod
+    def GetStandardLayerName(layer: int) -> str:
+        return _LAYER_NAMES.get(layer, 'In{}.Cu'.format(layer) if F_Cu < layer < B_Cu else 'Layer{}'.format(layer))
+
+    def BuildConnectivity(self):
+        pass
+
+
+_board = None
+
+def GetBoard() -> BOARD:
+    return _board
+
+def SetBoard(board: BOARD):
+    '''Make the given board the one `GetBoard` returns, as if it was open in the editor.'''
+    global _board
+    _board = board
@@ -0,0 +1,103 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import zipfile
+import threading
+from typing import Iterable, Optional
+
+# Application definitions.
+from .config import archiveCompressionLevel
+from .utils import create_temp_file
+
+
+class ArchiveWriter:
+    '''Zip archive that files are streamed into as they are produced.
+
+    The archive is written to a temporary file next to its destination and only replaces the
+    destination once it is complete, so a failed run never leaves a truncated archive behind.
+
+    Args:
+        filename: Final path of the archive
+        compression_level: 0 stores the files, 1-9 deflates them with the given level
+    '''
+    def __init__(self, filename: str, compression_level: int = archiveCompressionLevel):
+        self.filename = filename
+        self.files = []
+        self.__lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        fd, self.__temp_file = create_temp_file(directory, suffix='.zip.tmp')
+        os.close(fd)
+
+        if compression_level:
+            self.__zip = zipfile.ZipFile(self.__temp_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=max(1, min(compression_level, 9)))
+        else:
+            self.__zip = zipfile.ZipFile(self.__temp_file, 'w', zipfile.ZIP_STORED)
+
+    def add(self, path: str, name: Optional[str] = None, remove: bool = False, compress: bool = True):
+        '''Add a file to the archive.
+
+        Args:
+            path: The file to add
+            name: Name of the file in the archive, defaults to the file name
+            remove: Delete the file once it is in the archive
+            compress: Store the file as it is, e.g. if it is an archive itself
+        '''
+        name = name or os.path.basename(path)
+
+        with self.__lock:
+            self.__zip.write(path, name, compress_type=None if compress else zipfile.ZIP_STORED)
+            self.files.append(name)
+
+        if remove:
+            os.remove(path)
+
+    def add_files(self, paths: Iterable[str], remove: bool = False):
+        '''Add several files to the archive, see `add`.'''
+        for path in paths:
+            self.add(path, remove=remove)
+
+    def close(self) -> str:
+        '''Complete the archive and move it to its final path.'''
+        with self.__lock:
+            self.__zip.close()
+        os.replace(self.__temp_file, self.filename)
+        return self.filename
+
+    def abort(self):
+        '''Discard the archive, leaving a previous archive at the final path untouched.'''
+        with self.__lock:
+            self.__zip.close()
+        if os.path.exists(self.__temp_file):
+            os.remove(self.__temp_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ArchiveFanOut:
+    '''Adds every file to several archives, e.g. the files shared by the archives of several output profiles.'''
+    def __init__(self, archives: Iterable[ArchiveWriter]):
+        self.archives = list(archives)
+
+    def add(self, path: str, name: Optional[str] = None, remove: bool = False, compress: bool = True):
+        '''Add a file to every archive, see `ArchiveWriter.add`.'''
+        for archive in self.archives:
+            archive.add(path, name, compress=compress)
+
+        if remove:
+            os.remove(path)
+
+    def add_files(self, paths: Iterable[str], remove: bool = False):
+        '''Add several files to every archive, see `add`.'''
+        for path in paths:
+            self.add(path, remove=remove)
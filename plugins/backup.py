@@ -0,0 +1,252 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import json
+import shutil
+import hashlib
+import datetime
+import itertools
+from collections import defaultdict
+from typing import List, Optional
+
+# Application definitions.
+from .config import backupKeepLast, backupKeepDays
+from .utils import create_temp_file
+
+# files stored or reused more recently are never collected, as a concurrent backup may not have written its manifest yet
+GARBAGE_GRACE_PERIOD = 60 * 60          # seconds
+
+
+def file_digest(path: str) -> str:
+    '''Get the sha256 digest of a file.'''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BackupStore:
+    '''Backups of the generated files, every distinct file is stored once.
+
+    Files are stored in `objects/`, addressed by their sha256 digest, and each backup is a
+    small manifest in `runs/` that lists the names and digests of its files. Several boards of
+    a project may share a store, retention rules apply to the runs of each board on its own.
+    '''
+    def __init__(self, root: str):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+        self.manifests = os.path.join(root, 'runs')
+
+    def backup(self, files: List[str], name: str = '', base: Optional[str] = None, **info) -> str:
+        '''Back up the given files as a new run.
+
+        Args:
+            base: Directory the files are named relative to, e.g. to keep the folders of output profiles apart,
+                the files are named by their file name if there is none
+
+        Returns:
+            The id of the run.
+        '''
+        created = datetime.datetime.now()
+        entries = []
+
+        for path in files:
+            digest = file_digest(path)
+            self.__store_object(path, digest)
+            entry_name = os.path.relpath(path, base).replace(os.sep, '/') if base is not None else os.path.basename(path)
+            entries.append({'name': entry_name, 'sha256': digest, 'size': os.path.getsize(path)})
+
+        os.makedirs(self.manifests, exist_ok=True)
+        timestamp = created.strftime('%Y-%m-%d_%H-%M-%S')
+
+        # runs of the same second get a suffix, creating the manifest exclusively keeps concurrent runs apart
+        for suffix in itertools.count():
+            run_id = '{}_{}'.format(timestamp, suffix) if suffix else timestamp
+            try:
+                f = open(self.__manifest_path(run_id), 'x', encoding='utf-8')
+                break
+            except FileExistsError:
+                continue
+
+        manifest = {'id': run_id, 'name': name, 'created': created.isoformat(timespec='seconds'), 'files': entries}
+        manifest.update(info)
+        with f:
+            json.dump(manifest, f, indent=4)
+        return run_id
+
+    def runs(self) -> List[dict]:
+        '''Get the manifests of all runs, oldest first.'''
+        runs = []
+        try:
+            names = os.listdir(self.manifests)
+        except OSError:
+            return runs
+
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.manifests, name), encoding='utf-8') as f:
+                    runs.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+
+        return sorted(runs, key=lambda run: (run['created'], run['id']))
+
+    def get_run(self, run_id: Optional[str] = None) -> dict:
+        '''Get the manifest of a run, the latest run if no id is given.'''
+        runs = self.runs()
+        if not runs:
+            raise ValueError("No backups in " + self.root)
+
+        if run_id is None:
+            return runs[-1]
+
+        for run in runs:
+            if run['id'] == run_id:
+                return run
+
+        raise ValueError("No backup '{}' in {}".format(run_id, self.root))
+
+    def restore(self, run_id: Optional[str], directory: str) -> List[str]:
+        '''Restore the files of a run into the given directory, the latest run if no id is given.
+
+        Returns:
+            The paths of the restored files.
+        '''
+        run = self.get_run(run_id)
+        os.makedirs(directory, exist_ok=True)
+
+        files = []
+        for entry in run['files']:
+            path = os.path.join(directory, entry['name'])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(self.__object_path(entry['sha256']), path)
+            if file_digest(path) != entry['sha256']:
+                raise ValueError("Backup of '{}' in run '{}' is corrupted".format(entry['name'], run['id']))
+            files.append(path)
+
+        return files
+
+    def prune(self, keep_last: int = backupKeepLast, keep_days: int = backupKeepDays, now: datetime.datetime = None) -> List[str]:
+        '''Remove runs outside of the retention rules, and the files no remaining run refers to.
+
+        Args:
+            keep_last: Keep the latest runs of each board
+            keep_days: Keep the latest run of each board for each of the given number of recent days
+
+        Returns:
+            The ids of the removed runs.
+        '''
+        now = now or datetime.datetime.now()
+        first_day = (now - datetime.timedelta(days=keep_days - 1)).date() if keep_days > 0 else None
+
+        boards = defaultdict(list)
+        for run in self.runs():
+            boards[run.get('board')].append(run)
+
+        removed = []
+        for runs in boards.values():
+            keep = set(run['id'] for run in runs[-keep_last:]) if keep_last > 0 else set()
+
+            latest_of_day = {}
+            for run in runs:
+                day = datetime.datetime.fromisoformat(run['created']).date()
+                if first_day is not None and day >= first_day:
+                    latest_of_day[day] = run['id']
+            keep.update(latest_of_day.values())
+
+            for run in runs:
+                if run['id'] not in keep:
+                    os.remove(self.__manifest_path(run['id']))
+                    removed.append(run['id'])
+
+        if removed:
+            self.collect_garbage()
+
+        return removed
+
+    def collect_garbage(self):
+        '''Remove the stored files no run refers to.'''
+        referenced = set(entry['sha256'] for run in self.runs() for entry in run['files'])
+        limit = datetime.datetime.now().timestamp() - GARBAGE_GRACE_PERIOD
+
+        for bucket in self.__listdir(self.objects):
+            for digest in self.__listdir(os.path.join(self.objects, bucket)):
+                path = os.path.join(self.objects, bucket, digest)
+                try:
+                    if digest not in referenced and os.path.getmtime(path) < limit:
+                        os.remove(path)
+                except OSError:
+                    continue
+
+    def __store_object(self, path: str, digest: str):
+        target = self.__object_path(digest)
+        if os.path.exists(target):
+            # mark the file as in use, so it isn't collected before the manifest is written
+            os.utime(target)
+            return
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temp_file = create_temp_file(os.path.dirname(target))
+        os.close(fd)
+        try:
+            shutil.copyfile(path, temp_file)
+            os.replace(temp_file, target)
+        except Exception:
+            os.remove(temp_file)
+            raise
+
+    def __object_path(self, digest: str) -> str:
+        return os.path.join(self.objects, digest[:2], digest)
+
+    def __manifest_path(self, run_id: str) -> str:
+        return os.path.join(self.manifests, run_id + '.json')
+
+    @staticmethod
+    def __listdir(path: str) -> List[str]:
+        try:
+            return os.listdir(path)
+        except OSError:
+            return []
+
+
+if __name__ == '__main__':
+    import argparse as ap
+
+    parser = ap.ArgumentParser(prog="Fabrication Toolkit Backups",
+                               description="Lists, restores and prunes the backups of the production files of a KiCAD board")
+
+    parser.add_argument("--path",               "-p",  type=str, help="Path to KiCAD board file", required=True)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List the backed up runs")
+
+    restore_parser = commands.add_parser("restore", help="Restore the files of a run into a directory")
+    restore_parser.add_argument("run",          nargs="?", help="Id of the run, defaults to the latest run")
+    restore_parser.add_argument("--output",     "-o",  type=str, help="Directory the files are restored to", required=True, metavar="DIR")
+
+    prune_parser = commands.add_parser("prune", help="Remove the runs outside of the retention rules")
+    prune_parser.add_argument("--keepLast",     "-kL", type=int, default=backupKeepLast, help="Number of latest runs kept of each board", metavar="N")
+    prune_parser.add_argument("--keepDays",     "-kD", type=int, default=backupKeepDays, help="Number of days whose latest run of each board is kept", metavar="DAYS")
+    args = parser.parse_args()
+
+    from .config import outputFolder, backupFolder
+    store = BackupStore(os.path.join(os.path.dirname(os.path.abspath(args.path)), outputFolder, backupFolder))
+
+    if args.command == "list":
+        for run in store.runs():
+            size = sum(entry['size'] for entry in run['files'])
+            print("{}  {}  {} files, {} bytes  {}".format(run['id'], run['created'], len(run['files']), size, run.get('name', '')))
+    elif args.command == "restore":
+        try:
+            for path in store.restore(args.run, args.output):
+                print(path)
+        except ValueError as e:
+            parser.exit(1, str(e) + "\n")
+    elif args.command == "prune":
+        for run_id in store.prune(args.keepLast, args.keepDays):
+            print("removed " + run_id)
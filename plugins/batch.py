@@ -0,0 +1,67 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import time
+import logging
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List
+
+from .thread import ProcessThread
+
+
+def process_board(path: str, options: dict, openBrowser: bool = False, nonInteractive: bool = True, board = None, onProgress = None,
+                  board_version = None) -> dict:
+    '''Run the production pipeline for a single board and describe the outcome.
+
+    Args:
+        board: The board loaded from the path already, e.g. kept by the export server
+        board_version: Version of the file the given board was loaded from, see `utils.get_file_version`
+        onProgress: Called with the progress in percent, -1 once the pipeline failed
+    '''
+    started = datetime.datetime.now().isoformat(timespec='seconds')
+    start_time = time.perf_counter()
+    start_cpu = time.process_time()
+
+    thread = ProcessThread(wx=None, cli=path, options=options, openBrowser=openBrowser, nonInteractive=nonInteractive,
+                           board=board, onProgress=onProgress, board_version=board_version)
+    if thread.is_alive():
+        thread.join()
+
+    return {
+        'path': path,
+        'status': 'failed' if thread.error is not None else 'ok',
+        'error': thread.error,
+        'started': started,
+        'seconds': round(time.perf_counter() - start_time, 3),
+        'cpu_seconds': round(time.process_time() - start_cpu, 3),
+        'outputs': thread.outputs,
+        'published': thread.publication.as_dict() if thread.publication is not None else None,
+    }
+
+def process_boards(paths: List[str], options: dict, workers: int = 1) -> List[dict]:
+    '''Run the production pipeline for many boards with a bounded pool of worker processes.
+
+    Every worker imports pcbnew and reads the rotation database once and then processes boards
+    one after the other. Results are returned in the order of the given paths.
+    '''
+    results = {}
+
+    # spawn fresh interpreters, as a forked copy of pcbnew is not safe to use
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(paths))), mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {executor.submit(process_board, path, options): path for path in paths}
+
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                # the worker itself died, e.g. pcbnew crashed on the board
+                results[path] = {'path': path, 'status': 'failed', 'error': repr(e), 'outputs': []}
+
+            logging.info("Fabrication Toolkit - {}: {}".format(results[path]['status'], path))
+            print("[{}/{}] {}: {}".format(len(results), len(paths), results[path]['status'], path))
+
+    return [results[path] for path in paths]
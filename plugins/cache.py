@@ -0,0 +1,135 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import time
+import shutil
+import logging
+import tempfile
+from typing import List, Optional
+
+# Application definitions.
+from .config import cacheMaxSize, cacheMaxAge, cacheRecordsFolder
+
+
+class ArtifactCache:
+    '''On-disk cache of generated files, addressed by the digest of everything they were generated from.
+
+    Every entry is a directory holding the files of a single key. Entries are published atomically
+    and their modification time tracks their last use, so eviction drops the least recently used first.
+    '''
+    def __init__(self, root: str, max_size: int = cacheMaxSize, max_age: float = cacheMaxAge):
+        self.root = root
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: Optional[str]) -> Optional[List[str]]:
+        '''Get the files of a cache entry, to be read in place.
+
+        Returns:
+            The paths of the files in the entry, or None if there is no entry for the key.
+        '''
+        entry = self.__entry_path(key) if key else None
+
+        if entry is None or not os.path.isdir(entry):
+            self.misses += 1
+            return None
+
+        try:
+            files = [os.path.join(entry, name) for name in sorted(os.listdir(entry))]
+            # mark the entry as recently used
+            os.utime(entry)
+        except OSError as e:
+            logging.debug("Fabrication Toolkit - Cache entry {} is not readable: {}".format(key, repr(e)))
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return files
+
+    def restore(self, key: Optional[str], directory: str) -> Optional[List[str]]:
+        '''Copy the files of a cache entry into the given directory.
+
+        Returns:
+            The paths of the restored files, or None if there is no entry for the key.
+        '''
+        files = self.lookup(key)
+        if files is None:
+            return None
+
+        try:
+            return [shutil.copy2(path, os.path.join(directory, os.path.basename(path))) for path in files]
+        except OSError as e:
+            logging.debug("Fabrication Toolkit - Cache entry {} is not readable: {}".format(key, repr(e)))
+            return None
+
+    def store(self, key: Optional[str], files: List[str]):
+        '''Store copies of the given files under the given key.'''
+        if not key:
+            return
+
+        entry = self.__entry_path(key)
+        if os.path.isdir(entry):
+            return
+
+        staging = None
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            staging = tempfile.mkdtemp(dir=os.path.dirname(entry))
+            for path in files:
+                shutil.copy2(path, os.path.join(staging, os.path.basename(path)))
+            os.replace(staging, entry)
+        except OSError as e:
+            # another process published the same entry first, or the cache isn't writable
+            logging.debug("Fabrication Toolkit - Cache entry {} not stored: {}".format(key, repr(e)))
+            if staging is not None:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def record_path(self, name: str) -> str:
+        '''Get the path of a record kept in the cache, which is updated in place rather than addressed by its content.'''
+        return os.path.join(self.root, cacheRecordsFolder, name)
+
+    def evict(self):
+        '''Remove entries that were not used for longer than the maximal age, then the least recently used
+        entries until the cache fits into its maximal size. Records are removed once unused for longer than the maximal age.'''
+        entries = []
+        now = time.time()
+
+        records = os.path.join(self.root, cacheRecordsFolder)
+        for name in os.listdir(records) if os.path.isdir(records) else []:
+            try:
+                if now - os.path.getmtime(os.path.join(records, name)) > self.max_age:
+                    os.remove(os.path.join(records, name))
+            except OSError:
+                continue
+
+        for bucket in self.__listdir(self.root):
+            for key in self.__listdir(os.path.join(self.root, bucket)):
+                entry = os.path.join(self.root, bucket, key)
+                try:
+                    size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                    entries.append((os.path.getmtime(entry), size, entry))
+                except OSError:
+                    continue
+
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+
+        for last_used, size, entry in entries:
+            if now - last_used <= self.max_age and total_size <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total_size -= size
+
+    def __entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    @staticmethod
+    def __listdir(path: str) -> List[str]:
+        try:
+            return [name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name))]
+        except OSError:
+            return []
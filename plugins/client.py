@@ -0,0 +1,103 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import sys
+import json
+import time
+import http.client
+import argparse as ap
+
+# Application definitions.
+from .jobs import DEFAULT_SERVER_HOST, DEFAULT_SERVER_PORT, SERVER_TOKEN_HEADER, add_job_arguments, job_options, expand_board_paths, \
+                  write_summary, read_server_token
+
+
+def request(host: str, port: int, method: str, path: str, body: dict = None, token: str = None) -> http.client.HTTPResponse:
+    '''Send a request to the export server, with its access token.
+
+    Raises:
+        RuntimeError: If the server refused the request
+    '''
+    connection = http.client.HTTPConnection(host, port)
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    headers = {SERVER_TOKEN_HEADER: token or read_server_token(port)}
+    if data:
+        headers['Content-Type'] = 'application/json'
+    connection.request(method, path, body=data, headers=headers)
+
+    response = connection.getresponse()
+    if response.status != 200:
+        raise RuntimeError(json.loads(response.read()).get('error', response.reason))
+    return response
+
+def submit(host: str, port: int, paths, options: dict, nonInteractive: bool = False, token: str = None):
+    '''Submit an export job and follow its events until it is done.
+
+    Returns:
+        The result of every board, as with `plugins.cli`.
+    '''
+    response = request(host, port, 'POST', '/jobs', {'paths': paths, 'options': options}, token)
+
+    for line in response:
+        event = json.loads(line)
+
+        if event['event'] == 'queued':
+            print("Job {} queued, {} job(s) ahead".format(event['job'], event['ahead']))
+        elif event['event'] == 'board':
+            print("[{}/{}] {}".format(event['index'] + 1, event['boards'], event['path']))
+        elif event['event'] == 'progress':
+            if not nonInteractive and event['percent'] >= 0:
+                print("\rProgress: {:5.1f}% Complete".format(event['percent']), end='', flush=True)
+        elif event['event'] == 'result':
+            result = event['result']
+            if not nonInteractive:
+                print()
+            print("{}: {}{}".format(result['status'], result['path'], " ({})".format(result['error']) if result.get('error') else ""))
+        elif event['event'] == 'done':
+            if event.get('error'):
+                raise RuntimeError(event['error'])
+            return event['results']
+
+    raise RuntimeError("The export server closed the connection before the job was done")
+
+
+if __name__ == '__main__':
+    parser = ap.ArgumentParser(prog="Fabrication Toolkit Client",
+                               description="Generates JLCPCB production files from KiCAD board files with a running `plugins.server`")
+
+    parser.add_argument("--path",               "-p",  type=str, nargs="+", help="Path(s) or glob pattern(s) of KiCAD board files")
+    add_job_arguments(parser)
+    parser.add_argument("--nonInteractive",     "-nI", action="store_true", help="Don't print the progress bar")
+    parser.add_argument("--summary",            "-s",  type=str, help="Write a JSON summary of all processed boards", metavar="FILE")
+    parser.add_argument("--host",               "-H",  type=str, default=DEFAULT_SERVER_HOST, help="Address of the export server")
+    parser.add_argument("--port",               "-P",  type=int, default=DEFAULT_SERVER_PORT, help="Port of the export server")
+    parser.add_argument("--token",              "-T",  type=str, default=os.environ.get('FABRICATION_TOOLKIT_TOKEN'),
+                        help="Access token of the export server, read from the token file the server wrote by default", metavar="TOKEN")
+    parser.add_argument("--status",                    action="store_true", help="Print the status of the export server")
+    parser.add_argument("--stop",                      action="store_true", help="Stop the export server")
+    args = parser.parse_args()
+
+    if not (args.path or args.status or args.stop):
+        parser.error("one of the arguments --path/-p --status --stop is required")
+
+    try:
+        if args.status:
+            print(json.dumps(json.loads(request(args.host, args.port, 'GET', '/status', token=args.token).read()), indent=4))
+        if args.stop:
+            request(args.host, args.port, 'POST', '/shutdown', token=args.token).read()
+        if not args.path:
+            sys.exit(0)
+
+        start_time = time.perf_counter()
+        results = submit(args.host, args.port, expand_board_paths(args.path), job_options(args), args.nonInteractive, args.token)
+    except (ConnectionRefusedError, FileNotFoundError):
+        parser.exit(1, "No export server at {}:{}, start one with `python3 -m plugins.server`\n".format(args.host, args.port))
+    except RuntimeError as e:
+        parser.exit(1, "Export failed: {}\n".format(e))
+
+    if args.summary:
+        write_summary(args.summary, results, time.perf_counter() - start_time)
+
+    sys.exit(0 if all(result['status'] == 'ok' for result in results) else 1)
@@ -6,11 +6,40 @@ netlistFileName = 'netlist.ipc'
 designatorsFileName = 'designators.csv'
 placementFileName = 'positions.csv'
 bomFileName = 'bom.csv'
+reportFileName = 'report.json'
+verificationFileName = 'verification.json'
 gerberArchiveName = 'gerbers.zip'
 outputFolder = 'production'
 bomRowLimit = 200
+archiveCompressionLevel = 6         # 0 stores the files, 1-9 deflates them
 
 optionsFileName = 'fabrication-toolkit-options.json'
+zoneFillsFileSuffix = '-zone-fills.json'   # next to the board, records the zone fills
+
+publishLockFileName = '.fabrication-toolkit.lock'
+publishLockTimeout = 10 * 60         # seconds to wait for another export into the same folder
+
+profileFolder = 'profile'
+profileTop = 20                         # functions listed for each stage
+profileSampleInterval = 0.001           # seconds between the sampled stacks
+
+backupFolder = 'backups'
+backupKeepLast = 10                     # latest runs of each board
+backupKeepDays = 30                     # days whose latest run of each board is kept
+
+serverQueueSize = 16                    # jobs waiting for the export server
+serverBoardCacheSize = 8                # boards kept loaded by the export server
+
+cacheFolder = 'fabrication-toolkit'
+cacheMaxSize = 1024 * 1024 * 1024       # bytes
+cacheMaxAge = 30 * 24 * 60 * 60         # seconds since last use
+cacheRecordsFolder = 'records'          # in the cache folder, records of the footprints of each board
+footprintRecordsFileSuffix = '-footprints.json'
+
+verifyChunkSize = 1024 * 1024           # bytes of a Gerber or drill file parsed at once
+verifyMaxErrors = 10                    # errors recorded of each file
+drillDiameterRange = (0.05, 10.0)       # mm, tools outside are reported as they may be in the wrong unit
+outlineClosureTolerance = 0.02          # mm, gap between the ends of outline segments KiCad still chains
 
 standardLayers = [ pcbnew.F_Cu, pcbnew.B_Cu,
                    pcbnew.In1_Cu, pcbnew.In2_Cu, pcbnew.In3_Cu, pcbnew.In4_Cu, pcbnew.In5_Cu,
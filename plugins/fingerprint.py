@@ -0,0 +1,492 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import re
+import json
+import hashlib
+import logging
+import itertools
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+# Interaction with KiCad.
+import pcbnew  # type: ignore
+from .utils import create_temp_file, get_plot_plan
+
+# bump whenever the way artifacts are generated changes, so stale cache entries are never reused
+FINGERPRINT_VERSION = '2'
+
+# footprint fields are formatted as top level `(property "Name" ...)` or `(fp_text ...)` children
+FIELD_PATTERN = re.compile(r'^[ \t]*\((?:property "|fp_text )', re.MULTILINE)
+LAYER_PATTERN = re.compile(r'\(layer "?([^"\s)]+)')
+
+# the fill of a zone is formatted as `(filled_polygon ...)` or `(fill_segments ...)` children, and flagged by `(fill yes ...)`
+ZONE_FILL_PATTERN = re.compile(r'^[ \t]*\((?:filled_polygon|fill_segments)\b', re.MULTILINE)
+ZONE_FILLED_PATTERN = re.compile(r'\(fill yes\b')
+
+# project files next to the board that hold rules zone fills depend on
+PROJECT_RULE_EXTENSIONS = ('.kicad_pro', '.kicad_dru')
+
+# footprint records read by this process, keyed by file name, with their modification time and key
+_footprint_records = {}
+
+
+def create_item_formatter():
+    '''Get the s-expression writer of the KiCad file format, or None if this KiCad version doesn't expose it.'''
+    for name in ('PCB_IO_KICAD_SEXPR', 'PCB_PLUGIN', 'PCB_IO'):
+        if hasattr(pcbnew, name):
+            try:
+                return getattr(pcbnew, name)()
+            except Exception:
+                continue
+    return None
+
+def format_item(formatter, item) -> str:
+    '''Format a board item exactly as it would be written to the board file.'''
+    formatter.Format(item, 0)
+    return formatter.GetStringOutput(True)
+
+def describe(obj, exclude: Iterable[str] = ()) -> str:
+    '''Describe the plain values of an object, i.e. its `m_` members and argument-less getters.'''
+    values = []
+    for name in sorted(dir(obj)):
+        if name in exclude or not (name.startswith('m_') or name.startswith('Get')):
+            continue
+
+        try:
+            value = getattr(obj, name)
+            if callable(value):
+                value = value()
+        except Exception:
+            continue
+
+        value = _plain_value(value)
+        if value is not None:
+            values.append('{}={!r}'.format(name, value))
+
+    return '\n'.join(values)
+
+def _plain_value(value):
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    # vectors, sizes & angles
+    if hasattr(value, 'x') and hasattr(value, 'y'):
+        return (_plain_value(value.x), _plain_value(value.y))
+    if hasattr(value, 'AsDegrees'):
+        return value.AsDegrees()
+    return None
+
+def split_fields(text: str):
+    '''Split a formatted footprint into its field blocks and the remaining text.'''
+    return split_blocks(text, FIELD_PATTERN)
+
+def split_blocks(text: str, pattern):
+    '''Split formatted text into the blocks that start at the matches of the pattern and the remaining text.'''
+    blocks = []
+    rest = []
+    position = 0
+
+    for match in pattern.finditer(text):
+        if match.start() < position:
+            continue
+
+        start = text.index('(', match.start())
+        end = _find_block_end(text, start)
+        rest.append(text[position:start])
+        blocks.append(text[start:end])
+        position = end
+
+    rest.append(text[position:])
+    return ''.join(rest), blocks
+
+def _find_block_end(text: str, start: int) -> int:
+    depth = 0
+    quoted = False
+    index = start
+
+    while index < len(text):
+        char = text[index]
+        if quoted:
+            if char == '\\':
+                index += 1
+            elif char == '"':
+                quoted = False
+        elif char == '"':
+            quoted = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        index += 1
+
+    return len(text)
+
+
+class BoardFingerprint:
+    '''Content digests of a board, used to key cached Gerber and drill files.
+
+    Every board item is formatted once as it would be saved to the board file, and its digest is
+    added to each layer it is on. Footprint fields only count for the layer they are on, so editing
+    e.g. a BOM field doesn't invalidate the copper layers.
+    '''
+    def __init__(self, board):
+        self.board = board
+        self.available = False
+        self.__layers: Dict[int, "hashlib._Hash"] = defaultdict(hashlib.sha256)
+        self.__drills = hashlib.sha256()
+        self.__common = None
+
+        formatter = create_item_formatter()
+        if formatter is None:
+            return
+
+        try:
+            self.__digest_board(formatter)
+            self.available = True
+        except Exception as e:
+            logging.debug("Fabrication Toolkit - Board fingerprint not available: " + repr(e))
+
+    def layer_key(self, layer_info, plot_options: str, extra_layers: Iterable[int] = ()) -> Optional[str]:
+        '''Get the cache key of a plotted layer.
+
+        Args:
+            layer_info: The plot plan entry of the layer
+            plot_options: Description of the plot options the layer is plotted with
+            extra_layers: Further layers that are plotted into the same file
+        '''
+        if not self.available:
+            return None
+
+        key = hashlib.sha256(self.__common)
+        key.update(repr(('gerber', tuple(layer_info), plot_options)).encode('utf-8'))
+        for layer in [layer_info[1]] + list(extra_layers):
+            key.update(self.__layers[layer].digest())
+        return key.hexdigest()
+
+    def drill_key(self, drill_options: str = '') -> Optional[str]:
+        '''Get the cache key of the drill files.'''
+        if not self.available:
+            return None
+
+        key = hashlib.sha256(self.__common)
+        key.update(repr(('drill', drill_options)).encode('utf-8'))
+        key.update(self.__drills.digest())
+        return key.hexdigest()
+
+    def __digest_board(self, formatter):
+        board = self.board
+        layers = {layer_info[0]: layer_info[1] for layer_info in get_plot_plan(board, active_only=False)}
+        enabled_layers = [layer_info[1] for layer_info in get_plot_plan(board)]
+
+        common = hashlib.sha256()
+        common.update(FINGERPRINT_VERSION.encode('utf-8'))
+        common.update(pcbnew.GetBuildVersion().encode('utf-8'))
+        common.update(os.path.basename(board.GetFileName()).encode('utf-8'))
+        common.update(describe(board.GetDesignSettings()).encode('utf-8'))
+        common.update(describe_title_block(board).encode('utf-8'))
+        self.__common = common.digest()
+
+        for footprint in board.GetFootprints():
+            core, fields = split_fields(format_item(formatter, footprint))
+            core = core.encode('utf-8')
+            # anything in a footprint may carry a hole
+            self.__drills.update(hashlib.sha256(core).digest())
+
+            footprint_layers = set(layer for layer in enabled_layers if footprint.IsOnLayer(layer))
+            for field in fields:
+                match = LAYER_PATTERN.search(field)
+                if match is not None and match.group(1) in layers:
+                    layer = layers[match.group(1)]
+                    footprint_layers.add(layer)
+                    self.__layers[layer].update(field.encode('utf-8'))
+
+            for layer in footprint_layers:
+                self.__layers[layer].update(core)
+
+        for items in (board.GetDrawings(), board.GetTracks(), board.Zones()):
+            for item in items:
+                text = format_item(formatter, item).encode('utf-8')
+
+                for layer in item.GetLayerSet().Seq():
+                    self.__layers[layer].update(text)
+
+                if item.GetClass() == 'PCB_VIA':
+                    self.__drills.update(text)
+                    # vias are on the copper layers only, yet untented vias open the mask
+                    self.__layers[pcbnew.F_Mask].update(text)
+                    self.__layers[pcbnew.B_Mask].update(text)
+
+
+def describe_title_block(board) -> str:
+    '''Describe the title block and project text variables, which plotted texts may refer to.'''
+    title_block = board.GetTitleBlock()
+    values = [title_block.GetTitle(), title_block.GetRevision(), title_block.GetCompany(), title_block.GetDate()]
+    values += [title_block.GetComment(index) for index in range(9)]
+
+    try:
+        text_vars = board.GetProject().GetTextVars()
+        values += sorted('{}={}'.format(key, text_vars[key]) for key in text_vars.keys())
+    except Exception:
+        pass
+
+    return '\n'.join(str(value) for value in values)
+
+
+class ZoneFingerprints:
+    '''Digests of the inputs and of the fill of every zone, so only zones with an outdated fill are refilled.
+
+    The inputs of a zone are its outline, net and settings, the items overlapping its bounding box
+    (grown by the largest clearance), the board outline, the design settings and the project rules.
+    A fill is up to date if it is the fill recorded for the same inputs, as a fill of the board file
+    is only refilled in memory and the board file keeps its former fill.
+    '''
+    def __init__(self, board):
+        self.board = board
+        self.available = False
+        self.zones = {}
+        self.inputs: Dict[str, str] = {}
+        self.fills: Dict[str, str] = {}
+        self.__overlapping = defaultdict(set)
+        self.__formatter = create_item_formatter()
+        if self.__formatter is None:
+            return
+
+        try:
+            self.__digest_board()
+            self.available = True
+        except Exception as e:
+            logging.debug("Fabrication Toolkit - Zone fingerprints not available: " + repr(e))
+
+    def outdated(self, recorded: dict) -> list:
+        '''Get the zones whose fill isn't the recorded fill of their inputs, and the zones overlapping those.'''
+        stale = set(zone_id for zone_id in self.zones
+                    if recorded.get(zone_id) != {'inputs': self.inputs[zone_id], 'fill': self.fills[zone_id]})
+
+        # a refill changes the clearances and knockouts of the overlapping zones
+        pending = list(stale)
+        while pending:
+            for zone_id in self.__overlapping[pending.pop()]:
+                if zone_id not in stale:
+                    stale.add(zone_id)
+                    pending.append(zone_id)
+
+        return [zone for zone_id, zone in self.zones.items() if zone_id in stale]
+
+    def update_fills(self, zones):
+        '''Digest the fills of the given zones again, once they are refilled.'''
+        for zone in zones:
+            self.fills[zone.m_Uuid.AsString()] = self.__split_zone(zone)[1]
+
+    def record(self) -> dict:
+        '''Get the inputs and fill of every zone, as recorded by `save_zone_fills`.'''
+        return {zone_id: {'inputs': self.inputs[zone_id], 'fill': self.fills[zone_id]} for zone_id in self.zones}
+
+    def __split_zone(self, zone):
+        settings, fills = split_blocks(format_item(self.__formatter, zone), ZONE_FILL_PATTERN)
+        # the indentation of the removed fill stays behind, it must not tell filled from unfilled zones
+        settings = ' '.join(ZONE_FILLED_PATTERN.sub('(fill', settings).split())
+        return hashlib.sha256(settings.encode('utf-8')).digest(), hashlib.sha256(''.join(fills).encode('utf-8')).hexdigest()
+
+    def __digest_board(self):
+        board = self.board
+        settings = board.GetDesignSettings()
+        margin = settings.GetBiggestClearanceValue() if hasattr(settings, 'GetBiggestClearanceValue') else 0
+
+        common = hashlib.sha256()
+        common.update(FINGERPRINT_VERSION.encode('utf-8'))
+        common.update(pcbnew.GetBuildVersion().encode('utf-8'))
+        common.update(describe(settings).encode('utf-8'))
+        for extension in PROJECT_RULE_EXTENSIONS:
+            path = os.path.splitext(board.GetFileName())[0] + extension
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    common.update(f.read())
+
+        # (bounding box, copper layers or None for all layers, digest) of every item a zone may overlap
+        items = []
+        for footprint in board.GetFootprints():
+            core, fields = split_fields(format_item(self.__formatter, footprint))
+            # only fields on copper layers are knocked out of zones
+            text = core + ''.join(field for field in fields if _field_layer(field).endswith('.Cu'))
+            items.append((_bounding_box(footprint), None, hashlib.sha256(text.encode('utf-8')).digest()))
+
+        for item in itertools.chain(board.GetDrawings(), board.GetTracks()):
+            digest = hashlib.sha256(format_item(self.__formatter, item).encode('utf-8')).digest()
+            layers = set(item.GetLayerSet().Seq())
+            if pcbnew.Edge_Cuts in layers:
+                # the board outline clips every zone
+                common.update(digest)
+            else:
+                items.append((_bounding_box(item), layers, digest))
+
+        zones = []
+        for zone in board.Zones():
+            zone_id = zone.m_Uuid.AsString()
+            digest, self.fills[zone_id] = self.__split_zone(zone)
+            self.zones[zone_id] = zone
+            zones.append((zone_id, _bounding_box(zone, margin), set(zone.GetLayerSet().Seq()), digest))
+
+        common = common.digest()
+        for zone_id, bbox, layers, digest in zones:
+            overlapping = [item_digest for item_bbox, item_layers, item_digest in items
+                           if _overlaps(bbox, item_bbox) and (item_layers is None or item_layers & layers)]
+
+            # overlapping zones knock each other out, by priority and clearance
+            for other_id, other_bbox, other_layers, other_digest in zones:
+                if other_id != zone_id and _overlaps(bbox, other_bbox) and other_layers & layers:
+                    overlapping.append(other_digest)
+                    self.__overlapping[zone_id].add(other_id)
+
+            key = hashlib.sha256(common)
+            key.update(digest)
+            for item_digest in sorted(overlapping):
+                key.update(item_digest)
+            self.inputs[zone_id] = key.hexdigest()
+
+
+def _field_layer(field: str) -> str:
+    match = LAYER_PATTERN.search(field)
+    return match.group(1) if match is not None else ''
+
+def _bounding_box(item, margin: int = 0):
+    bbox = item.GetBoundingBox()
+    return (bbox.GetX() - margin, bbox.GetY() - margin, bbox.GetX() + bbox.GetWidth() + margin, bbox.GetY() + bbox.GetHeight() + margin)
+
+def _overlaps(a, b) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+def load_zone_fills(filename: str) -> dict:
+    '''Get the recorded inputs and fill of every zone, empty if there is no record of this fingerprint version.'''
+    try:
+        with open(filename, encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(record, dict) or record.get('version') != FINGERPRINT_VERSION:
+        return {}
+    return record.get('zones', {})
+
+def save_zone_fills(filename: str, zones: dict):
+    '''Record the inputs and fill of every zone, see `ZoneFingerprints.record`.'''
+    fd, temp_file = create_temp_file(os.path.dirname(os.path.abspath(filename)))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': FINGERPRINT_VERSION, 'zones': zones}, f, indent=4)
+        os.replace(temp_file, filename)
+    except Exception:
+        os.remove(temp_file)
+        raise
+
+
+class FootprintRecords:
+    '''Position and BOM data computed for every footprint, so only changed footprints are recomputed.
+
+    A record is keyed by the KIID of the footprint and holds the digest of the footprint as it would
+    be saved to the board file, which covers its position, orientation, layer, attributes, pads and
+    fields, along with the data computed from it. Records are only valid for the same rotation
+    database and options, which make up the key of all records.
+
+    Args:
+        key: Key of the rotation database and options the records are computed with
+        records: Records loaded with `load_footprint_records`
+    '''
+    def __init__(self, key: str, records: Optional[dict] = None):
+        self.key = key
+        self.records = records or {}
+        self.formatter = create_item_formatter()
+        self.hits = 0
+        self.misses = 0
+        self.__used = {}
+
+    @property
+    def available(self) -> bool:
+        return self.formatter is not None
+
+    @property
+    def changed(self) -> bool:
+        '''Whether a footprint was added, changed or removed since the records were loaded.'''
+        return self.misses > 0 or len(self.__used) != len(self.records)
+
+    def fingerprint(self, footprint):
+        '''Get the KIID and digest of a footprint, None if it can't be fingerprinted.'''
+        if self.formatter is None:
+            return None
+
+        try:
+            uuid = footprint.m_Uuid.AsString()
+            return uuid, hashlib.sha256(format_item(self.formatter, footprint).encode('utf-8')).hexdigest()
+        except Exception as e:
+            logging.debug("Fabrication Toolkit - Footprint fingerprint not available: " + repr(e))
+            return None
+
+    def get(self, fingerprint):
+        '''Get the data recorded for a fingerprint, None if the footprint has to be recomputed.'''
+        record = self.records.get(fingerprint[0]) if fingerprint is not None else None
+        if record is None or record[0] != fingerprint[1]:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.__used[fingerprint[0]] = record
+        return record[1]
+
+    def put(self, fingerprint, data):
+        if fingerprint is not None:
+            self.__used[fingerprint[0]] = [fingerprint[1], data]
+
+    def record(self) -> dict:
+        '''Get the records of the footprints of this run, those of removed footprints are dropped.'''
+        return self.__used
+
+def load_footprint_records(filename: str, key: str) -> dict:
+    '''Get the footprint records, empty if there is no record of this fingerprint version and key.
+
+    The records are read once per process for as long as the file is unchanged, so repeated exports
+    from the editor don't read them again.
+    '''
+    try:
+        loaded = _footprint_records.get(filename)
+        mtime = os.stat(filename).st_mtime_ns
+        if loaded is None or loaded[0] != mtime:
+            with open(filename, encoding='utf-8') as f:
+                record = json.load(f)
+            if not isinstance(record, dict) or record.get('version') != FINGERPRINT_VERSION:
+                return {}
+            loaded = (mtime, record.get('key'), record.get('footprints', {}))
+            _footprint_records[filename] = loaded
+    except (OSError, ValueError):
+        return {}
+
+    return loaded[2] if loaded[1] == key else {}
+
+def touch_footprint_records(filename: str):
+    '''Mark the footprint records as recently used, so the cache doesn't evict records that are reused but not saved again.
+
+    A failure, e.g. on a read-only cache, is ignored, as the records stay usable.
+    '''
+    try:
+        os.utime(filename)
+        loaded = _footprint_records.get(filename)
+        if loaded is not None:
+            _footprint_records[filename] = (os.stat(filename).st_mtime_ns, loaded[1], loaded[2])
+    except OSError as e:
+        logging.debug("Fabrication Toolkit - Footprint records not marked as used: " + repr(e))
+
+def save_footprint_records(filename: str, key: str, footprints: dict):
+    '''Record the data computed for every footprint, see `FootprintRecords.record`.'''
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    fd, temp_file = create_temp_file(os.path.dirname(os.path.abspath(filename)))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            # compact, as there is a record for every footprint
+            json.dump({'version': FINGERPRINT_VERSION, 'key': key, 'footprints': footprints}, f, separators=(',', ':'))
+        os.replace(temp_file, filename)
+        _footprint_records[filename] = (os.stat(filename).st_mtime_ns, key, footprints)
+    except Exception:
+        os.remove(temp_file)
+        raise
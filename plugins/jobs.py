@@ -0,0 +1,146 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import glob
+import json
+import argparse as ap
+from typing import List
+
+# Application definitions.
+from .options import *
+from .variants import parse_variant_argument
+from .profiles import get_profiles
+
+# the export server, kept out of config.py as its client must not import pcbnew
+DEFAULT_SERVER_HOST = '127.0.0.1'
+DEFAULT_SERVER_PORT = 8735
+# header of the access token of the export server
+SERVER_TOKEN_HEADER = 'X-Fabrication-Toolkit-Token'
+
+
+def add_job_arguments(parser):
+    '''Add the options of an export job to a command line parser, shared by the CLI and the server client.
+
+    Options without a value are left to the defaults of config.py.
+    '''
+    parser.add_argument("--additionalLayers",   "-aL", type=str, help="Additional layers(comma-separated)", metavar="LAYERS")
+    parser.add_argument("--user1VCut",          "-u1", action="store_true", help="Set User.1 as V-Cut layer")
+    parser.add_argument("--user2AltVCut",       "-u2", action="store_true", help="Set User.2 as alternative Edge-Cut layer")
+    parser.add_argument("--autoTranslate",      "-t",  action="store_true", help="Apply automatic position/rotation translations")
+    parser.add_argument("--autoFill",           "-f",  action="store_true", help="Apply automatic fill for all zones")
+    parser.add_argument("--excludeDNP",         "-e",  action="store_true", help="Exclude DNP components from BOM")
+    parser.add_argument("--variant",            "-V",  type=_variant_argument, action="append", help="Also generate the BOM and position files of an assembly variant, "
+                                                                                                      "whose footprints matching any FIELD=PATTERN or FIELD!=PATTERN rule are not fitted", metavar="NAME:RULE[;RULE...]")
+    parser.add_argument("--fabProfile",         "-fP", type=str, action="append", help="Also generate the production files of an output profile into a subfolder of its name, "
+                                                                                                      "e.g. kicad", metavar="NAME")
+    parser.add_argument("--fabProfiles",        "-fPs",type=_profiles_file, help="JSON file defining output profiles, {NAME: {\"base\": PROFILE, SETTING: VALUE, ...}}", metavar="FILE")
+    parser.add_argument("--allActiveLayers",    "-aaL",action="store_true", help="Export all active layers instead of only commonly used ones")
+    parser.add_argument("--archiveName",        "-aN", type=str, help="Name of the generated archives", metavar="NAME")
+    parser.add_argument("--noBackup",           "-nB", action="store_true", help="Do not create backup files")
+    parser.add_argument("--keepBackups",        "-kB", type=int, help="Number of latest backups kept", metavar="N")
+    parser.add_argument("--keepDailyBackups",   "-kD", type=int, help="Number of days whose latest backup is kept", metavar="DAYS")
+    parser.add_argument("--noCache",            "-nC", action="store_true", help="Do not reuse cached Gerber and drill files")
+    parser.add_argument("--verify",             "-vf", action="store_true", help="Verify the generated Gerber and drill files, anomalies are logged and written to the verification file")
+    parser.add_argument("--strictVerify",       "-sV", action="store_true", help="Verify the generated Gerber and drill files and fail the export on errors")
+    parser.add_argument("--outlineTolerance",   "-oT", type=float, help="Gap in mm between the ends of the board outline that still closes it", metavar="MM")
+    parser.add_argument("--jobs",               "-j",  type=int, default=1, help="Number of worker processes used to plot the Gerber layers", metavar="N")
+    parser.add_argument("--compressionLevel",   "-cL", type=int, choices=range(10), help="Compression level of the archives, 0 stores the files uncompressed", metavar="LEVEL")
+    parser.add_argument("--stagingDir",         "-sD", type=str, help="Directory the Gerber and drill files are staged in, e.g. /dev/shm, instead of the output folder", metavar="DIR")
+    parser.add_argument("--report",             "-r",  action="store_true", help="Write a JSON report of the stage timings and memory use next to the outputs")
+    parser.add_argument("--profile",            "-pf", action="store_true", help="Profile every stage, write the profiles next to the outputs and print the hotspots of each stage")
+    parser.add_argument("--profileTop",         "-pT", type=int, help="Number of hotspots printed for each profiled stage", metavar="N")
+    parser.add_argument("--profileStacks",      "-pS", action="store_true", help="Also sample the call stacks of every profiled stage in the collapsed format of flame graph tools")
+
+def job_options(args) -> dict:
+    '''Get the options of an export job from the parsed command line.'''
+    options = dict()
+    options[AUTO_TRANSLATE_OPT] = args.autoTranslate
+    options[AUTO_FILL_OPT] = args.autoFill
+    options[EXCLUDE_DNP_OPT] = args.excludeDNP
+    options[EXTEND_EDGE_CUT_OPT] = args.user1VCut
+    options[ALTERNATIVE_EDGE_CUT_OPT] = args.user2AltVCut
+    options[ALL_ACTIVE_LAYERS_OPT] = args.allActiveLayers
+    options[ARCHIVE_NAME] = args.archiveName
+    options[EXTRA_LAYERS] = args.additionalLayers
+    options[BACKUP_OPT] = not args.noBackup
+    options[PLOT_JOBS_OPT] = args.jobs
+    options[CACHE_OPT] = not args.noCache
+    options[REPORT_OPT] = args.report
+    options[VERIFY_OPT] = args.verify or args.strictVerify
+    options[VERIFY_STRICT_OPT] = args.strictVerify
+    options[STAGING_DIR_OPT] = args.stagingDir
+    if args.variant:
+        options[VARIANTS_OPT] = dict(args.variant)
+    if args.fabProfile:
+        options[OUTPUT_PROFILES_OPT] = args.fabProfile
+    if args.fabProfiles:
+        options[PROFILE_DEFINITIONS_OPT] = args.fabProfiles
+    options[PROFILE_OPT] = args.profile
+    options[PROFILE_STACKS_OPT] = args.profileStacks
+
+    for key, value in ((BACKUP_KEEP_LAST_OPT, args.keepBackups), (BACKUP_KEEP_DAYS_OPT, args.keepDailyBackups),
+                       (COMPRESSION_LEVEL_OPT, args.compressionLevel), (PROFILE_TOP_OPT, args.profileTop),
+                       (OUTLINE_TOLERANCE_OPT, args.outlineTolerance)):
+        if value is not None:
+            options[key] = value
+
+    return options
+
+def _variant_argument(text: str):
+    try:
+        return parse_variant_argument(text)
+    except ValueError as e:
+        raise ap.ArgumentTypeError(str(e))
+
+def _profiles_file(filename: str):
+    try:
+        with open(filename, encoding='utf-8') as f:
+            definitions = json.load(f)
+        if not isinstance(definitions, dict) or not all(isinstance(settings, dict) for settings in definitions.values()):
+            raise ValueError("expected an object of profile objects")
+        # validate the definitions while the command line is parsed
+        get_profiles(list(definitions), definitions)
+    except (OSError, ValueError) as e:
+        raise ap.ArgumentTypeError("Invalid output profiles {}: {}".format(filename, e))
+    return definitions
+
+def server_token_file(port: int) -> str:
+    '''Get the file the export server on a port writes its access token to, readable by the current user only.'''
+    return os.path.join(os.path.expanduser('~'), '.fabrication-toolkit-server-{}.token'.format(port))
+
+def read_server_token(port: int) -> str:
+    '''Get the access token the export server on a port wrote for the current user.
+
+    Raises:
+        OSError: If the server didn't write a token, e.g. it isn't running
+    '''
+    with open(server_token_file(port), encoding='utf-8') as f:
+        return f.read().strip()
+
+def expand_board_paths(patterns: List[str]) -> List[str]:
+    '''Expand glob patterns into board paths, keeping their order and dropping duplicates.
+
+    Patterns that match nothing are kept as they are, so they are reported as failed boards.
+    '''
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches or [pattern]:
+            path = os.path.abspath(path)
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+def write_summary(filename: str, results: List[dict], seconds: float):
+    '''Write the machine-readable summary of a batch run.'''
+    summary = {
+        'boards': len(results),
+        'failed': sum(1 for result in results if result['status'] != 'ok'),
+        'seconds': round(seconds, 3),
+        'results': results,
+    }
+
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=4)
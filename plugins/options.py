@@ -9,3 +9,19 @@ OPEN_BROWSER_OPT = "OPEN BROWSER"
 ARCHIVE_NAME = "ARCHIVE_NAME"
 EXTRA_LAYERS = "EXTRA_LAYERS"
 BACKUP_OPT = "BACKUP_OPT"
+PLOT_JOBS_OPT = "PLOT_JOBS"
+CACHE_OPT = "CACHE_OPT"
+COMPRESSION_LEVEL_OPT = "COMPRESSION_LEVEL"
+REPORT_OPT = "REPORT_OPT"
+BACKUP_KEEP_LAST_OPT = "BACKUP_KEEP_LAST"
+BACKUP_KEEP_DAYS_OPT = "BACKUP_KEEP_DAYS"
+PROFILE_OPT = "PROFILE"
+PROFILE_TOP_OPT = "PROFILE_TOP"
+PROFILE_STACKS_OPT = "PROFILE_STACKS"
+STAGING_DIR_OPT = "STAGING_DIR"
+VARIANTS_OPT = "VARIANTS"
+OUTPUT_PROFILES_OPT = "OUTPUT_PROFILES"
+PROFILE_DEFINITIONS_OPT = "PROFILE_DEFINITIONS"
+VERIFY_OPT = "VERIFY_OPT"
+VERIFY_STRICT_OPT = "VERIFY_STRICT"
+OUTLINE_TOLERANCE_OPT = "OUTLINE_TOLERANCE"
@@ -0,0 +1,107 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class Stage:
+    '''A single step of the production pipeline.
+
+    Args:
+        name: Unique name of the stage
+        function: Called with the results of the finished stages, keyed by stage name
+        requires: Names of the stages whose outputs this stage consumes
+        weight: Share of the overall progress this stage accounts for
+        exclusive: Whether the stage uses pcbnew, which is not thread safe, so exclusive
+            stages never run at the same time
+    '''
+    def __init__(self, name: str, function: Callable[[dict], object], requires: Iterable[str] = (),
+                 weight: float = 1, exclusive: bool = True):
+        self.name = name
+        self.function = function
+        self.requires = tuple(requires)
+        self.weight = weight
+        self.exclusive = exclusive
+
+
+class Pipeline:
+    '''Runs a graph of stages, starting each stage as soon as the stages it requires are done.
+
+    Stages that don't depend on each other run concurrently, as far as their `exclusive` flag allows.
+    If a run report is given, every stage is measured as a stage of the report. If a profiler is
+    given, every stage is profiled on its own, so the stages run one after the other.
+    '''
+    def __init__(self, stages: List[Stage], progress: Optional[Callable[[float], None]] = None, report = None, profiler = None):
+        self.stages = stages
+        self.progress = progress
+        self.report = report
+        self.profiler = profiler
+        self.results: Dict[str, object] = {}
+        self.__board_lock = threading.Lock()
+
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate stage names in pipeline: {}".format(names))
+
+        for stage in stages:
+            for requirement in stage.requires:
+                if requirement not in names:
+                    raise ValueError("Stage '{}' requires unknown stage '{}'".format(stage.name, requirement))
+
+    def run(self) -> Dict[str, object]:
+        '''Run all stages and return their results, keyed by stage name.
+
+        The first failing stage stops the pipeline, its exception is raised once the running stages are done.
+        '''
+        pending = list(self.stages)
+        running = {}
+        total_weight = sum(stage.weight for stage in self.stages) or 1
+        done_weight = 0
+
+        # profiles would mix the stages running at the same time
+        workers = 1 if self.profiler is not None else max(len(self.stages), 1)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                # start every stage whose requirements are satisfied
+                for stage in [stage for stage in pending if all(name in self.results for name in stage.requires)]:
+                    pending.remove(stage)
+                    running[executor.submit(self.__run_stage, stage)] = stage
+
+                if not running:
+                    raise ValueError("Cyclic stage requirements in pipeline: {}".format([stage.name for stage in pending]))
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    stage = running.pop(future)
+                    error = future.exception()
+
+                    if error is not None:
+                        # let the running stages finish, but don't start any new one
+                        wait(running)
+                        raise error
+
+                    self.results[stage.name] = future.result()
+                    done_weight += stage.weight
+
+                    if self.progress is not None:
+                        self.progress(done_weight / total_weight)
+
+        return self.results
+
+    def __run_stage(self, stage: Stage):
+        if stage.exclusive:
+            with self.__board_lock:
+                return self.__measure_stage(stage)
+        else:
+            return self.__measure_stage(stage)
+
+    def __measure_stage(self, stage: Stage):
+        with self.report.measure(stage.name) if self.report is not None else nullcontext():
+            with self.profiler.profile(stage.name) if self.profiler is not None else nullcontext():
+                return stage.function(self.results)
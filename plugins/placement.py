@@ -0,0 +1,378 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import math
+from array import array
+from typing import Optional, Tuple
+
+# Interaction with KiCad.
+import pcbnew  # type: ignore
+
+# optional, the placement math falls back to plain python without it, imported on first use as importing it takes long
+_numpy = None
+
+
+class PlacementTable:
+    '''Columnar snapshot of the placement data of all footprints in the position file.
+
+    Footprints are added one by one while the board is read, the JLC placement is then computed
+    for all of them at once. With NumPy the computation is vectorized, otherwise it runs in plain
+    python. Both give exactly the same results, as every value is computed with the same sequence
+    of double operations, and the sines and cosines are computed by `math` once per distinct rotation.
+
+    The columns are arrays of doubles rather than lists of python floats, a footprint takes 73 bytes.
+    Board coordinates are whole nanometers, which doubles hold exactly.
+    '''
+    def __init__(self):
+        self.x = array('d')
+        self.y = array('d')
+        self.rotation = array('d')
+        self.bottom = array('b')
+        self.offset_x = array('d')
+        self.offset_y = array('d')
+        self.rotation_offset = array('d')
+        self.db_offset_x = array('d')
+        self.db_offset_y = array('d')
+        self.db_rotation_offset = array('d')
+
+    def __len__(self):
+        return len(self.x)
+
+    def append(self, position, rotation: float, bottom: bool, offset: Tuple[float, float], rotation_offset: float,
+               db_offset: Tuple[float, float], db_rotation_offset: float):
+        '''Add a footprint.
+
+        Args:
+            position: Position of the footprint in board units
+            rotation: Orientation of the footprint in degrees
+            bottom: Whether the footprint is placed on the bottom side
+            offset: Position offset from the footprint fields in mm
+            rotation_offset: Rotation offset from the footprint fields in degrees
+            db_offset: Position offset from the transformation database in mm
+            db_rotation_offset: Rotation offset from the transformation database in degrees
+        '''
+        self.x.append(position[0])
+        self.y.append(position[1])
+        self.rotation.append(rotation)
+        self.bottom.append(bottom)
+        self.offset_x.append(offset[0])
+        self.offset_y.append(offset[1])
+        self.rotation_offset.append(rotation_offset)
+        self.db_offset_x.append(db_offset[0])
+        self.db_offset_y.append(db_offset[1])
+        self.db_rotation_offset.append(db_rotation_offset)
+
+    def compute(self, aux_origin, auto_translate: bool, mirror_bottom: bool = True) -> Tuple[array, array, array]:
+        '''Compute the JLC placement of all footprints.
+
+        The positions are relative to the auxiliary origin in mm with the y axis pointing up, the
+        position offsets are rotated with the footprint. JLC expects the rotation as viewed from
+        above the component, so it is inverted for the bottom side unless `mirror_bottom` is off.
+
+        Returns:
+            The arrays of x and y positions and rotations.
+        '''
+        if len(self) == 0:
+            return array('d'), array('d'), array('d')
+
+        numpy = _import_numpy()
+        if numpy is not None:
+            return self.__compute_vectorized(numpy, aux_origin, auto_translate, mirror_bottom)
+        return self.__compute(aux_origin, auto_translate, mirror_bottom)
+
+    def __compute_vectorized(self, numpy, aux_origin, auto_translate, mirror_bottom):
+        x = numpy.array(self.x, dtype=numpy.float64)
+        y = numpy.array(self.y, dtype=numpy.float64)
+        rotation = numpy.array(self.rotation, dtype=numpy.float64)
+        bottom = numpy.array(self.bottom, dtype=bool)
+        offset_x = numpy.array(self.offset_x, dtype=numpy.float64)
+        offset_y = numpy.array(self.offset_y, dtype=numpy.float64)
+
+        mid_x = (x - aux_origin[0]) / 1000000.0
+        mid_y = (y - aux_origin[1]) * -1.0 / 1000000.0
+
+        if auto_translate:
+            offset_x = offset_x + numpy.array(self.db_offset_x, dtype=numpy.float64)
+            offset_y = offset_y + numpy.array(self.db_offset_y, dtype=numpy.float64)
+
+        # sine & cosine of each distinct rotation, told apart by their bits to keep the sign of zero
+        angles, inverse = numpy.unique(rotation.view(numpy.int64), return_inverse=True)
+        angles = angles.view(numpy.float64).tolist()
+        rsin = numpy.array([math.sin(angle / 180 * math.pi) for angle in angles])[inverse]
+        rcos = numpy.array([math.cos(angle / 180 * math.pi) for angle in angles])[inverse]
+
+        rotated_x = numpy.where(bottom, offset_x * rcos + offset_y * rsin, offset_x * rcos - offset_y * rsin)
+        rotated_y = numpy.where(bottom, offset_x * rsin - offset_y * rcos, offset_x * rsin + offset_y * rcos)
+
+        # the offsets used to be summed up starting from 0, which turns -0.0 into 0.0
+        mid_x = (0.0 + mid_x) + rotated_x
+        mid_y = (0.0 + mid_y) + rotated_y
+
+        if mirror_bottom:
+            rotation = numpy.where(bottom, 180.0 - rotation, rotation)
+        if auto_translate:
+            rotation = rotation + numpy.array(self.db_rotation_offset, dtype=numpy.float64)
+        rotation = numpy.remainder(rotation + numpy.array(self.rotation_offset, dtype=numpy.float64), 360.0)
+
+        return array('d', mid_x.tobytes()), array('d', mid_y.tobytes()), array('d', rotation.tobytes())
+
+    def __compute(self, aux_origin, auto_translate, mirror_bottom):
+        mid_xs, mid_ys, rotations = array('d'), array('d'), array('d')
+        trigonometry = {}
+
+        for i in range(len(self)):
+            mid_x = (self.x[i] - aux_origin[0]) / 1000000.0
+            mid_y = (self.y[i] - aux_origin[1]) * -1.0 / 1000000.0
+            rotation = float(self.rotation[i])
+
+            offset_x, offset_y = float(self.offset_x[i]), float(self.offset_y[i])
+            if auto_translate:
+                offset_x, offset_y = offset_x + self.db_offset_x[i], offset_y + self.db_offset_y[i]
+
+            key = (rotation, math.copysign(1.0, rotation))
+            if key not in trigonometry:
+                trigonometry[key] = (math.sin(rotation / 180 * math.pi), math.cos(rotation / 180 * math.pi))
+            rsin, rcos = trigonometry[key]
+
+            if self.bottom[i]:
+                rotated = (offset_x * rcos + offset_y * rsin, offset_x * rsin - offset_y * rcos)
+                if mirror_bottom:
+                    rotation = 180.0 - rotation
+            else:
+                rotated = (offset_x * rcos - offset_y * rsin, offset_x * rsin + offset_y * rcos)
+
+            if auto_translate:
+                rotation += self.db_rotation_offset[i]
+
+            mid_xs.append((0.0 + mid_x) + rotated[0])
+            mid_ys.append((0.0 + mid_y) + rotated[1])
+            rotations.append((rotation + self.rotation_offset[i]) % 360.0)
+
+        return mid_xs, mid_ys, rotations
+
+
+def _import_numpy():
+    '''Get NumPy, imported the first time the placement is computed, None if it isn't installed.'''
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+class PadCentroidCache:
+    '''Bounding boxes of the pads around the footprint anchor, shared by all instances of a footprint.
+
+    An entry is keyed by the footprint definition, its side and its pad count, which are read with
+    three calls, so a hit costs far less than merging the bounding boxes of every pad. The box is
+    stored as if the footprint was not rotated and turned with `rotate_point` for each instance, so
+    instances in any orientation share it. Boxes are turned by multiples of 90 degrees only, which is
+    exact, off-axis footprints are measured rotated back to 0. Those boxes are off by the rounding of
+    the rotated pad positions, so they are only shared between off-axis footprints, and replaced by
+    the first box measured on a footprint rotated by a multiple of 90 degrees. Pads edited on a single
+    instance of a footprint, without changing the pad count, aren't told apart.
+    '''
+    def __init__(self):
+        self.boxes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, footprint, pads):
+        '''Get the cache key of a footprint, or None if it can't be described.'''
+        try:
+            return (str(footprint.GetFPID().Format()), footprint.GetLayer(), len(pads))
+        except (AttributeError, TypeError):
+            return None
+
+    def get(self, key, orientation: float = 0.0, exact: bool = True) -> Optional[Tuple[int, int]]:
+        '''Get the offset of the pad centroid from the anchor of a footprint with the given orientation, None on a miss.
+
+        Args:
+            key: Key of the footprint, see `key`
+            orientation: Orientation of the footprint in degrees, a multiple of 90
+            exact: Whether only a box measured on a footprint rotated by a multiple of 90 degrees will do
+        '''
+        entry = self.boxes.get(key) if key is not None else None
+        if entry is None or (exact and not entry[1]):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return bounding_box_center(rotate_box(entry[0], orientation))
+
+    def put(self, key, box: Tuple[int, int, int, int], orientation: float = 0.0, exact: bool = True):
+        '''Store the bounding box of the pads, relative to the anchor of a footprint with the given orientation.'''
+        if key is not None:
+            self.boxes[key] = (rotate_box(box, -orientation), exact)
+
+
+""" Pad geometry """
+
+# the helpers below mirror the KiCad sources, so the boxes match those KiCad computes to the nanometer:
+#   ki_round              KiROUND in libs/kimath/include/math/util.h
+#   normalize_angle       EDA_ANGLE::Normalize in libs/kimath/include/geometry/eda_angle.h
+#   rotate_point          RotatePoint in libs/kimath/src/trigo.cpp
+#   _pad_bounding_box     PAD::BuildEffectiveShapes in pcbnew/pad.cpp, with the bounding boxes of
+#                         SHAPE_CIRCLE, SHAPE_SEGMENT and SHAPE_SIMPLE in libs/kimath/include/geometry
+#   bounding_box_center   BOX2I::GetCenter in libs/kimath/include/math/box2.h
+
+# pad shapes whose bounding box is computed analytically, the rectangle shape was renamed in KiCad 9
+PAD_SHAPE_CIRCLE = getattr(pcbnew, 'PAD_SHAPE_CIRCLE', None)
+PAD_SHAPE_OVAL = getattr(pcbnew, 'PAD_SHAPE_OVAL', None)
+PAD_SHAPE_RECT = getattr(pcbnew, 'PAD_SHAPE_RECTANGLE', getattr(pcbnew, 'PAD_SHAPE_RECT', None))
+PAD_SHAPE_ROUNDRECT = getattr(pcbnew, 'PAD_SHAPE_ROUNDRECT', None)
+MODELLED_PAD_SHAPES = tuple(shape for shape in (PAD_SHAPE_CIRCLE, PAD_SHAPE_OVAL, PAD_SHAPE_RECT, PAD_SHAPE_ROUNDRECT) if shape is not None)
+
+# rounded rectangles whose straight edges are shorter than this are treated as circles by KiCad,
+# see the ROUNDRECT_MIN_LENGTH check of PAD::BuildEffectiveShapes in pcbnew/pad.cpp
+ROUNDRECT_MIN_LENGTH = 100
+
+
+def ki_round(value: float) -> int:
+    '''Round half away from zero, as KiCad's KiROUND.'''
+    return int(value - 0.5) if value < 0 else int(value + 0.5)
+
+def normalize_angle(degrees: float) -> float:
+    '''Normalize an angle into [0, 360), as KiCad's EDA_ANGLE::Normalize.'''
+    while degrees < -0.0:
+        degrees += 360.0
+    while degrees >= 360.0:
+        degrees -= 360.0
+    return degrees
+
+def rotate_point(x: int, y: int, degrees: float) -> Tuple[int, int]:
+    '''Rotate a point around the origin exactly as KiCad's RotatePoint, including its rounding.'''
+    degrees = normalize_angle(degrees)
+
+    if degrees == 0.0:
+        return x, y
+    if degrees == 90.0:
+        return y, -x
+    if degrees == 180.0:
+        return -x, -y
+    if degrees == 270.0:
+        return -y, x
+
+    radians = degrees * (math.pi / 180.0)
+    rsin = math.sin(radians)
+    rcos = math.cos(radians)
+    return ki_round(y * rsin + x * rcos), ki_round(y * rcos - x * rsin)
+
+def unrotated_pads_bounding_box(footprint) -> Optional[Tuple[int, int, int, int]]:
+    '''Get the bounding box of the pads of a footprint, as if the footprint was rotated to 0 degrees.
+
+    The pads are moved and rotated back arithmetically, exactly as KiCad does when the orientation
+    of a footprint is set, and their boxes are computed from the effective pad shapes KiCad builds.
+    This is supported for circular, oval, rectangular and rounded rectangular pads. For any other
+    pad, e.g. custom, chamfered or trapezoid pads, or KiCad versions without angle objects, None is
+    returned and the caller has to measure `GetBoundingBox()` of a copy rotated to 0 degrees instead.
+
+    Returns:
+        The bounding box as (left, top, right, bottom), or None if it can't be computed this way.
+    '''
+    orientation = footprint.GetOrientation()
+    if not hasattr(orientation, 'AsDegrees'):
+        return None
+
+    angle_change = -orientation.AsDegrees()
+    origin = footprint.GetPosition()
+    bbox = None
+
+    try:
+        pads = footprint.Pads()
+        if not all(_is_modelled_pad(pad) for pad in pads):
+            return None
+
+        for pad in pads:
+            position = pad.GetPosition()
+            x, y = rotate_point(position[0] - origin[0], position[1] - origin[1], angle_change)
+            pad_box = _pad_bounding_box(pad, (origin[0] + x, origin[1] + y), normalize_angle(pad.GetOrientation().AsDegrees() + angle_change))
+
+            if pad_box is None:
+                return None
+
+            if bbox is None:
+                bbox = pad_box
+            else:
+                bbox = (min(bbox[0], pad_box[0]), min(bbox[1], pad_box[1]), max(bbox[2], pad_box[2]), max(bbox[3], pad_box[3]))
+    except (AttributeError, TypeError):
+        # e.g. pad stacks, whose getters require a layer
+        return None
+
+    return bbox
+
+def rotate_box(bbox: Tuple[int, int, int, int], degrees: float) -> Tuple[int, int, int, int]:
+    '''Rotate a bounding box around the origin, exact for multiples of 90 degrees.'''
+    x0, y0 = rotate_point(bbox[0], bbox[1], degrees)
+    x1, y1 = rotate_point(bbox[2], bbox[3], degrees)
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+def bounding_box_center(bbox: Tuple[int, int, int, int]) -> Tuple[int, int]:
+    '''Get the center of a bounding box, as KiCad's BOX2I::GetCenter.'''
+    return bbox[0] + (bbox[2] - bbox[0]) // 2, bbox[1] + (bbox[3] - bbox[1]) // 2
+
+def _is_modelled_pad(pad) -> bool:
+    if pad.GetShape() not in MODELLED_PAD_SHAPES:
+        return False
+
+    # a rectangle with a delta is drawn as a trapezoid
+    delta = pad.GetDelta() if hasattr(pad, 'GetDelta') else (0, 0)
+    return delta[0] == 0 and delta[1] == 0
+
+def _pad_bounding_box(pad, position, orientation):
+    shape = pad.GetShape()
+    size = pad.GetSize()
+    half_x, half_y = int(size[0] / 2), int(size[1] / 2)
+
+    # the copper is moved by the rotated offset of the pad
+    offset = pad.GetOffset()
+    if offset[0] == 0 and offset[1] == 0:
+        shape_x, shape_y = position
+    else:
+        offset_x, offset_y = rotate_point(offset[0], offset[1], orientation)
+        shape_x, shape_y = position[0] + offset_x, position[1] + offset_y
+
+    if shape == PAD_SHAPE_CIRCLE or (shape == PAD_SHAPE_OVAL and size[0] == size[1]):
+        box = (shape_x - half_x, shape_y - half_x, shape_x + half_x, shape_y + half_x)
+    elif shape == PAD_SHAPE_OVAL:
+        # a segment of the width of the smaller side
+        half_width = min(half_x, half_y)
+        length_x, length_y = rotate_point(half_x - half_width, half_y - half_width, orientation)
+        box = _segment_bounding_box((shape_x - length_x, shape_y - length_y), (shape_x + length_x, shape_y + length_y), half_width * 2)
+    elif shape in (PAD_SHAPE_RECT, PAD_SHAPE_ROUNDRECT):
+        radius = pad.GetRoundRectCornerRadius() if shape == PAD_SHAPE_ROUNDRECT else 0
+
+        if radius:
+            half_x, half_y = half_x - radius, half_y - radius
+            if half_x < ROUNDRECT_MIN_LENGTH and half_y < ROUNDRECT_MIN_LENGTH:
+                return _merge_hole(pad, position, orientation, (shape_x - radius, shape_y - radius, shape_x + radius, shape_y + radius))
+
+        corners = [rotate_point(x, y, orientation) for x, y in ((-half_x, half_y), (half_x, half_y), (half_x, -half_y), (-half_x, -half_y))]
+        xs = [shape_x + x for x, _ in corners]
+        ys = [shape_y + y for _, y in corners]
+        # the rounded corners are segments along the edges, as wide as the corner diameter
+        margin = (radius * 2 + 1) // 2 if radius else 0
+        box = (min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin)
+    else:
+        return None
+
+    return _merge_hole(pad, position, orientation, box)
+
+def _merge_hole(pad, position, orientation, box):
+    # the hole is a segment centered on the pad position, a point for pads without a hole
+    drill = pad.GetDrillSize()
+    half_x, half_y = int(drill[0] / 2), int(drill[1] / 2)
+    half_width = min(half_x, half_y)
+    length_x, length_y = rotate_point(half_x - half_width, half_y - half_width, orientation)
+    hole = _segment_bounding_box((position[0] - length_x, position[1] - length_y), (position[0] + length_x, position[1] + length_y), half_width * 2)
+
+    return (min(box[0], hole[0]), min(box[1], hole[1]), max(box[2], hole[2]), max(box[3], hole[3]))
+
+def _segment_bounding_box(start, end, width):
+    margin = (width + 1) // 2
+    return (min(start[0], end[0]) - margin, min(start[1], end[1]) - margin, max(start[0], end[0]) + margin, max(start[1], end[1]) + margin)
+
@@ -4,7 +4,7 @@ import pcbnew  # type: ignore
 
 from .thread import ProcessThread
 from .events import StatusEvent
-from .options import AUTO_FILL_OPT, AUTO_TRANSLATE_OPT, EXCLUDE_DNP_OPT, EXTEND_EDGE_CUT_OPT, ALTERNATIVE_EDGE_CUT_OPT, EXTRA_LAYERS, ALL_ACTIVE_LAYERS_OPT, ARCHIVE_NAME, OPEN_BROWSER_OPT, BACKUP_OPT
+from .options import AUTO_FILL_OPT, AUTO_TRANSLATE_OPT, EXCLUDE_DNP_OPT, EXTEND_EDGE_CUT_OPT, ALTERNATIVE_EDGE_CUT_OPT, EXTRA_LAYERS, ALL_ACTIVE_LAYERS_OPT, ARCHIVE_NAME, OPEN_BROWSER_OPT, BACKUP_OPT, CACHE_OPT, REPORT_OPT, VARIANTS_OPT, OUTPUT_PROFILES_OPT, PROFILE_DEFINITIONS_OPT
 from .utils import load_user_options, save_user_options, get_layer_names
 
 
@@ -38,8 +38,18 @@ class KiCadToJLCForm(wx.Frame):
             EXCLUDE_DNP_OPT: False,
             OPEN_BROWSER_OPT: True,
             BACKUP_OPT: True,
+            CACHE_OPT: True,
+            REPORT_OPT: False,
+            VARIANTS_OPT: {},
+            OUTPUT_PROFILES_OPT: [],
+            PROFILE_DEFINITIONS_OPT: {},
         })
 
+        # assembly variants and output profiles are only defined in the options file
+        self.variants = userOptions[VARIANTS_OPT]
+        self.output_profiles = userOptions[OUTPUT_PROFILES_OPT]
+        self.profile_definitions = userOptions[PROFILE_DEFINITIONS_OPT]
+
         self.mOptionsLabel = wx.StaticText(self, label='Options:')
         # self.mOptionsSeparator = wx.StaticLine(self)
 
@@ -69,6 +79,10 @@ class KiCadToJLCForm(wx.Frame):
         self.mOpenBrowserCheckbox.SetValue(userOptions[OPEN_BROWSER_OPT])
         self.mBackupCheckbox = wx.CheckBox(self, label='Generate backup files')
         self.mBackupCheckbox.SetValue(userOptions[BACKUP_OPT])
+        self.mCacheCheckbox = wx.CheckBox(self, label='Reuse cached Gerber and drill files')
+        self.mCacheCheckbox.SetValue(userOptions[CACHE_OPT])
+        self.mReportCheckbox = wx.CheckBox(self, label='Write run report (timings and memory use)')
+        self.mReportCheckbox.SetValue(userOptions[REPORT_OPT])
 
         self.mGaugeStatus = wx.Gauge(
             self, wx.ID_ANY, 100, wx.DefaultPosition, wx.Size(600, 20), wx.GA_HORIZONTAL)
@@ -92,6 +106,8 @@ class KiCadToJLCForm(wx.Frame):
         boxSizer.Add(self.mExcludeDnpCheckbox, 0, wx.ALL, 5)
         boxSizer.Add(self.mOpenBrowserCheckbox, 0, wx.ALL, 5)
         boxSizer.Add(self.mBackupCheckbox, 0, wx.ALL, 5)
+        boxSizer.Add(self.mCacheCheckbox, 0, wx.ALL, 5)
+        boxSizer.Add(self.mReportCheckbox, 0, wx.ALL, 5)
         boxSizer.Add(self.mGaugeStatus, 0, wx.ALL, 5)
         boxSizer.Add(self.mGenerateButton, 0, wx.ALL, 5)
 
@@ -123,6 +139,11 @@ class KiCadToJLCForm(wx.Frame):
         options[EXCLUDE_DNP_OPT] = self.mExcludeDnpCheckbox.GetValue()
         options[OPEN_BROWSER_OPT] = self.mOpenBrowserCheckbox.GetValue()
         options[BACKUP_OPT] = self.mBackupCheckbox.GetValue()
+        options[CACHE_OPT] = self.mCacheCheckbox.GetValue()
+        options[REPORT_OPT] = self.mReportCheckbox.GetValue()
+        options[VARIANTS_OPT] = self.variants
+        options[OUTPUT_PROFILES_OPT] = self.output_profiles
+        options[PROFILE_DEFINITIONS_OPT] = self.profile_definitions
 
         save_user_options(options)
 
@@ -137,6 +158,8 @@ class KiCadToJLCForm(wx.Frame):
         self.mExcludeDnpCheckbox.Hide()
         self.mOpenBrowserCheckbox.Hide()
         self.mBackupCheckbox.Hide()
+        self.mCacheCheckbox.Hide()
+        self.mReportCheckbox.Hide()
         self.mGenerateButton.Hide()
         self.mGaugeStatus.Show()
 
@@ -7,36 +7,113 @@ import re
 import csv
 import math
 import shutil
+import hashlib
+import itertools
+import time
+import logging
+import tempfile
+import threading
+import multiprocessing
+from array import array
+from contextlib import nullcontext
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from typing import Tuple
 
 # Interaction with KiCad.
 import pcbnew  # type: ignore
-from .utils import duplicate_footprint, footprint_has_field, footprint_get_field, footprint_to_degrees, get_plot_plan
+from .utils import duplicate_footprint, footprint_get_fields, footprint_to_degrees, get_file_version, get_plot_plan
+from .transformations import TransformationMatcher
+from .placement import PlacementTable, PadCentroidCache, bounding_box_center, unrotated_pads_bounding_box
+from .fingerprint import describe, ZoneFingerprints, load_zone_fills, save_zone_fills, FootprintRecords, load_footprint_records, save_footprint_records, touch_footprint_records
+from .archive import ArchiveWriter
+from .publish import open_output
+from .variants import variant_file_name
+from .profiles import POSITION_COLUMNS, BOM_COLUMNS, profile_file_name
+from .report import peak_rss
 
 # Application definitions.
 from .config import *
 
+FOOTPRINT_SIZE_PATTERN = re.compile(r'^(\w*_SMD:)?\w{1,4}_(\d+)_\d+Metric.*$')
+
+# the mask layer subtracted from each silkscreen layer, as the Gerber files are plotted with SetSubtractMaskFromSilk
+SILKSCREEN_MASKS = {pcbnew.F_SilkS: [pcbnew.F_Mask], pcbnew.B_SilkS: [pcbnew.B_Mask]}
+
+# standard symbol fields, primary keys first followed by the fallback keys
+MPN_FIELDS = [(sn + " " + abr) for sn in ['LCSC', 'JLCPCB'] for abr in ['Part #', 'Part', 'PN', 'P/N', 'Part No.', 'Part Number']] + \
+             ['LCSC', 'JLC', 'MPN', 'Mpn', 'mpn']
+LAYER_OVERRIDE_FIELDS = ['FT Layer Override'] + ['Layer Override', 'LayerOverride']
+ROTATION_OFFSET_FIELDS = ['FT Rotation Offset'] + ['Rotation Offset', 'RotOffset']
+POSITION_OFFSET_FIELDS = ['FT Position Offset'] + ['Position Offset', 'PosOffset']
+ORIGIN_FIELDS = ['FT Origin'] + ['Origin']
+
+# rotation databases and their matchers read by this process, keyed by file name and modification time
+_rotation_dbs = {}
+
 class ProcessManager:
-    def __init__(self, board = None):
+    def __init__(self, board = None, report = None, board_version = None):
         # if no board is already loaded by cli mode getBoard from kicad environment
         if board is None:
             self.board = pcbnew.GetBoard()
         else:
             self.board = board
+        # the position entries and BOM lines of the board, see `_VariantTables`
+        self.placed = array('l')
         self.bom = []
-        self.components = []
-        self.__rotation_db = self.__read_rotation_db()
+        # the position and BOM entries of each assembly variant, by variant name
+        self.variant_tables = {}
+        # the footprint snapshot of the tables, the placements of output profiles are computed from it,
+        # with the reference and layer of every row, and the number of footprints of each reference
+        self.__tables = {}
+        self.__placements = PlacementTable()
+        self.__references = []
+        self.__layers = []
+        self.__designators = {}
+        self.__auto_translate = False
+        self.__computed_placements = {}
+        self.__aux_origin = (0, 0)
+        self.__lock = threading.Lock()
+        self.report = report
+        self.pad_centroids = PadCentroidCache()
+        self.__zone_fills_updated = False
+        self.__design_settings = None
+        # the version of the board file the board was loaded from, see `get_file_version`, None if it may have unsaved changes
+        self.board_version = board_version
+        self.__board_saved = None
+        self.__rotation_db, self.__transformation_matcher = self.__load_rotation_db()
 
     @staticmethod
     def normalize_filename(filename):
         return re.sub(r'[^\w\s\.\-]', '', filename)
 
-    def update_zone_fills(self):
-        '''Verify all zones have up-to-date fills.'''
+    def update_zone_fills(self, record_fills = True):
+        '''Verify all zones have up-to-date fills.
+
+        Only the zones whose fill is outdated according to the zone fills recorded next to the board
+        are refilled, all zones are if the zones can't be fingerprinted.
+
+        Args:
+            record_fills: Record the zone fills next to the board once refilled
+        '''
         filler = pcbnew.ZONE_FILLER(self.board)
         zones = self.board.Zones()
 
+        fingerprints = ZoneFingerprints(self.board)
+        fills_file = os.path.splitext(self.board.GetFileName())[0] + zoneFillsFileSuffix
+        if fingerprints.available:
+            total = len(fingerprints.zones)
+            zones = fingerprints.outdated(load_zone_fills(fills_file))
+            if self.report is not None:
+                self.report.count('zones_refilled', len(zones))
+                self.report.count('zones_skipped', total - len(zones))
+
+            if not zones:
+                # the fills and the connectivity of the loaded board are up to date
+                return
+
+            zones = _zone_vector(zones)
+
         # Fill returns true/false if a refill was made
         # We cant use aCheck = True as that would require a rollback on the commit object if
         # user decided to not perform the zone fill and the commit object is not exposed to python API
@@ -44,16 +121,142 @@ class ProcessManager:
 
         # Finally rebuild the connectivity db
         self.board.BuildConnectivity()
+        self.__zone_fills_updated = True
 
-    def generate_gerber(self, temp_dir, extra_layers, extend_edge_cuts, alternative_edge_cuts, all_active_layers):
+        if fingerprints.available and record_fills and self.board.GetFileName():
+            fingerprints.update_fills(zones)
+            try:
+                save_zone_fills(fills_file, fingerprints.record())
+            except OSError as e:
+                logging.error("Fabrication Toolkit - Zone fills not recorded: " + str(e))
+
+    def generate_gerber(self, temp_dir, extra_layers, extend_edge_cuts, alternative_edge_cuts, all_active_layers, jobs = 1, archive = None):
         '''Generate the Gerber files.'''
-        original_settings = self.board.GetDesignSettings()
+        layers = self.get_gerber_layers(extra_layers, all_active_layers)
+        self.plot_gerber_layers(temp_dir, layers, extend_edge_cuts, alternative_edge_cuts, jobs, archive=archive)
+
+    def get_gerber_layers(self, extra_layers, all_active_layers):
+        '''Get the plot plan entries of the layers that go into the Gerber files.'''
+        if extra_layers is not None:
+            extra_layers = [element.strip() for element in extra_layers.strip().split(',') if element.strip()]
+        else:
+            extra_layers = []
+
+        layers = []
+        for layer_info in get_plot_plan(self.board):
+            if (self.board.IsLayerEnabled(layer_info[1]) and (all_active_layers or layer_info[1] in standardLayers)) or layer_info[0] in extra_layers:
+                layers.append(layer_info)
+
+        return layers
+
+    def plot_gerber_layers(self, temp_dir, layers, extend_edge_cuts, alternative_edge_cuts, jobs = 1, cache = None, keys = None, archive = None,
+                           gerber_format = None):
+        '''Plot the given layers into Gerber files.
+
+        Layers whose cache key is found in the given cache are restored from it instead of being plotted.
+        If an archive is given, every file is moved into it as soon as it is complete.
+        The Gerber format is `(protel_extensions, gerber_x2)` of an output profile, JLC's if None.
+        '''
+        if keys is None:
+            keys = [None] * len(layers)
+
+        plots = []
+        for layer_info, key in zip(layers, keys):
+            if not self.__restore_cached(temp_dir, cache, key, archive):
+                plots.append((layer_info, key))
+
+        if self.report is not None:
+            self.report.count('layers', len(layers))
+            self.report.count('plotted_layers', len(plots))
+
+        if len(plots) == 0:
+            return
+
+        # plotting in parallel requires the board file, as every worker loads the board on its own
+        if self.can_plot_in_parallel(jobs):
+            plot_files = self.__plot_layers_parallel(temp_dir, [layer_info for layer_info, _ in plots], extend_edge_cuts, alternative_edge_cuts, jobs, gerber_format)
+            for (layer_info, key), (plot_file, measurement) in zip(plots, plot_files):
+                if self.report is not None:
+                    self.report.add_stage('plot ' + layer_info[0], worker=True, **measurement)
+                self.__collect_files([plot_file], cache, key, archive)
+        else:
+            self._apply_gerber_design_settings()
+
+            plot_controller = pcbnew.PLOT_CONTROLLER(self.board)
+            self._set_gerber_plot_options(plot_controller, temp_dir, gerber_format)
+
+            # a plot file is complete once the next one is opened
+            previous = None
+            for layer_info, key in plots:
+                with self.__measure('plot ' + layer_info[0]):
+                    plot_file = self._plot_gerber_layer(plot_controller, layer_info, extend_edge_cuts, alternative_edge_cuts)
+                if previous is not None:
+                    self.__collect_files([previous[0]], cache, previous[1], archive)
+                previous = (plot_file, key)
+
+            plot_controller.ClosePlot()
+            self.__collect_files([previous[0]], cache, previous[1], archive)
+
+    def get_gerber_cache_keys(self, fingerprint, layers, extend_edge_cuts, alternative_edge_cuts, gerber_format = None):
+        '''Get the cache key of each of the given layers, keys are None if the board can't be fingerprinted.'''
+        self._apply_gerber_design_settings()
+
+        plot_controller = pcbnew.PLOT_CONTROLLER(self.board)
+        self._set_gerber_plot_options(plot_controller, '', gerber_format)
+        plot_options = describe(plot_controller.GetPlotOptions(), exclude=('GetOutputDirectory',))
+        plot_options += '\nextend_edge_cuts={!r}\nalternative_edge_cuts={!r}'.format(bool(extend_edge_cuts), bool(alternative_edge_cuts))
+
+        # layers the board's plot settings plot into every file, e.g. Edge_Cuts, since KiCad 7
+        all_layers = []
+        if hasattr(plot_controller.GetPlotOptions(), 'GetPlotOnAllLayersSelection'):
+            all_layers = list(plot_controller.GetPlotOptions().GetPlotOnAllLayersSelection().Seq())
+
+        keys = []
+        for layer_info in layers:
+            # the alternative and V-Cut layers are plotted into the Edge_Cuts file
+            extra_layers = [pcbnew.User_1, pcbnew.User_2] if layer_info[1] == pcbnew.Edge_Cuts else []
+            # the mask openings are subtracted from the silkscreen
+            extra_layers += SILKSCREEN_MASKS.get(layer_info[1], [])
+            keys.append(fingerprint.layer_key(layer_info, plot_options, extra_layers + all_layers))
+
+        return keys
+
+    def can_plot_in_parallel(self, jobs):
+        '''Whether the layers are plotted by worker processes, without touching the board of this process.
+
+        The workers load the board from its file, so the board must be unchanged since it was loaded
+        from the file, and the file unchanged since. The board of the editor may have unsaved changes,
+        so it is always plotted in this process. This is decided once, when first asked.
+        '''
+        if jobs <= 1:
+            return False
+
+        if self.__board_saved is None:
+            filename = self.board.GetFileName()
+            self.__board_saved = (bool(filename) and self.board_version is not None
+                                  and get_file_version(filename) == self.board_version
+                                  and not (hasattr(self.board, 'IsModified') and self.board.IsModified()))
+        return self.__board_saved
+
+    def _apply_gerber_design_settings(self):
         settings = self.board.GetDesignSettings()
+        if self.__design_settings is None:
+            self.__design_settings = (settings.m_SolderMaskMargin, settings.m_SolderMaskToCopperClearance, settings.m_SolderMaskMinWidth)
         settings.m_SolderMaskMargin = 50000
         settings.m_SolderMaskToCopperClearance = 5000
         settings.m_SolderMaskMinWidth = 0
 
-        plot_controller = pcbnew.PLOT_CONTROLLER(self.board)
+    def restore_design_settings(self):
+        '''Restore the design settings of the board changed for plotting, e.g. before the board is reused for another export.'''
+        if self.__design_settings is None:
+            return
+
+        settings = self.board.GetDesignSettings()
+        settings.m_SolderMaskMargin, settings.m_SolderMaskToCopperClearance, settings.m_SolderMaskMinWidth = self.__design_settings
+        self.__design_settings = None
+
+    def _set_gerber_plot_options(self, plot_controller, temp_dir, gerber_format = None):
+        protel_extensions, gerber_x2 = gerber_format if gerber_format is not None else (True, False)
 
         plot_options = plot_controller.GetPlotOptions()
         plot_options.SetOutputDirectory(temp_dir)
@@ -63,46 +266,91 @@ class ProcessManager:
         plot_options.SetScale(1)
         plot_options.SetMirror(False)
         plot_options.SetUseGerberAttributes(True)
-        plot_options.SetUseGerberProtelExtensions(True)
+        plot_options.SetUseGerberProtelExtensions(protel_extensions)
         plot_options.SetUseAuxOrigin(True)
         plot_options.SetSubtractMaskFromSilk(True)
-        plot_options.SetUseGerberX2format(False)
+        plot_options.SetUseGerberX2format(gerber_x2)
         plot_options.SetDrillMarksType(0)  # NO_DRILL_SHAPE
 
         if hasattr(plot_options, "SetExcludeEdgeLayer"):
             plot_options.SetExcludeEdgeLayer(True)
 
-        if extra_layers is not None:
-            extra_layers = [element.strip() for element in extra_layers.strip().split(',') if element.strip()]
+    def _plot_gerber_layer(self, plot_controller, layer_info, extend_edge_cuts, alternative_edge_cuts):
+        '''Plot a single layer, returns the path of the plotted file.'''
+        plot_controller.SetLayer(layer_info[1])
+        plot_controller.OpenPlotfile(layer_info[2], pcbnew.PLOT_FORMAT_GERBER, layer_info[2])
+        plot_file = plot_controller.GetPlotFileName()
+
+        if layer_info[1] == pcbnew.Edge_Cuts and hasattr(plot_controller, 'PlotLayers') and (extend_edge_cuts or alternative_edge_cuts):
+            seq = pcbnew.LSEQ()
+            # uses User_2 layer for alternative Edge_Cuts layer
+            if alternative_edge_cuts:
+                seq.push_back(pcbnew.User_2)
+            else:
+                seq.push_back(layer_info[1])
+            # includes User_1 layer with Edge_Cuts layer to allow V Cuts to be defined as User_1 layer
+            # available for KiCad 7.0.1+
+            if extend_edge_cuts:
+                seq.push_back(layer_info[1])
+                seq.push_back(pcbnew.User_1)
+            plot_controller.PlotLayers(seq)
         else:
-            extra_layers = []
+            plot_controller.PlotLayer()
 
-        for layer_info in get_plot_plan(self.board):
-            if (self.board.IsLayerEnabled(layer_info[1]) and (all_active_layers or layer_info[1] in standardLayers)) or layer_info[0] in extra_layers:
-                plot_controller.SetLayer(layer_info[1])
-                plot_controller.OpenPlotfile(layer_info[2], pcbnew.PLOT_FORMAT_GERBER, layer_info[2])
-
-                if layer_info[1] == pcbnew.Edge_Cuts and hasattr(plot_controller, 'PlotLayers') and (extend_edge_cuts or alternative_edge_cuts):
-                    seq = pcbnew.LSEQ()
-                    # uses User_2 layer for alternative Edge_Cuts layer
-                    if alternative_edge_cuts:
-                        seq.push_back(pcbnew.User_2)
-                    else:
-                        seq.push_back(layer_info[1])
-                    # includes User_1 layer with Edge_Cuts layer to allow V Cuts to be defined as User_1 layer
-                    # available for KiCad 7.0.1+
-                    if extend_edge_cuts:
-                        seq.push_back(layer_info[1])
-                        seq.push_back(pcbnew.User_1)
-                    plot_controller.PlotLayers(seq)
-                else:
-                    plot_controller.PlotLayer()
-
-        plot_controller.ClosePlot()
-        settings = original_settings
-
-    def generate_drills(self, temp_dir):
-        '''Generate the drill file.'''
+        return plot_file
+
+    def __plot_layers_parallel(self, temp_dir, layers, extend_edge_cuts, alternative_edge_cuts, jobs, gerber_format = None):
+        '''Plot the layers with a pool of worker processes, each plotting a disjoint subset of the layers.
+
+        Yields the plotted files and their measurements in the order of the layers, each as soon as it is complete.
+        '''
+        # spawn fresh interpreters, as a forked copy of pcbnew is not safe to use
+        with ProcessPoolExecutor(max_workers=min(jobs, len(layers)), mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_gerber_worker, initargs=(self.board.GetFileName(), self.__zone_fills_updated)) as executor:
+            futures = [executor.submit(_plot_gerber_layer_worker, temp_dir, layer_info, extend_edge_cuts, alternative_edge_cuts, gerber_format)
+                       for layer_info in layers]
+
+            for future in futures:
+                yield future.result()
+
+    def __restore_cached(self, temp_dir, cache, key, archive):
+        '''Restore the files of a cache entry into the archive, or into the directory if there is no archive.'''
+        if cache is None:
+            return False
+
+        if archive is None:
+            return cache.restore(key, temp_dir) is not None
+
+        # the archive reads the files straight from the cache
+        files = cache.lookup(key)
+        if files is None:
+            return False
+
+        archive.add_files(files)
+        return True
+
+    def __measure(self, name):
+        return self.report.measure(name) if self.report is not None else nullcontext()
+
+    def __collect_files(self, files, cache, key, archive):
+        '''Store generated files in the cache and move them into the archive.'''
+        if cache is not None:
+            cache.store(key, files)
+
+        if archive is not None:
+            archive.add_files(files, remove=True)
+
+    def generate_drills(self, temp_dir, cache = None, key = None, archive = None):
+        '''Generate the drill file.
+
+        The drill files are restored from the given cache instead, if it holds an entry for the key.
+        If an archive is given, the drill files are moved into it.
+        '''
+        if self.__restore_cached(temp_dir, cache, key, archive):
+            return
+
+        # write into a directory of its own, so the drill files are known even while layers are plotted next to it
+        drill_dir = tempfile.mkdtemp(dir=temp_dir)
         drill_writer = pcbnew.EXCELLON_WRITER(self.board)
 
         drill_writer.SetOptions(
@@ -112,7 +360,16 @@ class ProcessManager:
             False)
         drill_writer.SetFormat(True)
         drill_writer.SetMapFileFormat(pcbnew.PLOT_FORMAT_GERBER)
-        drill_writer.CreateDrillandMapFilesSet(temp_dir, True, True)
+        drill_writer.CreateDrillandMapFilesSet(drill_dir, True, True)
+
+        drill_files = [os.path.join(drill_dir, item) for item in sorted(os.listdir(drill_dir))]
+
+        if archive is None:
+            drill_files = [shutil.move(drill_file, temp_dir) for drill_file in drill_files]
+
+        self.__collect_files(drill_files, cache, key, archive)
+
+        os.rmdir(drill_dir)
 
     def generate_netlist(self, temp_dir):
         '''Generate the connection netlist.'''
@@ -122,31 +379,56 @@ class ProcessManager:
     def _get_footprint_rotation(self, footprint):
         return footprint.GetOrientation().AsDegrees() if hasattr(footprint.GetOrientation(), 'AsDegrees') else footprint.GetOrientation() / 10.0
 
-    def _get_footprint_position(self, footprint):
+    def _get_pads_bounding_box(self, pads):
+        # get bounding box based on pads only to ignore non-copper layers, e.g. silkscreen
+        bbox = pads[0].GetBoundingBox()         # start with small bounding box
+        for pad in pads:
+            bbox.Merge(pad.GetBoundingBox())    # expand bounding box
+        return (bbox.GetX(), bbox.GetY(), bbox.GetX() + bbox.GetWidth(), bbox.GetY() + bbox.GetHeight())
+
+    def _get_pads_unrotated_bounding_box(self, footprint, pads, footprint_rotated):
+        if not footprint_rotated:
+            return self._get_pads_bounding_box(pads)
+
+        # if the footprint is not rotated by a multiple of 90 degrees, the bounding boxes will be off,
+        # so the pads are rotated back to 0 arithmetically, as far as their shapes allow it
+        bbox = unrotated_pads_bounding_box(footprint)
+        if bbox is not None:
+            return bbox
+
+        # otherwise, e.g. for custom, chamfered or trapezoid pads, we measure the pad bounding boxes
+        # of a temporary copy that is rotated to 0
+        duplicate = duplicate_footprint(footprint)
+        footprint_to_degrees(duplicate)
+        return self._get_pads_bounding_box(duplicate.Pads())
+
+    def _get_footprint_position(self, footprint, fields):
         """Calculate position based on center of pads / bounding box."""
-        origin_type = self._get_origin_from_footprint(footprint)
+        origin_type = self._get_origin_from_footprint(footprint, fields)
 
         footprint_rotation = self._get_footprint_rotation(footprint)
         footprint_rotated = footprint_rotation % 90 != 0
 
-        # if the footprint is not rotated by a multiple of 90 degrees, 
-        # the bounding boxes will be off, so we create a temporary copy that is rotated to 0
-        if footprint_rotated:
-            footprint = duplicate_footprint(footprint)
-            footprint_to_degrees(footprint)
+        pads = footprint.Pads()
 
-        if origin_type == 'Anchor':
+        if origin_type == 'Anchor' or len(pads) == 0:
+            # if we have no pads we fallback to anchor
             position = footprint.GetPosition()
-        else: # if type_origin == 'Center' or anything else
-            pads = footprint.Pads()
-            if len(pads) > 0:
-                # get bounding box based on pads only to ignore non-copper layers, e.g. silkscreen
-                bbox = pads[0].GetBoundingBox()         # start with small bounding box
-                for pad in pads:
-                    bbox.Merge(pad.GetBoundingBox())    # expand bounding box
-                position = bbox.GetCenter()
-            else:
-                position = footprint.GetPosition()      # if we have no pads we fallback to anchor
+        else:
+            # the centroid only depends on the footprint definition, so identical footprints share it,
+            # off-axis footprints are measured rotated back to 0, the others as they are placed
+            anchor = footprint.GetPosition()
+            orientation = 0.0 if footprint_rotated else footprint_rotation
+            key = self.pad_centroids.key(footprint, pads)
+            offset = self.pad_centroids.get(key, orientation, not footprint_rotated)
+
+            if offset is None:
+                bbox = self._get_pads_unrotated_bounding_box(footprint, pads, footprint_rotated)
+                bbox = (bbox[0] - anchor[0], bbox[1] - anchor[1], bbox[2] - anchor[0], bbox[3] - anchor[1])
+                self.pad_centroids.put(key, bbox, orientation, not footprint_rotated)
+                offset = bounding_box_center(bbox)
+
+            position = (anchor[0] + offset[0], anchor[1] + offset[1])
 
         if footprint_rotated:
             # now we determine the offset of the "true" position relative to the "KiCAD" position & apply the footprints rotation
@@ -163,8 +445,16 @@ class ProcessManager:
 
         return position
 
-    def generate_tables(self, temp_dir, auto_translate, exclude_dnp):
-        '''Generate the data tables.'''
+    def generate_tables(self, output, auto_translate, exclude_dnp, variants = (), records_file = None):
+        '''Generate the data tables, the designators file is written into the output directory or `MemoryFiles`.
+
+        The tables of the given assembly variants are generated in the same pass over the footprints,
+        see `variant_tables`.
+
+        Args:
+            records_file: File the data computed for every footprint is recorded in, only the footprints
+                that changed since it was recorded are recomputed, see `FootprintRecords`
+        '''
         if hasattr(self.board, 'GetModules'):
             footprints = list(self.board.GetModules())
         else:
@@ -173,164 +463,265 @@ class ProcessManager:
         # sort footprint after designator
         footprints.sort(key=lambda x: x.GetReference().upper())
 
-        # unique designator dictionary
+        if self.report is not None:
+            self.report.count('footprints', len(footprints))
+
+        # unique designator dictionary, the snapshot shares the reference strings with it
+        references = [footprint.GetReference().upper() for footprint in footprints]
         footprint_designators = defaultdict(int)
-        for i, footprint in enumerate(footprints):
+        for reference in references:
             # count unique designators
-            footprint_designators[footprint.GetReference().upper()] += 1
-        bom_designators = footprint_designators.copy()
+            footprint_designators[reference] += 1
+
+        # the tables of the board itself, and of every variant, replacing those of a previous run
+        tables = [_VariantTables(None, footprint_designators)]
+        self.variant_tables = {}
+        for variant in variants:
+            self.variant_tables[variant.name] = _VariantTables(variant, footprint_designators)
+            tables.append(self.variant_tables[variant.name])
+        self.__tables = {table.name: table for table in tables}
+        self.placed, self.bom = tables[0].placed, tables[0].bom
+
+        # placement of the position file entries, computed for all footprints at once
+        placements = PlacementTable()
+        self.__placements = placements
+        self.__references = []
+        self.__layers = []
+        self.__designators = footprint_designators
+        self.__auto_translate = auto_translate
+        self.__computed_placements = {}
+        # read while the board is read, as the placements of the output profiles are computed in stages that don't touch the board
+        aux_origin = self.board.GetDesignSettings().GetAuxOrigin()
+        self.__aux_origin = (aux_origin[0], aux_origin[1])
 
         if len(footprint_designators.items()) > 0:
-            with open((os.path.join(temp_dir, designatorsFileName)), 'w', encoding='utf-8-sig') as f:
-                for key, value in footprint_designators.items():
-                    f.write('%s:%s\n' % (key, value))
+            for table in tables:
+                with open_output(output, variant_file_name(designatorsFileName, table.name)) as f:
+                    for key, value in footprint_designators.items():
+                        f.write('%s:%s\n' % (key, value))
+
+        records = None
+        if records_file is not None:
+            records_key = self.get_records_key(auto_translate, exclude_dnp)
+            records = FootprintRecords(records_key, load_footprint_records(records_file, records_key))
+            if not records.available:
+                records = None
 
         for i, footprint in enumerate(footprints):
-            try:
-                footprint_name = str(footprint.GetFPID().GetFootprintName())
-            except AttributeError:
-                footprint_name = str(footprint.GetFPID().GetLibItemName())
+            # the data of a footprint that didn't change since it was recorded is reused
+            fingerprint = records.fingerprint(footprint) if records is not None else None
+            record = records.get(fingerprint) if records is not None else None
+
+            fields = None
+            if record is None or len(tables) > 1:
+                # read all fields once, the helpers below look them up from this snapshot
+                fields = footprint_get_fields(footprint)
+
+            if record is None:
+                record = self.__compute_footprint_record(footprint, fields, exclude_dnp)
+                if records is not None:
+                    records.put(fingerprint, record)
+
+            layer, placement, bom_entry = record
+
+            reference = references[i]
+            fitted = tables
+            if len(tables) > 1:
+                variant_fields = {name.lower(): text for name, text in fields.items()}
+                variant_fields.setdefault('reference', footprint.GetReference())
+                variant_fields.setdefault('value', footprint.GetValue())
+                fitted = [table for table in tables if table.variant is None or table.variant.is_fitted(variant_fields)]
+
+            if placement is not None and fitted:
+                x, y, rotation, offset_x, offset_y, rotation_offset, db_offset_x, db_offset_y, db_rotation_offset = placement
+                placements.append((x, y), rotation, layer == 'bottom', (offset_x, offset_y), rotation_offset, (db_offset_x, db_offset_y), db_rotation_offset)
+                self.__references.append(reference)
+                self.__layers.append(layer)
+
+                for table in fitted:
+                    table.placed.append(len(placements) - 1)
+
+            if bom_entry is not None and fitted:
+                normalized_footprint_name, mpn = bom_entry
+                key = (normalized_footprint_name, footprint.GetValue().upper(), mpn)
+
+                for table in fitted:
+                    # append unique ID if we are dealing with duplicate bom designator
+                    designator = _next_designator(table.bom_designators, reference)
+
+                    # merge similar parts into single entry, open a new entry once the current one is full
+                    line = table.bom_rows.get(key)
+                    if line is not None and line.quantity < bomRowLimit:
+                        line.designator += ", " + designator
+                        line.quantity += 1
+                    else:
+                        # add component to BOM
+                        line = table.bom_rows[key] = _BomLine(designator, normalized_footprint_name, footprint.GetValue(), mpn)
+                        table.bom.append(line)
 
-            # Get the library nickname when available
-            lib_nickname = None
+        # JLC expect 'Rotation' to be 'as viewed from above component', so bottom needs inverting, and ends up 180 degrees out as well
+        self.__compute_placements(auto_translate, True)
+
+        if self.report is not None:
+            self.report.count('pad_centroid_hits', self.pad_centroids.hits)
+            self.report.count('pad_centroid_misses', self.pad_centroids.misses)
+            if records is not None:
+                self.report.count('footprints_reused', records.hits)
+                self.report.count('footprints_computed', records.misses)
+
+        if records is not None and records.changed:
             try:
-                lib_nickname = str(footprint.GetFPID().GetLibNickname())
-            except AttributeError:
-                pass
-
-            layer = self._get_layer_override_from_footprint(footprint)
-
-            # mount_type = {
-            #     0: 'smt',
-            #     1: 'tht',
-            #     2: 'unspecified'
-            # }.get(footprint.GetAttributes())
-
-            is_dnp = (footprint_has_field(footprint, 'dnp')
-                      or (footprint.GetValue().upper() == 'DNP')
-                      or getattr(footprint, 'IsDNP', bool)())
-            skip_dnp = exclude_dnp and is_dnp
-
-            if not (footprint.GetAttributes() & pcbnew.FP_EXCLUDE_FROM_POS_FILES)  and not is_dnp:
-                # append unique ID if duplicate footprint designator
-                unique_id = ""
-                if footprint_designators[footprint.GetReference().upper()] > 1:
-                    unique_id = str(footprint_designators[footprint.GetReference().upper()])
-                    footprint_designators[footprint.GetReference().upper()] -= 1
-
-                designator = "{}{}{}".format(footprint.GetReference().upper(), "" if unique_id == "" else "_", unique_id)
-                position = self._get_footprint_position(footprint)
-                mid_x = (position[0] - self.board.GetDesignSettings().GetAuxOrigin()[0]) / 1000000.0
-                mid_y = (position[1] - self.board.GetDesignSettings().GetAuxOrigin()[1]) * -1.0 / 1000000.0
-                rotation = self._get_footprint_rotation(footprint)
-                rotation_offset_db = self._get_rotation_from_db(footprint_name, lib_nickname) # Try with lib_nickname if available
-                rotation_offset_manual = self._get_rotation_offset_from_footprint(footprint)
-
-                # position offset needs to take rotation into account
-                pos_offset = self._get_position_offset_from_footprint(footprint)
-                if auto_translate:
-                    pos_offset_db = self._get_position_offset_from_db(footprint_name, lib_nickname) # Try with lib_nickname if available
-                    pos_offset = (pos_offset[0] + pos_offset_db[0], pos_offset[1] + pos_offset_db[1])
-
-                rsin = math.sin(rotation / 180 * math.pi)
-                rcos = math.cos(rotation / 180 * math.pi)
-
-                if layer == 'bottom':
-                    pos_offset = ( pos_offset[0] * rcos + pos_offset[1] * rsin, pos_offset[0] * rsin - pos_offset[1] * rcos )
-                else:
-                    pos_offset = ( pos_offset[0] * rcos - pos_offset[1] * rsin, pos_offset[0] * rsin + pos_offset[1] * rcos )
-                mid_x, mid_y = tuple(map(sum,zip((mid_x, mid_y), pos_offset)))
-
-                # JLC expect 'Rotation' to be 'as viewed from above component', so bottom needs inverting, and ends up 180 degrees out as well
-                if layer == 'bottom':
-                    rotation = (180.0 - rotation)
-
-                if auto_translate:
-                    rotation += rotation_offset_db
-
-                rotation = (rotation + rotation_offset_manual) % 360.0
-
-                self.components.append({
-                    'Designator': designator,
-                    'Mid X': mid_x,
-                    'Mid Y': mid_y,
-                    'Rotation': rotation,
-                    'Layer': layer,
-                })
-
-            if not (footprint.GetAttributes() & pcbnew.FP_EXCLUDE_FROM_BOM) and not skip_dnp:
-                # append unique ID if we are dealing with duplicate bom designator
-                unique_id = ""
-                if bom_designators[footprint.GetReference().upper()] > 1:
-                    unique_id = str(bom_designators[footprint.GetReference().upper()])
-                    bom_designators[footprint.GetReference().upper()] -= 1
-
-                # merge similar parts into single entry
-                insert = True
-                for component in self.bom:
-                    same_footprint = component['Footprint'] == self._normalize_footprint_name(footprint_name)
-                    same_value = component['Value'].upper() == footprint.GetValue().upper()
-                    same_lcsc = component['LCSC Part #'] == self._get_mpn_from_footprint(footprint)
-                    under_limit = component['Quantity'] < bomRowLimit
-
-                    if same_footprint and same_value and same_lcsc and under_limit:
-                        component['Designator'] += ", " + "{}{}{}".format(footprint.GetReference().upper(), "" if unique_id == "" else "_", unique_id)
-                        component['Quantity'] += 1
-                        insert = False
-                        break
+                save_footprint_records(records_file, records.key, records.record())
+            except OSError as e:
+                logging.error("Fabrication Toolkit - Footprint records not saved: " + str(e))
+        elif records is not None:
+            touch_footprint_records(records_file)
+
+    def get_records_key(self, auto_translate, exclude_dnp):
+        '''Get the key of the footprint records, which changes with the rotation database, the options and the KiCad version.'''
+        key = hashlib.sha256()
+        key.update(pcbnew.GetBuildVersion().encode('utf-8'))
+        key.update(repr(sorted(self.__rotation_db.items())).encode('utf-8'))
+        key.update(repr(('tables', bool(auto_translate), bool(exclude_dnp))).encode('utf-8'))
+        return key.hexdigest()
+
+    def __compute_footprint_record(self, footprint, fields, exclude_dnp):
+        '''Compute the data of a footprint the tables are generated from.
+
+        Returns:
+            `[layer, placement, bom_entry]`, the placement is None if the footprint is not in the
+            position file, the BOM entry `[normalized_footprint_name, mpn]` is None if it's not in the BOM.
+        '''
+        try:
+            footprint_name = str(footprint.GetFPID().GetFootprintName())
+        except AttributeError:
+            footprint_name = str(footprint.GetFPID().GetLibItemName())
+
+        # Get the library nickname when available
+        lib_nickname = None
+        try:
+            lib_nickname = str(footprint.GetFPID().GetLibNickname())
+        except AttributeError:
+            pass
+
+        layer = self._get_layer_override_from_footprint(footprint, fields)
+
+        # mount_type = {
+        #     0: 'smt',
+        #     1: 'tht',
+        #     2: 'unspecified'
+        # }.get(footprint.GetAttributes())
+
+        is_dnp = ('dnp' in fields
+                  or (footprint.GetValue().upper() == 'DNP')
+                  or getattr(footprint, 'IsDNP', bool)())
+        skip_dnp = exclude_dnp and is_dnp
+
+        placement = None
+        if not (footprint.GetAttributes() & pcbnew.FP_EXCLUDE_FROM_POS_FILES) and not is_dnp:
+            rotation_offset_db, pos_offset_db = self._get_transformation_from_db(footprint_name, lib_nickname) # Try with lib_nickname if available
+            position = self._get_footprint_position(footprint, fields)
+            offset = self._get_position_offset_from_footprint(footprint, fields)
+
+            placement = [position[0], position[1], self._get_footprint_rotation(footprint), offset[0], offset[1],
+                         self._get_rotation_offset_from_footprint(footprint, fields), pos_offset_db[0], pos_offset_db[1], rotation_offset_db]
+
+        bom_entry = None
+        if not (footprint.GetAttributes() & pcbnew.FP_EXCLUDE_FROM_BOM) and not skip_dnp:
+            bom_entry = [self._normalize_footprint_name(footprint_name), self._get_mpn_from_footprint(footprint, fields)]
+
+        return [layer, placement, bom_entry]
+
+    def iter_positions(self, variant = None, profile = None):
+        '''Iterate over the position file entries of the board or of an assembly variant.
+
+        The entries are computed while they are iterated, as tuples in the order of `POSITION_COLUMNS`.
+        With an output profile the placement follows its conventions.
+        '''
+        placed = self.__tables[variant].placed if self.__tables else []
+        if not placed:
+            return
+        references, layers = self.__references, self.__layers
+        designators = self.__designators.copy()
+
+        if profile is None:
+            mid_xs, mid_ys, rotations = self.__compute_placements(self.__auto_translate, True)
+        else:
+            mid_xs, mid_ys, rotations = self.__compute_placements(self.__auto_translate and profile.translations, profile.mirror_bottom_rotation)
+
+        for index in placed:
+            # append unique ID if duplicate footprint designator
+            yield (_next_designator(designators, references[index]), mid_xs[index], mid_ys[index], rotations[index], layers[index])
+
+    def iter_bom(self, variant = None):
+        '''Iterate over the BOM lines of the board or of an assembly variant, as tuples in the order of `BOM_COLUMNS`.'''
+        bom = self.__tables[variant].bom if self.__tables else []
+        for line in bom:
+            yield (line.designator, line.footprint, line.quantity, line.value, line.mpn)
+
+    def generate_positions(self, output, variant = None, profile = None):
+        '''Generate the position file of the board or of an assembly variant, into the output directory or `MemoryFiles`.
+
+        The entries are streamed into the file. With an output profile the file follows its conventions and goes into its folder.
+        '''
+        self.__write_table(output, profile_file_name(variant_file_name(placementFileName, variant), profile),
+                           self.iter_positions(variant, profile), POSITION_COLUMNS, profile.position_columns if profile is not None else None)
 
-                # add component to BOM
-                if insert:
-                    self.bom.append({
-                        'Designator': "{}{}{}".format(footprint.GetReference().upper(), "" if unique_id == "" else "_", unique_id),
-                        'Footprint': self._normalize_footprint_name(footprint_name),
-                        'Quantity': 1,
-                        'Value': footprint.GetValue(),
-                        # 'Mount': mount_type,
-                        'LCSC Part #': self._get_mpn_from_footprint(footprint),
-                    })
-
-    def generate_positions(self, temp_dir):
-        '''Generate the position file.'''
-        if len(self.components) > 0:
-            with open((os.path.join(temp_dir, placementFileName)), 'w', newline='', encoding='utf-8-sig') as outfile:
-                csv_writer = csv.writer(outfile)
-                # writing headers of CSV file
-                csv_writer.writerow(self.components[0].keys())
-
-                for component in self.components:
-                    # writing data of CSV file
-                    if ('**' not in component['Designator']):
-                        csv_writer.writerow(component.values())
-
-    def generate_bom(self, temp_dir):
-        '''Generate the bom file.'''
-        if len(self.bom) > 0:
-            with open((os.path.join(temp_dir, bomFileName)), 'w', newline='', encoding='utf-8-sig') as outfile:
-                csv_writer = csv.writer(outfile)
-                # writing headers of CSV file
-                csv_writer.writerow(self.bom[0].keys())
-
-                # Output all of the component information
-                for component in self.bom:
-                    # writing data of CSV file
-                    if ('**' not in component['Designator']):
-                        csv_writer.writerow(component.values())
-
-    def generate_archive(self, temp_dir, temp_file):
-        '''Generate the archive file.'''
-        temp_file = shutil.make_archive(temp_file, 'zip', temp_dir)
-        temp_file = shutil.move(temp_file, temp_dir)
-
-        # remove non essential files
-        for item in os.listdir(temp_dir):
-            if not item.endswith(".zip") and not item.endswith(".csv") and not item.endswith(".ipc"):
-                os.remove(os.path.join(temp_dir, item))
-
-        return temp_file
+    def generate_bom(self, output, variant = None, profile = None):
+        '''Generate the bom file of the board or of an assembly variant, into the output directory or `MemoryFiles`.
+
+        The lines are streamed into the file. With an output profile the file follows its conventions and goes into its folder.
+        '''
+        self.__write_table(output, profile_file_name(variant_file_name(bomFileName, variant), profile),
+                           self.iter_bom(variant), BOM_COLUMNS, profile.bom_columns if profile is not None else None)
+
+    def __write_table(self, output, filename, rows, columns, headers = None):
+        '''Write the rows of a table as CSV file, the file is left out if there are no rows.
+
+        Args:
+            rows: Tuples in the order of the columns, rows whose designator contains `**` are left out
+            headers: Header of each written column, in order, all columns by default
+        '''
+        first = next(rows, None)
+        if first is None:
+            return
+
+        headers = headers or {column: column for column in columns}
+        indices = [columns.index(column) for column in headers]
+        designator = columns.index('Designator')
+
+        with open_output(output, filename, newline='') as outfile:
+            csv_writer = csv.writer(outfile)
+            # writing headers of CSV file
+            csv_writer.writerow(list(headers.values()))
+
+            # writing data of CSV file
+            csv_writer.writerows([row[index] for index in indices] for row in itertools.chain((first,), rows) if '**' not in row[designator])
+
+    def __compute_placements(self, auto_translate, mirror_bottom):
+        '''Get the placement of the footprint snapshot, computed once for every combination of the conventions.'''
+        key = (auto_translate, mirror_bottom)
+        with self.__lock:
+            if key not in self.__computed_placements:
+                self.__computed_placements[key] = self.__placements.compute(self.__aux_origin, *key)
+            return self.__computed_placements[key]
+
+    def create_archive(self, filename, compression_level = archiveCompressionLevel):
+        '''Create the production archive, the generated Gerber and drill files are streamed into it.'''
+        return ArchiveWriter(filename, compression_level)
 
     """ Private """
 
+    def __load_rotation_db(self, filename: str = os.path.join(os.path.dirname(__file__), 'transformations.csv')):
+        '''Get the rotation database and its matcher, read once per process for as long as the file is unchanged.'''
+        key = (filename, os.path.getmtime(filename))
+
+        if key not in _rotation_dbs:
+            db = self.__read_rotation_db(filename)
+            _rotation_dbs[key] = (db, TransformationMatcher(db))
+
+        return _rotation_dbs[key]
+
     def __read_rotation_db(self, filename: str = os.path.join(os.path.dirname(__file__), 'transformations.csv')) -> dict[str, float]:
         '''Read the rotations.cf config file so we know what rotations
         to apply later.
@@ -390,6 +781,15 @@ class ProcessManager:
 
         return db
 
+    def _get_transformation_from_db(self, footprint: str, lib_nickname: str = None) -> Tuple[float, Tuple[float, float]]:
+        '''Get the rotation and position offset to be added from the database file.
+
+        Args:
+            footprint: The footprint name
+            lib_nickname: The library nickname, if available
+        '''
+        return self.__transformation_matcher.match(footprint, lib_nickname)
+
     def _get_rotation_from_db(self, footprint: str, lib_nickname: str = None) -> float:
         '''Get the rotation to be added from the database file.
 
@@ -397,32 +797,7 @@ class ProcessManager:
             footprint: The footprint name
             lib_nickname: The library nickname, if available
         '''
-        # First try with the standard approach for backward compatibility
-        for entry in self.__rotation_db.items():
-            # If the expression in the DB contains a :, search for it literally.
-            if (re.search(':', entry[1]['name'])):
-                if (re.search(entry[1]['name'], footprint)):
-                    return float(entry[1]['rotation'])
-            # There is no : in the expression, so only search the right side of the :
-            else:
-                footprint_segments = footprint.split(':')
-                # Only one means there was no :, just check the short.
-                if (len(footprint_segments) == 1):
-                    check = footprint_segments[0]
-                # More means there was a :, check the right side.
-                else:
-                    check = footprint_segments[1]
-                if (re.search(entry[1]['name'], check)):
-                    return float(entry[1]['rotation'])
-
-        # If no match found and we have a library nickname, try matching against that
-        if lib_nickname:
-            for entry in self.__rotation_db.items():
-                if (re.search(entry[1]['name'], lib_nickname)):
-                    return float(entry[1]['rotation'])
-
-        # Not found, no rotation.
-        return 0.0
+        return self._get_transformation_from_db(footprint, lib_nickname)[0]
 
     def _get_position_offset_from_db(self, footprint: str, lib_nickname: str = None) -> Tuple[float, float]:
         '''Get the position offset to be added from the database file.
@@ -431,60 +806,27 @@ class ProcessManager:
             footprint: The footprint name
             lib_nickname: The library nickname, if available
         '''
-        # First try with the standard approach for backward compatibility
-        for entry in self.__rotation_db.items():
-            # If the expression in the DB contains a :, search for it literally.
-            if (re.search(':', entry[1]['name'])):
-                if (re.search(entry[1]['name'], footprint)):
-                    return ( float(entry[1]['x']), float(entry[1]['y']) )
-            # There is no : in the expression, so only search the right side of the :
-            else:
-                footprint_segments = footprint.split(':')
-                # Only one means there was no :, just check the short.
-                if (len(footprint_segments) == 1):
-                    check = footprint_segments[0]
-                # More means there was a :, check the right side.
-                else:
-                    check = footprint_segments[1]
-                if (re.search(entry[1]['name'], check)):
-                    return (float(entry[1]['x']), float(entry[1]['y']))
-
-        # If no match found and we have a library nickname, try matching against that
-        if lib_nickname:
-            for entry in self.__rotation_db.items():
-                if (re.search(entry[1]['name'], lib_nickname)):
-                    return (float(entry[1]['x']), float(entry[1]['y']))
-
-        # Not found, no delta.
-        return (0.0, 0.0)
-
-    def _get_mpn_from_footprint(self, footprint) -> str:
-        ''''Get the MPN/LCSC stock code from standard symbol fields.'''
-        supplier_names = ['LCSC', 'JLCPCB']
-        pn_abbrevs = ['Part #', 'Part', 'PN', 'P/N', 'Part No.', 'Part Number']
-        keys = [(sn + " " + abr) for sn in supplier_names for abr in pn_abbrevs]
-        fallback_keys = ['LCSC', 'JLC', 'MPN', 'Mpn', 'mpn']
+        return self._get_transformation_from_db(footprint, lib_nickname)[1]
 
-        if footprint_has_field(footprint, 'dnp'):
+    def _get_mpn_from_footprint(self, footprint, fields) -> str:
+        ''''Get the MPN/LCSC stock code from standard symbol fields.'''
+        if 'dnp' in fields:
             return 'DNP'
 
-        for key in keys + fallback_keys:
-            if footprint_has_field(footprint, key) and '' != footprint_get_field(footprint, key):
-                return footprint_get_field(footprint, key)
+        for key in MPN_FIELDS:
+            if fields.get(key, '') != '':
+                return fields[key]
 
-    def _get_layer_override_from_footprint(self, footprint) -> str:
+    def _get_layer_override_from_footprint(self, footprint, fields) -> str:
         '''Get the layer override from standard symbol fields.'''
-        keys = ['FT Layer Override']
-        fallback_keys = ['Layer Override', 'LayerOverride']
-
         layer = {
             pcbnew.F_Cu: 'top',
             pcbnew.B_Cu: 'bottom',
         }.get(footprint.GetLayer())
 
-        for key in keys + fallback_keys:
-            if footprint_has_field(footprint, key):
-                temp_layer = footprint_get_field(footprint, key)
+        for key in LAYER_OVERRIDE_FIELDS:
+            if key in fields:
+                temp_layer = fields[key]
                 if len(temp_layer) > 0:
                     if (temp_layer[0] == 'b' or temp_layer[0] == 'B'):
                         layer = "bottom"
@@ -495,16 +837,13 @@ class ProcessManager:
 
         return layer
 
-    def _get_rotation_offset_from_footprint(self, footprint) -> float:
+    def _get_rotation_offset_from_footprint(self, footprint, fields) -> float:
         '''Get the rotation offset from standard symbol fields.'''
-        keys = ['FT Rotation Offset']
-        fallback_keys = ['Rotation Offset', 'RotOffset']
-
         offset = ""
 
-        for key in keys + fallback_keys:
-            if footprint_has_field(footprint, key):
-                offset = footprint_get_field(footprint, key)
+        for key in ROTATION_OFFSET_FIELDS:
+            if key in fields:
+                offset = fields[key]
                 break
 
         if offset is None or offset == "":
@@ -515,16 +854,13 @@ class ProcessManager:
             except ValueError:
                 raise RuntimeError("Rotation offset of {} is not a valid number".format(footprint.GetReference()))
 
-    def _get_position_offset_from_footprint(self, footprint) -> Tuple[float, float]:
+    def _get_position_offset_from_footprint(self, footprint, fields) -> Tuple[float, float]:
         '''Get the position offset from standard symbol fields.'''
-        keys = ['FT Position Offset']
-        fallback_keys = ['Position Offset', 'PosOffset']
-
         offset = ""
 
-        for key in keys + fallback_keys:
-            if footprint_has_field(footprint, key):
-                offset = footprint_get_field(footprint, key)
+        for key in POSITION_OFFSET_FIELDS:
+            if key in fields:
+                offset = fields[key]
                 break
 
         if offset == "":
@@ -536,11 +872,8 @@ class ProcessManager:
             except Exception as e:
                 raise RuntimeError("Position offset of {} is not a valid pair of numbers".format(footprint.GetReference()))
 
-    def _get_origin_from_footprint(self, footprint) -> float:
+    def _get_origin_from_footprint(self, footprint, fields) -> float:
         '''Get the origin from standard symbol fields.'''
-        keys = ['FT Origin']
-        fallback_keys = ['Origin']
-
         attributes = footprint.GetAttributes()
 
         # determine origin type by package type
@@ -549,9 +882,9 @@ class ProcessManager:
         else:
             origin_type = 'Center'
 
-        for key in keys + fallback_keys:
-            if footprint_has_field(footprint, key):
-                origin_type_override = str(footprint_get_field(footprint, key)).strip().capitalize()
+        for key in ORIGIN_FIELDS:
+            if key in fields:
+                origin_type_override = str(fields[key]).strip().capitalize()
 
                 if origin_type_override in ['Anchor', 'Center']:
                     origin_type = origin_type_override
@@ -561,6 +894,84 @@ class ProcessManager:
 
     def _normalize_footprint_name(self, footprint) -> str:
         # replace footprint names of resistors, capacitors, inductors, diodes, LEDs, fuses etc, with the footprint size only
-        pattern = re.compile(r'^(\w*_SMD:)?\w{1,4}_(\d+)_\d+Metric.*$')
+        return FOOTPRINT_SIZE_PATTERN.sub(r'\2', footprint)
+
+
+""" Parallel plotting workers """
+
+# board of the current gerber worker process, loaded once per worker
+_gerber_worker = None
+
+class _VariantTables:
+    '''The position and BOM entries of the board or of one of its assembly variants, filled in a single pass over the footprints.
+
+    The position entries are the rows of the footprint snapshot, their designators and placement are
+    computed while the position file is written. The BOM keeps the open line of each group of similar
+    parts, so it grows with the number of BOM lines rather than footprints.
+    '''
+    def __init__(self, variant, designators):
+        self.variant = variant
+        self.name = variant.name if variant is not None else None
+        self.bom_designators = designators.copy()
+        self.bom_rows = {}
+        self.placed = array('l')
+        self.bom = []
 
-        return pattern.sub(r'\2', footprint)
+class _BomLine:
+    '''A line of the BOM, the designators of similar parts merged into it.'''
+    __slots__ = ('designator', 'footprint', 'quantity', 'value', 'mpn')
+
+    def __init__(self, designator, footprint, value, mpn):
+        self.designator = designator
+        self.footprint = footprint
+        self.quantity = 1
+        self.value = value
+        self.mpn = mpn
+
+def _next_designator(designators, reference):
+    '''Get the designator of the next footprint of the reference, numbered if the reference is used more than once.'''
+    unique_id = ""
+    if designators[reference] > 1:
+        unique_id = str(designators[reference])
+        designators[reference] -= 1
+
+    return "{}{}{}".format(reference, "" if unique_id == "" else "_", unique_id)
+
+def _zone_vector(zones):
+    '''Get the zones as the vector of zones ZONE_FILLER.Fill takes.'''
+    if not hasattr(pcbnew, 'ZONES'):
+        return zones
+
+    vector = pcbnew.ZONES()
+    for zone in zones:
+        vector.append(zone)
+    return vector
+
+def _init_gerber_worker(board_path, fill_zones):
+    '''Load the board into a gerber worker process, in the same state as the board of the main process.'''
+    global _gerber_worker
+    _gerber_worker = ProcessManager(pcbnew.LoadBoard(board_path))
+
+    if fill_zones:
+        # the zone fills are recorded by the main process, which refilled the same zones
+        _gerber_worker.update_zone_fills(record_fills=False)
+
+    _gerber_worker._apply_gerber_design_settings()
+
+def _plot_gerber_layer_worker(temp_dir, layer_info, extend_edge_cuts, alternative_edge_cuts, gerber_format = None):
+    '''Plot a single layer from a gerber worker process, returns the plotted file and how long it took.'''
+    started_at = time.time()
+    start_time = time.perf_counter()
+    start_cpu = time.process_time()
+
+    plot_controller = pcbnew.PLOT_CONTROLLER(_gerber_worker.board)
+    _gerber_worker._set_gerber_plot_options(plot_controller, temp_dir, gerber_format)
+    plot_file = _gerber_worker._plot_gerber_layer(plot_controller, layer_info, extend_edge_cuts, alternative_edge_cuts)
+    plot_controller.ClosePlot()
+
+    return plot_file, {
+        'started_at': started_at,
+        'wall_seconds': time.perf_counter() - start_time,
+        'cpu_seconds': time.process_time() - start_cpu,
+        'peak_rss_bytes': peak_rss(),
+    }
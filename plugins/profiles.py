@@ -0,0 +1,130 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import re
+from typing import Dict, List, Optional
+
+# the columns of the position and BOM files as generated, which profiles rename, reorder or drop
+POSITION_COLUMNS = ('Designator', 'Mid X', 'Mid Y', 'Rotation', 'Layer')
+BOM_COLUMNS = ('Designator', 'Footprint', 'Quantity', 'Value', 'LCSC Part #')
+
+DEFAULT_PROFILE = 'jlcpcb'
+
+
+class OutputProfile:
+    '''The conventions of a fab house the production files are generated for.
+
+    The default profile writes into the output folder, every other profile into a subfolder of
+    its name. Profiles share the loaded board, the zone fill and the footprint snapshot of a run,
+    profiles with the same Gerber format share the plotted layers as well.
+
+    Args:
+        name: Name of the profile, and of its subfolder
+        protel_extensions: Name the Gerber files with Protel extensions, e.g. `.gtl`, rather than `.gbr`
+        gerber_x2: Plot Gerber X2 rather than X1 files
+        all_active_layers: Plot all active layers, or only the commonly used ones, None to follow the options
+        translations: Apply the transformation database, if automatic translations are on
+        mirror_bottom_rotation: Give the rotation of bottom side footprints as viewed from the top
+        position_columns: Header of each generated position column, in order, columns not given are left out
+        bom_columns: Header of each generated BOM column, in order, columns not given are left out
+    '''
+    def __init__(self, name: str, protel_extensions: bool = True, gerber_x2: bool = False, all_active_layers: Optional[bool] = None,
+                 translations: bool = True, mirror_bottom_rotation: bool = True,
+                 position_columns: Optional[Dict[str, str]] = None, bom_columns: Optional[Dict[str, str]] = None):
+        if not name or re.search(r'[^\w\-]', name):
+            raise ValueError("Invalid profile name '{}', only letters, digits, '_' and '-' are allowed".format(name))
+
+        self.name = name
+        self.protel_extensions = bool(protel_extensions)
+        self.gerber_x2 = bool(gerber_x2)
+        self.all_active_layers = all_active_layers
+        self.translations = bool(translations)
+        self.mirror_bottom_rotation = bool(mirror_bottom_rotation)
+        self.position_columns = dict(position_columns or {column: column for column in POSITION_COLUMNS})
+        self.bom_columns = dict(bom_columns or {column: column for column in BOM_COLUMNS})
+
+        for columns, known in ((self.position_columns, POSITION_COLUMNS), (self.bom_columns, BOM_COLUMNS)):
+            unknown = [column for column in columns if column not in known]
+            if unknown:
+                raise ValueError("Unknown columns {} of profile '{}', the columns are {}".format(unknown, name, ", ".join(known)))
+
+    @property
+    def folder(self) -> Optional[str]:
+        '''Subfolder of the output folder the files of this profile go into, None for the output folder itself.'''
+        return None if self.name == DEFAULT_PROFILE else self.name
+
+    @property
+    def gerber_format(self):
+        '''`(protel_extensions, gerber_x2)`, see `ProcessManager.plot_gerber_layers`.'''
+        return (self.protel_extensions, self.gerber_x2)
+
+    def as_dict(self) -> dict:
+        return {
+            'protel_extensions': self.protel_extensions,
+            'gerber_x2': self.gerber_x2,
+            'all_active_layers': self.all_active_layers,
+            'translations': self.translations,
+            'mirror_bottom_rotation': self.mirror_bottom_rotation,
+            'position_columns': self.position_columns,
+            'bom_columns': self.bom_columns,
+        }
+
+
+BUILTIN_PROFILES = {
+    DEFAULT_PROFILE: {},
+    # the conventions of KiCad's own fabrication outputs
+    'kicad': {
+        'protel_extensions': False,
+        'gerber_x2': True,
+        'translations': False,
+        'mirror_bottom_rotation': False,
+        'position_columns': {'Designator': 'Ref', 'Mid X': 'PosX', 'Mid Y': 'PosY', 'Rotation': 'Rot', 'Layer': 'Side'},
+        'bom_columns': {'Designator': 'Reference', 'Value': 'Value', 'Footprint': 'Footprint', 'Quantity': 'Qty', 'LCSC Part #': 'MPN'},
+    },
+}
+
+
+def get_profiles(names: Optional[List[str]], definitions: Optional[Dict[str, dict]] = None) -> List[OutputProfile]:
+    '''Get the output profiles of a run, the default profile always comes first.
+
+    Args:
+        names: Names of the additional profiles
+        definitions: Profiles defined in the options, `{name: {"base": profile, setting: value, ...}}`,
+            settings not given are taken from the base profile, the default profile if there is none
+    '''
+    definitions = definitions or {}
+    profiles = [OutputProfile(DEFAULT_PROFILE)]
+
+    for name in names or []:
+        if name in (profile.name for profile in profiles):
+            continue
+        try:
+            profiles.append(OutputProfile(name, **_profile_settings(name, definitions, [])))
+        except TypeError as e:
+            raise ValueError("Invalid settings of profile '{}': {}".format(name, e))
+
+    return profiles
+
+def _profile_settings(name: str, definitions: Dict[str, dict], seen: List[str]) -> dict:
+    if name in seen:
+        raise ValueError("Profile '{}' is based on itself".format(name))
+
+    if name in definitions:
+        settings = dict(definitions[name])
+        base = settings.pop('base', DEFAULT_PROFILE)
+        base_settings = _profile_settings(base, definitions, seen + [name]) if base != name else dict(BUILTIN_PROFILES.get(base, {}))
+        base_settings.update(settings)
+        return base_settings
+
+    if name in BUILTIN_PROFILES:
+        return dict(BUILTIN_PROFILES[name])
+
+    raise ValueError("Unknown profile '{}', the profiles are {}".format(name, ", ".join(sorted(set(BUILTIN_PROFILES) | set(definitions)))))
+
+def profile_file_name(filename: str, profile: Optional[OutputProfile]) -> str:
+    '''Get the path of a file of a profile relative to the output folder, the file name itself if there is no profile.'''
+    if profile is None or profile.folder is None:
+        return filename
+    return os.path.join(profile.folder, filename)
@@ -0,0 +1,135 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import io
+import os
+import re
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import List
+
+# Application definitions.
+from .config import profileTop, profileSampleInterval
+
+
+class StackSampler(threading.Thread):
+    '''Samples the call stack of another thread at a fixed interval.
+
+    cProfile only records callers and callees, not whole call paths, so the stacks for flame
+    graphs are sampled instead. The frames that were already running when sampling started
+    are the same for all samples, so they are left out.
+    '''
+    def __init__(self, thread_id: int, interval: float = profileSampleInterval):
+        threading.Thread.__init__(self, daemon=True)
+        self.thread_id = thread_id
+        self.outer_frames = set()
+        self.interval = interval
+        self.stacks = Counter()
+        self.__stopped = threading.Event()
+
+    def start(self):
+        frame = sys._current_frames().get(self.thread_id)
+        while frame is not None:
+            self.outer_frames.add(frame)
+            frame = frame.f_back
+        threading.Thread.start(self)
+
+    def run(self):
+        while not self.__stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame not in self.outer_frames:
+                code = frame.f_code
+                stack.append('{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.__stopped.set()
+        self.join()
+
+
+class StageProfiler:
+    '''cProfile of every stage of a run, each stage in a profile of its own.
+
+    Profiles only cover the thread that runs the stage, so stages should not run concurrently
+    while they are profiled. Worker processes, e.g. of parallel plotting, are not profiled.
+
+    Args:
+        top: Number of functions listed for each stage in the summary
+        stacks: Sample the call stacks for flame graphs as well
+    '''
+    def __init__(self, top: int = profileTop, stacks: bool = False):
+        self.top = top
+        self.stacks = stacks
+        self.stages: List[tuple] = []
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def profile(self, name: str):
+        '''Profile the enclosed block as a stage of the given name.'''
+        sampler = None
+        if self.stacks:
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+
+        profile = cProfile.Profile()
+        start_time = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            seconds = time.perf_counter() - start_time
+            if sampler is not None:
+                sampler.stop()
+
+            with self.__lock:
+                self.stages.append((name, seconds, pstats.Stats(profile), sampler.stacks if sampler is not None else None))
+
+    def write(self, directory: str) -> List[str]:
+        '''Write a pstats file, and the collapsed stacks if sampled, of every stage into the directory.
+
+        Returns:
+            The paths of the written files.
+        '''
+        os.makedirs(directory, exist_ok=True)
+        files = []
+
+        with self.__lock:
+            stages = list(self.stages)
+
+        for name, seconds, stats, stacks in stages:
+            base_name = os.path.join(directory, re.sub(r'[^\w\-]+', '_', name))
+
+            stats.dump_stats(base_name + '.pstats')
+            files.append(base_name + '.pstats')
+
+            if stacks is not None:
+                with open(base_name + '.folded', 'w', encoding='utf-8') as f:
+                    for stack, count in stacks.items():
+                        f.write('{} {}\n'.format(stack, count))
+                files.append(base_name + '.folded')
+
+        return files
+
+    def summary(self) -> str:
+        '''Get the hotspots of every stage, the functions with the highest cumulative time.'''
+        out = io.StringIO()
+
+        with self.__lock:
+            stages = list(self.stages)
+
+        for name, seconds, stats, stacks in stages:
+            out.write("Stage '{}': {:.3f} s\n".format(name, seconds))
+            stats.stream = out
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+
+        return out.getvalue()
@@ -0,0 +1,218 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import io
+import os
+import time
+import shutil
+import zipfile
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple, Union
+
+# Application definitions.
+from .backup import file_digest
+from .config import publishLockFileName, publishLockTimeout
+from .utils import create_temp_file
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+def content_digest(path: str) -> str:
+    '''Get the sha256 digest of what a file holds.
+
+    Zip archives are digested by the names, sizes and checksums of their files, as the modification
+    times and the order of the files in an archive differ between runs that produce the very same files.
+    '''
+    if not zipfile.is_zipfile(path):
+        return file_digest(path)
+
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(path) as archive:
+        for info in sorted(archive.infolist(), key=lambda info: info.filename):
+            digest.update('{}\0{}\0{}\0{}\n'.format(info.filename, info.file_size, info.CRC, info.compress_type).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class MemoryFiles:
+    '''Generated text files kept in memory until they are published, rather than staged on disk.'''
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def open(self, name: str, newline: str = None, encoding: str = 'utf-8-sig'):
+        '''Write a file, the arguments have the meaning of the built-in `open` for writing text.'''
+        buffer = io.StringIO(newline='')
+        yield buffer
+
+        text = buffer.getvalue()
+        if newline is None:
+            text = text.replace('\n', os.linesep)
+        elif newline:
+            text = text.replace('\n', newline)
+
+        with self.__lock:
+            self.files[name] = text.encode(encoding)
+
+
+def open_output(output: Union[str, MemoryFiles], name: str, newline: str = None):
+    '''Open a generated text file for writing, in memory or in the given directory.'''
+    if isinstance(output, MemoryFiles):
+        return output.open(name, newline=newline)
+    os.makedirs(os.path.dirname(os.path.join(output, name)), exist_ok=True)
+    return open(os.path.join(output, name), 'w', newline=newline, encoding='utf-8-sig')
+
+
+class OutputLock:
+    '''Exclusive lock of an output folder, held by one export at a time.
+
+    The lock is an advisory lock on a file in the folder, so it is released by the operating
+    system if the holding process dies.
+
+    Args:
+        directory: The output folder
+        timeout: Seconds to wait for another export to release the lock
+    '''
+    def __init__(self, directory: str, timeout: float = publishLockTimeout):
+        self.filename = os.path.join(directory, publishLockFileName)
+        self.timeout = timeout
+        self.__file = None
+
+    def acquire(self):
+        '''Wait for the lock.
+
+        Raises:
+            TimeoutError: If another export holds the lock longer than the timeout
+        '''
+        f = open(self.filename, 'a+b')
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            try:
+                if os.name == 'nt':
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    f.close()
+                    raise TimeoutError("The output folder is locked by another export: " + os.path.dirname(self.filename))
+                time.sleep(0.1)
+
+        self.__file = f
+
+    def release(self):
+        f, self.__file = self.__file, None
+        if f is None:
+            return
+
+        if os.name == 'nt':
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        f.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class Publication:
+    '''Outcome of publishing files into an output folder, by file name.'''
+    def __init__(self):
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.unchanged: List[str] = []
+
+    def as_dict(self) -> dict:
+        return {'added': self.added, 'changed': self.changed, 'unchanged': self.unchanged}
+
+    def summary(self) -> str:
+        return "{} added, {} changed, {} unchanged".format(len(self.added), len(self.changed), len(self.unchanged))
+
+
+def publish(files: Iterable[Tuple[Union[str, bytes], str]], directory: str, timeout: float = publishLockTimeout) -> Tuple[List[str], Publication]:
+    '''Move generated files into the output folder, leaving files whose content didn't change untouched.
+
+    Every file replaces its previous version in a single rename, so readers of the output folder
+    see either the previous or the new file. The output folder is locked meanwhile, so concurrent
+    exports into the same folder publish one after the other.
+
+    Args:
+        files: `(path, name)` of each generated file and its path relative to the output folder,
+            or `(content, name)` of files generated in memory
+
+    Returns:
+        The paths of the published files in the output folder, and what was added, changed or left unchanged.
+    '''
+    publication = Publication()
+    paths = []
+
+    with OutputLock(directory, timeout):
+        for path, name in files:
+            destination = os.path.join(directory, name)
+            paths.append(destination)
+            # e.g. into the folder of an output profile
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+            if isinstance(path, bytes):
+                size, digest = len(path), lambda: hashlib.sha256(path).hexdigest()
+            else:
+                size, digest = os.path.getsize(path), lambda: content_digest(path)
+
+            if not os.path.exists(destination):
+                publication.added.append(name)
+            elif os.path.getsize(destination) == size and content_digest(destination) == digest():
+                publication.unchanged.append(name)
+                continue
+            else:
+                publication.changed.append(name)
+
+            if isinstance(path, bytes):
+                _write(path, destination)
+            else:
+                _replace(path, destination)
+
+    return paths, publication
+
+def _replace(path: str, destination: str):
+    '''Replace the destination with the file in a single rename, copying it next to the destination first if needed.'''
+    try:
+        os.replace(path, destination)
+        return
+    except OSError:
+        # e.g. the file is on another file system
+        pass
+
+    fd, temp_file = create_temp_file(os.path.dirname(destination))
+    os.close(fd)
+    try:
+        shutil.copyfile(path, temp_file)
+        shutil.copymode(path, temp_file)
+        os.replace(temp_file, destination)
+    except Exception:
+        os.remove(temp_file)
+        raise
+
+def _write(content: bytes, destination: str):
+    '''Replace the destination with the content in a single rename.'''
+    fd, temp_file = create_temp_file(os.path.dirname(destination))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(temp_file, destination)
+    except Exception:
+        os.remove(temp_file)
+        raise
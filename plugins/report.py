@@ -0,0 +1,125 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import sys
+import json
+import time
+import platform
+import datetime
+import threading
+from contextlib import contextmanager
+from typing import List, Optional
+
+try:
+    # not available on Windows
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss(who: str = 'self') -> Optional[int]:
+    '''Get the peak resident set size in bytes of this process, or of its terminated child processes.
+
+    Returns None if the platform doesn't report it.
+    '''
+    if resource is None:
+        return None
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if who == 'children' else resource.RUSAGE_SELF)
+    # macOS reports bytes, everything else kilobytes
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+def children_cpu_time() -> float:
+    '''Get the CPU time used by the terminated child processes, e.g. of the plotting workers.'''
+    if resource is None:
+        return 0.0
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class RunReport:
+    '''Timing, memory and counts of a single production run.
+
+    Stages may be measured from several threads at once, CPU time is taken from the measuring
+    thread plus any child processes that terminated meanwhile, such as the plotting workers.
+    '''
+    def __init__(self):
+        self.started = datetime.datetime.now().isoformat(timespec='seconds')
+        self.stages: List[dict] = []
+        self.counts = {}
+        self.info = {}
+        self.error = None
+        self.__start_time = time.perf_counter()
+        self.__start_epoch = time.time()
+        self.__start_cpu = time.process_time()
+        self.__start_children_cpu = children_cpu_time()
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, name: str, **details):
+        '''Measure the enclosed block as a stage of the given name, details are added to its record.'''
+        start_time = time.perf_counter()
+        start_cpu = time.thread_time()
+        start_children_cpu = children_cpu_time()
+
+        try:
+            yield details
+        finally:
+            self.add_stage(name,
+                           start=start_time - self.__start_time,
+                           wall_seconds=time.perf_counter() - start_time,
+                           cpu_seconds=time.thread_time() - start_cpu + children_cpu_time() - start_children_cpu,
+                           **details)
+
+    def add_stage(self, name: str, start: float = None, wall_seconds: float = 0.0, cpu_seconds: float = 0.0,
+                  started_at: float = None, **details):
+        '''Record a stage that was measured elsewhere, e.g. in a worker process.
+
+        Args:
+            start: Start of the stage in seconds since the start of the run
+            started_at: Start of the stage as a timestamp, for stages measured by another process
+        '''
+        if start is None and started_at is not None:
+            start = started_at - self.__start_epoch
+
+        stage = {
+            'name': name,
+            'start': round(start, 4) if start is not None else None,
+            'wall_seconds': round(wall_seconds, 4),
+            'cpu_seconds': round(cpu_seconds, 4),
+            'peak_rss_bytes': details.pop('peak_rss_bytes', peak_rss()),
+        }
+        stage.update(details)
+
+        with self.__lock:
+            self.stages.append(stage)
+
+    def count(self, name: str, value: int):
+        '''Record a count, e.g. of footprints or BOM rows.'''
+        with self.__lock:
+            self.counts[name] = value
+
+    def as_dict(self) -> dict:
+        with self.__lock:
+            stages = sorted(self.stages, key=lambda stage: stage['start'] if stage['start'] is not None else 0.0)
+            return {
+                'started': self.started,
+                'status': 'failed' if self.error is not None else 'ok',
+                'error': self.error,
+                'wall_seconds': round(time.perf_counter() - self.__start_time, 4),
+                'cpu_seconds': round(time.process_time() - self.__start_cpu + children_cpu_time() - self.__start_children_cpu, 4),
+                'peak_rss_bytes': peak_rss(),
+                'children_peak_rss_bytes': peak_rss('children'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                **self.info,
+                'counts': dict(self.counts),
+                'stages': stages,
+            }
+
+    def write(self, filename: str):
+        '''Write the report as JSON.'''
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=4)
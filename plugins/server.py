@@ -0,0 +1,283 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import hmac
+import json
+import queue
+import secrets
+import logging
+import itertools
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+# Interaction with KiCad.
+import pcbnew  # type: ignore
+
+# Application definitions.
+from .batch import process_board
+from .jobs import DEFAULT_SERVER_HOST, DEFAULT_SERVER_PORT, SERVER_TOKEN_HEADER, server_token_file
+from .config import serverQueueSize, serverBoardCacheSize
+from .options import AUTO_FILL_OPT, STAGING_DIR_OPT
+
+
+class BoardCache:
+    '''Boards kept loaded, keyed by their path and reloaded as soon as the file changes.
+
+    Exports with the automatic zone fill refill the zones of the loaded board, so these get a board
+    of their own, and exports without it always plot the fills of the board file. Any other change
+    an export makes to the board is undone at its end. Only the worker of the export server uses
+    it, so it is not synchronized.
+    '''
+    def __init__(self, size: int = serverBoardCacheSize):
+        self.size = size
+        self.boards = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str, auto_fill: bool = False):
+        '''Get the board of a file, loaded from the file if it isn't loaded or has changed since.
+
+        Args:
+            auto_fill: Whether the export refills the zones of the board
+
+        Returns:
+            The board, and the version of the file it was loaded from, see `utils.get_file_version`
+        '''
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (path, bool(auto_fill))
+
+        entry = self.boards.get(key)
+        if entry is not None and entry[0] == version:
+            self.boards.move_to_end(key)
+            self.hits += 1
+            return entry[1], version
+
+        self.misses += 1
+        self.boards.pop(key, None)
+        board = pcbnew.LoadBoard(path)
+        self.boards[key] = (version, board)
+
+        # drop the least recently used boards
+        while len(self.boards) > self.size:
+            self.boards.popitem(last=False)
+
+        return board, version
+
+    def discard(self, path: str):
+        '''Drop the boards of a file, e.g. if a failed job may have left them modified.'''
+        for auto_fill in (False, True):
+            self.boards.pop((path, auto_fill), None)
+
+
+class ExportJob:
+    '''Export of one or more boards, its events are streamed to the client that submitted it.'''
+    _ids = itertools.count(1)
+
+    def __init__(self, paths: List[str], options: dict):
+        self.id = next(ExportJob._ids)
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.options = options
+        self.events = queue.Queue()
+
+    def emit(self, event: str, **data):
+        self.events.put(dict(event=event, job=self.id, **data))
+
+
+class ExportServer(ThreadingHTTPServer):
+    '''Local HTTP server that keeps pcbnew imported and boards loaded between export jobs.
+
+    Jobs are run one after the other by a single worker, as pcbnew is not thread safe, and wait
+    in a bounded queue meanwhile. Every request has to carry the access token of the server in the
+    `X-Fabrication-Toolkit-Token` header, and if a root is given, the boards and the staging
+    directory of a job have to be inside it. Requests:
+
+        POST /jobs      {"paths": [...], "options": {...}}, streams the events of the job as JSON lines
+        GET  /status    the queue, the running job and the loaded boards
+        POST /shutdown  stops the server
+    '''
+    daemon_threads = True
+
+    def __init__(self, host: str = DEFAULT_SERVER_HOST, port: int = DEFAULT_SERVER_PORT,
+                 queue_size: int = serverQueueSize, board_cache_size: int = serverBoardCacheSize,
+                 token: Optional[str] = None, root: Optional[str] = None):
+        ThreadingHTTPServer.__init__(self, (host, port), ExportRequestHandler)
+        self.token = token or secrets.token_urlsafe(32)
+        self.root = os.path.realpath(root) if root else None
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.boards = BoardCache(board_cache_size)
+        self.running = None
+        self.completed = 0
+        self.__worker = threading.Thread(target=self.__work, daemon=True)
+        self.__worker.start()
+
+    def authorized(self, token: Optional[str]) -> bool:
+        '''Whether a request carries the access token of the server.'''
+        return token is not None and hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    def write_token(self) -> str:
+        '''Write the access token to a file only the current user can read, for the client to pick it up.'''
+        filename = server_token_file(self.server_address[1])
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(self.token)
+        return filename
+
+    def submit(self, paths: List[str], options: dict) -> ExportJob:
+        '''Queue an export job.
+
+        Raises:
+            queue.Full: If the queue is full
+            PermissionError: If a board or the staging directory is outside the root of the server
+        '''
+        job = ExportJob(paths, options)
+        if self.root is not None:
+            for path in job.paths + ([options[STAGING_DIR_OPT]] if options.get(STAGING_DIR_OPT) else []):
+                path = os.path.realpath(path)
+                if os.path.commonpath([self.root, path]) != self.root:
+                    raise PermissionError("Outside of the root of the export server: " + path)
+
+        job.emit('queued', ahead=self.jobs.qsize() + (1 if self.running is not None else 0))
+        self.jobs.put_nowait(job)
+        return job
+
+    def status(self) -> dict:
+        running = self.running
+        return {
+            'queued': self.jobs.qsize(),
+            'running': {'job': running.id, 'paths': running.paths} if running is not None else None,
+            'completed': self.completed,
+            'boards': [{'path': path, 'auto_fill': auto_fill} for path, auto_fill in self.boards.boards],
+            'board_cache_hits': self.boards.hits,
+            'board_cache_misses': self.boards.misses,
+        }
+
+    def __work(self):
+        while True:
+            job = self.jobs.get()
+            self.running = job
+            try:
+                self.__run(job)
+            except Exception as e:
+                logging.exception("Fabrication Toolkit - Export job {} failed".format(job.id))
+                job.emit('done', results=[], error=str(e))
+            finally:
+                self.running = None
+                self.completed += 1
+
+    def __run(self, job: ExportJob):
+        results = []
+
+        for index, path in enumerate(job.paths):
+            job.emit('board', path=path, index=index, boards=len(job.paths))
+
+            try:
+                board, board_version = self.boards.load(path, job.options.get(AUTO_FILL_OPT, False))
+            except Exception as e:
+                result = {'path': path, 'status': 'failed', 'error': str(e), 'outputs': []}
+            else:
+                result = process_board(path, job.options, board=board, board_version=board_version,
+                                       onProgress=lambda percent: job.emit('progress', path=path, percent=percent))
+                if result['status'] != 'ok':
+                    self.boards.discard(path)
+
+            results.append(result)
+            job.emit('result', result=result)
+
+        job.emit('done', results=results)
+
+
+class ExportRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'FabricationToolkit'
+
+    def do_GET(self):
+        if not self.server.authorized(self.headers.get(SERVER_TOKEN_HEADER)):
+            self.__send_json(401, {'error': 'Missing or invalid access token'})
+        elif self.path == '/status':
+            self.__send_json(200, self.server.status())
+        else:
+            self.__send_json(404, {'error': 'Unknown request ' + self.path})
+
+    def do_POST(self):
+        if not self.server.authorized(self.headers.get(SERVER_TOKEN_HEADER)):
+            self.__send_json(401, {'error': 'Missing or invalid access token'})
+        elif self.path == '/shutdown':
+            self.__send_json(200, {'status': 'stopping'})
+            # shutdown waits for the serving loop, which waits for this request
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif self.path == '/jobs':
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                paths, options = list(request['paths']), dict(request.get('options', {}))
+            except (ValueError, KeyError, TypeError) as e:
+                self.__send_json(400, {'error': 'Invalid job: ' + str(e)})
+                return
+
+            try:
+                job = self.server.submit(paths, options)
+            except queue.Full:
+                self.__send_json(503, {'error': 'The job queue is full'})
+                return
+            except PermissionError as e:
+                self.__send_json(403, {'error': str(e)})
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+
+            while True:
+                event = job.events.get()
+                try:
+                    self.wfile.write((json.dumps(event) + '\n').encode('utf-8'))
+                    self.wfile.flush()
+                except OSError:
+                    # the client went away, the job runs to its end regardless
+                    return
+                if event['event'] == 'done':
+                    return
+        else:
+            self.__send_json(404, {'error': 'Unknown request ' + self.path})
+
+    def log_message(self, format, *args):
+        logging.info("Fabrication Toolkit - " + format % args)
+
+    def __send_json(self, code: int, data: dict):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+if __name__ == '__main__':
+    import argparse as ap
+
+    parser = ap.ArgumentParser(prog="Fabrication Toolkit Server",
+                               description="Keeps pcbnew and the boards loaded and runs the export jobs of `plugins.client`")
+
+    parser.add_argument("--host",               "-H",  type=str, default=DEFAULT_SERVER_HOST, help="Address the server listens on")
+    parser.add_argument("--port",               "-P",  type=int, default=DEFAULT_SERVER_PORT, help="Port the server listens on")
+    parser.add_argument("--queueSize",          "-q",  type=int, default=serverQueueSize, help="Number of jobs that may wait, further jobs are rejected", metavar="N")
+    parser.add_argument("--boards",             "-bC", type=int, default=serverBoardCacheSize, help="Number of boards kept loaded", metavar="N")
+    parser.add_argument("--token",              "-T",  type=str, default=os.environ.get('FABRICATION_TOOLKIT_TOKEN'), help="Access token the clients have to send, a random token by default", metavar="TOKEN")
+    parser.add_argument("--root",               "-R",  type=str, help="Only export boards inside this directory, and only stage files inside it", metavar="DIR")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    server = ExportServer(args.host, args.port, args.queueSize, args.boards, args.token, args.root)
+    token_file = server.write_token()
+    logging.info("Fabrication Toolkit - Export server listening on http://{}:{}, access token in {}".format(*server.server_address[:2], token_file))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(token_file)
@@ -1,47 +1,79 @@
 import os
-import wx
 import pcbnew  # type: ignore
 import shutil
+import json
+import hashlib
 import tempfile
-import webbrowser
 import datetime
 import logging
+from contextlib import contextmanager, nullcontext
 from threading import Thread
-from .events import StatusEvent
 from .process import ProcessManager
+from .pipeline import Pipeline, Stage
+from .fingerprint import BoardFingerprint
+from .cache import ArtifactCache
+from .backup import BackupStore
+from .report import RunReport
+from .profiling import StageProfiler
+from .publish import MemoryFiles, publish
+from .variants import parse_variants, variant_file_name
+from .profiles import get_profiles, profile_file_name
+from .archive import ArchiveFanOut
+from .verify import OutputVerifier
 from .config import *
 from .options import *
-from .utils import print_cli_progress_bar
+from .utils import print_cli_progress_bar, get_cache_directory, get_file_version
+
+# wx and webbrowser are only imported where the graphical mode needs them, so the CLI runs without them
 
 
 class ProcessThread(Thread):
-    def __init__(self, wx, options, cli = None, openBrowser = True, nonInteractive = False):
+    def __init__(self, wx, options, cli = None, openBrowser = True, nonInteractive = False, board = None, onProgress = None,
+                 board_version = None):
         Thread.__init__(self)
+        self.error = None
+        self.outputs = []
+        self.publication = None
+        self.profiles = []
+        self.verifier = None
 
         # prevent use of cli and graphical mode at the same time
         if (wx is None and cli is None) or (wx is not None and cli is not None):
-            logging.error("Specify either graphical or cli use!")
+            self.error = "Specify either graphical or cli use!"
+            logging.error(self.error)
             return
+
+        self.wx = wx
+        self.cli = cli
+        self.options = options
+        self.onProgress = onProgress
+        self.report = RunReport() if options.get(REPORT_OPT, False) else None
+        self.profiler = StageProfiler(options.get(PROFILE_TOP_OPT, profileTop), options.get(PROFILE_STACKS_OPT, False)) if options.get(PROFILE_OPT, False) else None
         
-        if cli is not None:
+        if board is not None:
+            # loaded by the caller already, e.g. kept loaded by the export server
+            self.board = board
+        elif cli is not None:
             try:
-                self.board = pcbnew.LoadBoard(cli)
+                with self.measure('load board'):
+                    # taken before loading, so a file saved meanwhile doesn't pass for the loaded one
+                    board_version = get_file_version(cli)
+                    self.board = pcbnew.LoadBoard(cli)
             except Exception as e:
+                self.error = str(e)
                 logging.error("Fabrication Toolkit - Error" + str(e))
                 return
         else:
             self.board = None
             
-        self.process_manager = ProcessManager(self.board)
-        self.wx = wx
-        self.cli = cli
-        self.options = options
+        self.process_manager = ProcessManager(self.board, self.report, board_version)
         self.openBrowser = openBrowser
         self.nonInteractive = nonInteractive
+        self.cache = ArtifactCache(get_cache_directory()) if options.get(CACHE_OPT, True) else None
         self.start()
 
     def expandTextVariables(self, string):
-        titleBlock = pcbnew.GetBoard().GetTitleBlock()
+        titleBlock = self.process_manager.board.GetTitleBlock()
         
         titleBlockVars = {
             "ISSUE_DATE": titleBlock.GetDate(),
@@ -68,131 +100,325 @@ class ProcessThread(Thread):
         # initializing
         self.progress(0)
 
-        temp_dir = tempfile.mkdtemp()
-        temp_dir_gerber = temp_dir + "_g"
+        # make output dir
+        project_directory = os.path.dirname(self.process_manager.board.GetFileName())
+        output_path = os.path.join(project_directory, outputFolder)
+        if not os.path.exists(output_path):
+            os.makedirs(output_path)
+
+        baseName = self.archiveBaseName()
+        archive_name = ProcessManager.normalize_filename("_".join((baseName.strip() + '.zip').split()))
+
+        # data tables and their final names
+        tables = [netlistFileName, designatorsFileName, placementFileName, bomFileName]
+        if self.options[ARCHIVE_NAME]:
+            table_names = [netlistFileName] + [ProcessManager.normalize_filename("_".join((baseName.strip() + suffix).split()))
+                                               for suffix in ('_designators.csv', '_positions.csv', '_bom.csv')]
+        else:
+            table_names = list(tables)
+
+        # stage the files pcbnew writes next to the output dir, so publishing them is a rename rather than a copy,
+        # unless a staging dir is given, e.g. on a tmpfs; the tables are written in memory
+        staging_dir = self.options.get(STAGING_DIR_OPT)
+        if staging_dir:
+            os.makedirs(staging_dir, exist_ok=True)
+            temp_dir = tempfile.mkdtemp(dir=staging_dir, prefix='fabrication-toolkit-')
+        else:
+            temp_dir = tempfile.mkdtemp(dir=output_path, prefix='.')
+        memory_files = MemoryFiles()
+        temp_dir_gerber = os.path.join(temp_dir, 'gerber')
         os.makedirs(temp_dir_gerber)
 
-        _, temp_file = tempfile.mkstemp()
-        project_directory = os.path.dirname(self.process_manager.board.GetFileName())
+        compression_level = self.options.get(COMPRESSION_LEVEL_OPT, archiveCompressionLevel)
+        archives = {}
+        # if asked for, every Gerber and drill file is verified on its way into the archives, V-cuts and alternative outlines may leave the outline open
+        if self.options.get(VERIFY_OPT, False):
+            self.verifier = OutputVerifier(self.options[EXTEND_EDGE_CUT_OPT] or self.options[ALTERNATIVE_EDGE_CUT_OPT],
+                                           strict=self.options.get(VERIFY_STRICT_OPT, False),
+                                           closure_tolerance=self.options.get(OUTLINE_TOLERANCE_OPT, outlineClosureTolerance))
 
         try:
-            # Verify all zones are up-to-date
-            self.progress(10)
-            if (self.options[AUTO_FILL_OPT]):
-                self.process_manager.update_zone_fills()
-
-            # generate gerber
-            self.progress(20)
-            self.process_manager.generate_gerber(temp_dir_gerber, self.options[EXTRA_LAYERS], self.options[EXTEND_EDGE_CUT_OPT],
-                                                 self.options[ALTERNATIVE_EDGE_CUT_OPT], self.options[ALL_ACTIVE_LAYERS_OPT])
-
-            # generate drill file
-            self.progress(30)
-            self.process_manager.generate_drills(temp_dir_gerber)
-
-            # generate netlist
-            self.progress(40)
-            self.process_manager.generate_netlist(temp_dir)
-
-            # generate data tables
-            self.progress(50)
-            self.process_manager.generate_tables(temp_dir, self.options[AUTO_TRANSLATE_OPT], self.options[EXCLUDE_DNP_OPT])
-
-            # generate pick and place file
-            self.progress(60)
-            self.process_manager.generate_positions(temp_dir)
-
-            # generate BOM file
-            self.progress(70)
-            self.process_manager.generate_bom(temp_dir)
-
-            # generate production archive
-            self.progress(85)
-            temp_file = self.process_manager.generate_archive(temp_dir_gerber, temp_file)
-            shutil.move(temp_file, temp_dir)
-            shutil.rmtree(temp_dir_gerber)
-            temp_file = os.path.join(temp_dir, os.path.basename(temp_file))
+            variants = parse_variants(self.options.get(VARIANTS_OPT))
+            profiles = self.profiles = get_profiles(self.options.get(OUTPUT_PROFILES_OPT), self.options.get(PROFILE_DEFINITIONS_OPT))
+
+            # every output profile gets an archive of its own
+            for profile in profiles:
+                os.makedirs(os.path.join(temp_dir, profile_file_name('', profile)), exist_ok=True)
+                archives[profile.name] = self.process_manager.create_archive(os.path.join(temp_dir, profile_file_name(archive_name, profile)), compression_level)
+
+            pipeline = Pipeline(self.stages(temp_dir, temp_dir_gerber, archives, memory_files, variants, profiles), progress=lambda done: self.progress(90 * done),
+                                report=self.report, profiler=self.profiler)
+            pipeline.run()
+
+            with self.measure('archive'):
+                outputs = [(archives[profile.name].close(), profile_file_name(archive_name, profile)) for profile in profiles]
+
+            if self.cache is not None:
+                with self.measure('cache eviction'):
+                    self.cache.evict()
+
+            # only outputs whose content changed replace the previous ones, so unchanged files keep their modification time
+            with self.measure('publish'):
+                netlist = os.path.join(temp_dir, netlistFileName)
+                for profile in profiles:
+                    for variant in [None] + [variant.name for variant in variants]:
+                        for table, table_name in zip(tables, table_names):
+                            if variant is not None and table == netlistFileName:
+                                continue
+                            table, table_name = variant_file_name(table, variant), profile_file_name(variant_file_name(table_name, variant), profile)
+
+                            # the netlist and designators are the same for every profile
+                            if profile_file_name(table, profile) in memory_files.files:
+                                outputs.append((memory_files.files[profile_file_name(table, profile)], table_name))
+                            elif table in memory_files.files:
+                                outputs.append((memory_files.files[table], table_name))
+                            elif table == netlistFileName and os.path.exists(netlist):
+                                # read while building the list, as publishing moves the netlist of the default profile
+                                outputs.append((netlist if profile.folder is None else _read_file(netlist), table_name))
+
+                published, self.publication = publish(outputs, output_path)
+
+            self.outputs = sorted(published)
+            logging.info("Fabrication Toolkit - Published to {}: {}".format(output_path, self.publication.summary()))
+            if self.wx is None:
+                print("{}Published to {}: {}".format('' if self.nonInteractive else '\n', output_path, self.publication.summary()))
+
+            # Make a backup as long as the BACKUP_OPT flag is set.
+            if self.options[BACKUP_OPT]:
+                with self.measure('backup'):
+                    backups = BackupStore(os.path.join(output_path, backupFolder))
+                    backups.backup(self.outputs, name=baseName.strip(), base=output_path, board=os.path.basename(self.process_manager.board.GetFileName()))
+                    backups.prune(self.options.get(BACKUP_KEEP_LAST_OPT, backupKeepLast), self.options.get(BACKUP_KEEP_DAYS_OPT, backupKeepDays))
         except Exception as e:
+            for archive in archives.values():
+                archive.abort()
+            self.error = str(e)
+            if self.report is not None:
+                self.report.error = self.error
             if self.wx is None:
                 logging.error("Fabrication Toolkit - Error" + str(e))
             else:
+                import wx
                 wx.MessageBox(str(e), "Fabrication Toolkit - Error", wx.OK | wx.ICON_ERROR)
             self.progress(-1)
             return
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            # the board may be kept loaded for further exports
+            self.process_manager.restore_design_settings()
+
+            if self.verifier is not None:
+                self.writeVerification(output_path, baseName)
+
+            if self.report is not None:
+                self.writeReport(output_path, baseName, next(iter(archives.values()), None))
+
+            if self.profiler is not None:
+                self.writeProfiles(output_path)
+
+        # open output dir
+        if self.openBrowser:
+            import webbrowser
+            webbrowser.open("file://%s" % (output_path))
+
+        if self.wx is None: 
+            self.progress(100)
+        else:
+            self.progress(-1)
+
+    @contextmanager
+    def measure(self, name):
+        '''Measure and profile the enclosed block as a stage, as far as a report and profiles are requested.'''
+        with self.report.measure(name) if self.report is not None else nullcontext():
+            with self.profiler.profile(name) if self.profiler is not None else nullcontext():
+                yield
+
+    def writeReport(self, output_path, baseName, archive):
+        '''Write the run report next to the outputs.'''
+        report = self.report
+        report.info['board'] = self.process_manager.board.GetFileName()
+        report.info['kicad'] = pcbnew.GetBuildVersion()
+        report.info['options'] = self.options
+        report.info['outputs'] = self.outputs
+        if self.publication is not None:
+            report.info['published'] = self.publication.as_dict()
+        if self.profiles:
+            report.info['profiles'] = {profile.name: profile.as_dict() for profile in self.profiles}
+
+        report.count('components', len(self.process_manager.placed))
+        report.count('bom_rows', len(self.process_manager.bom))
+        for name, tables in self.process_manager.variant_tables.items():
+            report.count('components_' + name, len(tables.placed))
+            report.count('bom_rows_' + name, len(tables.bom))
+        if archive is not None:
+            report.count('archive_files', len(archive.files))
+        if archive is not None and self.error is None:
+            report.count('archive_bytes', os.path.getsize(os.path.join(output_path, os.path.basename(archive.filename))))
+        if self.verifier is not None:
+            report.count('verified_files', len(self.verifier.files))
+            report.count('verification_anomalies', len(self.verifier.anomalies))
+            report.count('verification_warnings', len(self.verifier.warnings))
+        if self.cache is not None:
+            report.count('cache_hits', self.cache.hits)
+            report.count('cache_misses', self.cache.misses)
+
+        if self.options[ARCHIVE_NAME]:
+            report_name = ProcessManager.normalize_filename("_".join((baseName.strip() + '_report.json').split()))
+        else:
+            report_name = reportFileName
+
+        try:
+            report.write(os.path.join(output_path, report_name))
+            self.outputs.append(os.path.join(output_path, report_name))
+        except Exception as e:
+            logging.error("Fabrication Toolkit - Run report not written: " + str(e))
+
+    def writeVerification(self, output_path, baseName):
+        '''Write the statistics and anomalies of the verified Gerber and drill files next to the outputs.'''
+        if self.options[ARCHIVE_NAME]:
+            verification_name = ProcessManager.normalize_filename("_".join((baseName.strip() + '_verification.json').split()))
+        else:
+            verification_name = verificationFileName
+
+        try:
+            with open(os.path.join(output_path, verification_name), 'w', encoding='utf-8') as f:
+                json.dump(self.verifier.as_dict(), f, indent=4)
+            self.outputs.append(os.path.join(output_path, verification_name))
+        except Exception as e:
+            logging.error("Fabrication Toolkit - Verification not written: " + str(e))
+
+    def writeProfiles(self, output_path):
+        '''Write the profile of every stage next to the outputs, and print the hotspots of each stage.'''
+        try:
+            files = self.profiler.write(os.path.join(output_path, profileFolder))
+        except Exception as e:
+            logging.error("Fabrication Toolkit - Profiles not written: " + str(e))
+            return
+
+        if self.wx is None:
+            print("\n" + self.profiler.summary())
+            print("Profiles written to " + os.path.dirname(files[0]) if files else "No stages profiled")
+
+    def archiveBaseName(self):
+        '''Get the base name of the generated archives, from the archive name option or the title block.'''
+        if self.options[ARCHIVE_NAME]:
+            return self.expandTextVariables(self.options[ARCHIVE_NAME])
 
-        # progress bar done animation
-        read_so_far = 0
-        total_size = os.path.getsize(temp_file)
-        with open(temp_file, 'rb') as file:
-            while True:
-                data = file.read(10)
-                if not data:
-                    break
-                read_so_far += len(data)
-                percent = read_so_far * 1e2 / total_size
-                self.progress(85 + percent / 8)
-
-        # generate gerber name
         title_block = self.process_manager.board.GetTitleBlock()
         title = title_block.GetTitle()
         revision = title_block.GetRevision()
-        company = title_block.GetCompany()
-        file_date = title_block.GetDate()
 
         if (hasattr(self.process_manager.board, "GetProject") and hasattr(pcbnew, "ExpandTextVars")):
             project = self.process_manager.board.GetProject()
             title = pcbnew.ExpandTextVars(title, project)
             revision = pcbnew.ExpandTextVars(revision, project)
-            company = pcbnew.ExpandTextVars(company, project)
-            file_date = pcbnew.ExpandTextVars(file_date, project)
 
-        # make output dir
         filename = os.path.splitext(os.path.basename(self.process_manager.board.GetFileName()))[0]
-        output_path = os.path.join(project_directory, outputFolder)
-        if not os.path.exists(output_path):
-            os.makedirs(output_path)
-        
-        # rename gerber archive
-        if self.options[ARCHIVE_NAME]:
-            baseName = self.expandTextVariables(self.options[ARCHIVE_NAME])
-        else:
-            baseName = "{} {}".format(title or filename, revision or '')
+        return "{} {}".format(title or filename, revision or '')
 
-        gerberArchiveName = ProcessManager.normalize_filename("_".join((baseName.strip() + '.zip').split()))
-        os.rename(temp_file, os.path.join(temp_dir, gerberArchiveName))
+    def stages(self, temp_dir, temp_dir_gerber, archives, memory_files, variants = (), profiles = ()):
+        '''Build the stage graph of the production pipeline.
 
-        if self.options[ARCHIVE_NAME]:
-            if os.path.exists(os.path.join(temp_dir, designatorsFileName)):
-                os.rename(os.path.join(temp_dir, designatorsFileName), os.path.join(temp_dir, ProcessManager.normalize_filename("_".join((baseName.strip() + '_designators.csv').split()))))
-            if os.path.exists(os.path.join(temp_dir, placementFileName)):
-                os.rename(os.path.join(temp_dir, placementFileName), os.path.join(temp_dir, ProcessManager.normalize_filename("_".join((baseName.strip() + '_positions.csv').split()))))
-            if os.path.exists(os.path.join(temp_dir, bomFileName)):
-                os.rename(os.path.join(temp_dir, bomFileName), os.path.join(temp_dir, ProcessManager.normalize_filename("_".join((baseName.strip() + '_bom.csv').split()))))
-
-        # Make a backup as long as the BACKUP_OPT flag is set.
-        if not self.options[BACKUP_OPT]:
-            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H-%M-%S')
-            backup_name = ProcessManager.normalize_filename("_".join(("{} {}".format(baseName, timestamp).strip()).split()))
-            shutil.make_archive(os.path.join(output_path, 'backups', backup_name), 'zip', temp_dir)
-
-        # copy to & open output dir
-        try:
-            shutil.copytree(temp_dir, output_path, dirs_exist_ok=True)
-            if self.openBrowser:
-                webbrowser.open("file://%s" % (output_path))
-            shutil.rmtree(temp_dir)
-        except Exception as e:
-            if self.openBrowser:
-                webbrowser.open("file://%s" % (temp_dir))
+        The output profiles with the same Gerber format share their plotted layers, every other
+        Gerber format gets stages of its own, named after its first profile.
+        '''
+        process_manager = self.process_manager
+        options = self.options
+        jobs = options.get(PLOT_JOBS_OPT, 1)
+        stages = []
 
-        if self.wx is None: 
-            self.progress(100)
-        else:
-            self.progress(-1)
+        # verify all zones are up-to-date, everything derived from copper waits for it
+        after_fill = ()
+        if options[AUTO_FILL_OPT]:
+            stages.append(Stage('zone fill', lambda results: process_manager.update_zone_fills(), weight=3))
+            after_fill = ('zone fill',)
+
+        # the profiles of each gerber format, the format of the default profile comes first
+        plot_formats = {}
+        for profile in profiles:
+            all_active_layers = options[ALL_ACTIVE_LAYERS_OPT] if profile.all_active_layers is None else profile.all_active_layers
+            plot_formats.setdefault((profile.gerber_format, bool(all_active_layers)), []).append(profile)
+
+        # plan the gerber layers, and look up what can be restored from the cache
+        def plan_plot(results, gerber_format, all_active_layers):
+            layers = process_manager.get_gerber_layers(options[EXTRA_LAYERS], all_active_layers)
+            if self.cache is None:
+                return layers, None, None
+
+            fingerprint = BoardFingerprint(process_manager.board)
+            keys = process_manager.get_gerber_cache_keys(fingerprint, layers, options[EXTEND_EDGE_CUT_OPT], options[ALTERNATIVE_EDGE_CUT_OPT], gerber_format)
+            return layers, keys, fingerprint.drill_key()
+
+        plot_stages = []
+        for index, ((gerber_format, all_active_layers), plot_profiles) in enumerate(plot_formats.items()):
+            suffix = '' if index == 0 else ' ' + plot_profiles[0].name
+            plot_dir = temp_dir_gerber if index == 0 else os.path.join(temp_dir_gerber, plot_profiles[0].name)
+            os.makedirs(plot_dir, exist_ok=True)
+            plot_archive = ArchiveFanOut(archives[profile.name] for profile in plot_profiles)
+            if self.verifier is not None:
+                plot_archive = self.verifier.wrap(plot_archive, plot_profiles[0].folder)
+            plot_stages.append('gerber' + suffix)
+
+            stages.append(Stage('gerber layers' + suffix, requires=after_fill, weight=0,
+                                function=lambda results, gerber_format=gerber_format, all_active_layers=all_active_layers: plan_plot(results, gerber_format, all_active_layers)))
+
+            # generate gerber, worker processes don't touch the board of this process, so parallel plotting isn't exclusive
+            stages.append(Stage('gerber' + suffix, requires=('gerber layers' + suffix,), weight=4,
+                                exclusive=not process_manager.can_plot_in_parallel(jobs),
+                                function=lambda results, suffix=suffix, plot_dir=plot_dir, plot_archive=plot_archive, gerber_format=gerber_format:
+                                    process_manager.plot_gerber_layers(plot_dir, results['gerber layers' + suffix][0], options[EXTEND_EDGE_CUT_OPT],
+                                                                       options[ALTERNATIVE_EDGE_CUT_OPT], jobs, self.cache, results['gerber layers' + suffix][1],
+                                                                       plot_archive, gerber_format)))
+
+        # generate drill file, the drill files are the same for every profile
+        drill_archive = ArchiveFanOut(archives.values())
+        if self.verifier is not None:
+            drill_archive = self.verifier.wrap(drill_archive)
+        stages.append(Stage('drills', requires=('gerber layers',),
+                            function=lambda results: process_manager.generate_drills(temp_dir_gerber, self.cache, results['gerber layers'][2], drill_archive)))
+
+        # every file is verified as it enters the archives, what is left is the outline of each set of Gerber files
+        if self.verifier is not None:
+            folders = [plot_profiles[0].folder for plot_profiles in plot_formats.values()]
+            stages.append(Stage('verify', requires=tuple(plot_stages) + ('drills',), weight=0, exclusive=False,
+                                function=lambda results: self.verifier.verify_outputs(folders)))
+
+        # generate netlist
+        stages.append(Stage('netlist', requires=after_fill, function=lambda results: process_manager.generate_netlist(temp_dir)))
+
+        # the data computed for every footprint is recorded in the cache, so the next run only recomputes the changed footprints
+        records_file = None
+        if self.cache is not None and process_manager.board.GetFileName():
+            board_path = os.path.abspath(process_manager.board.GetFileName())
+            records_file = self.cache.record_path(hashlib.sha256(board_path.encode('utf-8')).hexdigest() + footprintRecordsFileSuffix)
+
+        # generate data tables, the tables don't depend on copper fills, the tables of all variants come from a single pass
+        stages.append(Stage('tables', weight=2,
+                            function=lambda results: process_manager.generate_tables(memory_files, options[AUTO_TRANSLATE_OPT], options[EXCLUDE_DNP_OPT], variants,
+                                                                                     records_file)))
+
+        # generate pick and place and BOM files of every profile, these only write the tables
+        names = [None] + [variant.name for variant in variants]
+        stages.append(Stage('positions', requires=('tables',), exclusive=False,
+                            function=lambda results: [process_manager.generate_positions(memory_files, name, profile) for profile in profiles for name in names]))
+        stages.append(Stage('bom', requires=('tables',), exclusive=False,
+                            function=lambda results: [process_manager.generate_bom(memory_files, name, profile) for profile in profiles for name in names]))
+
+        return stages
 
     def progress(self, percent):
+        if self.onProgress is not None:
+            self.onProgress(percent)
+
         if self.wx is None:
             if not self.nonInteractive:
                 print_cli_progress_bar(percent, prefix = 'Progress:', suffix = 'Complete', length = 50)
         else:
+            import wx
+            from .events import StatusEvent
             wx.PostEvent(self.wx, StatusEvent(percent))
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
@@ -0,0 +1,64 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import re
+from typing import Dict, Optional, Tuple
+
+
+class TransformationMatcher:
+    '''Matches footprints against the rules of the transformation database.
+
+    Every rule is compiled once and the outcome of a lookup is memoized per
+    `(footprint name, library nickname)`, since boards tend to repeat the same
+    few footprints many times.
+    '''
+    NO_TRANSFORMATION = (0.0, (0.0, 0.0))
+
+    def __init__(self, db: dict):
+        self.__rules = []
+        self.__cache: Dict[Tuple[str, Optional[str]], Tuple[float, Tuple[float, float]]] = {}
+
+        for entry in db.values():
+            # a rule that contains a : is matched against the full footprint name,
+            # otherwise only against the right side of the :
+            self.__rules.append((
+                re.compile(entry['name']),
+                ':' in entry['name'],
+                (float(entry['rotation']), (float(entry['x']), float(entry['y'])))
+            ))
+
+    def match(self, footprint: str, lib_nickname: str = None) -> Tuple[float, Tuple[float, float]]:
+        '''Get the `(rotation, (x, y))` transformation of the first matching rule.
+
+        Args:
+            footprint: The footprint name
+            lib_nickname: The library nickname, if available
+        '''
+        key = (footprint, lib_nickname)
+
+        try:
+            return self.__cache[key]
+        except KeyError:
+            transformation = self.__cache[key] = self.__match(footprint, lib_nickname)
+            return transformation
+
+    def __match(self, footprint: str, lib_nickname: str = None) -> Tuple[float, Tuple[float, float]]:
+        footprint_segments = footprint.split(':')
+        # only one segment means there was no :, just check the short name,
+        # otherwise check the right side of the :
+        short_name = footprint_segments[0] if len(footprint_segments) == 1 else footprint_segments[1]
+
+        # first try with the standard approach for backward compatibility
+        for pattern, literal, transformation in self.__rules:
+            if pattern.search(footprint if literal else short_name):
+                return transformation
+
+        # if no match found and we have a library nickname, try matching against that
+        if lib_nickname:
+            for pattern, _, transformation in self.__rules:
+                if pattern.search(lib_nickname):
+                    return transformation
+
+        # not found, no transformation
+        return self.NO_TRANSFORMATION
@@ -1,8 +1,8 @@
 import pcbnew  # type: ignore
 import os
 import json
-from .config import optionsFileName
-import wx
+import secrets
+from .config import optionsFileName, cacheFolder
 
 def get_version():
     return float('.'.join(pcbnew.GetBuildVersion().split(".")[0:2]))  # e.g GetBuildVersion(): e.g. '7.99.0-3969-gc5ac2337e4'
@@ -38,30 +38,97 @@ def footprint_to_degrees(footprint):
     else:
         footprint.SetOrientation(pcbnew.EDA_ANGLE(0, pcbnew.DEGREES_T))
                  
+def _footprint_has_field_v10(footprint, field_name):
+    return footprint.HasField(field_name)
+
+def _footprint_get_field_v10(footprint, field_name):
+    return footprint.GetField(field_name).GetText()
+
+def _footprint_has_field_v8(footprint, field_name):
+    return footprint.HasFieldByName(field_name)
+
+def _footprint_get_field_v8(footprint, field_name):
+    return footprint.GetFieldByName(field_name).GetText()
+
+def _footprint_has_field_v6(footprint, field_name):
+    return footprint.HasProperty(field_name)
+
+def _footprint_get_field_v6(footprint, field_name):
+    return footprint.GetProperty(field_name)
+
+def _footprint_get_fields_v8(footprint):
+    fields = {}
+    for field in footprint.GetFields():
+        # the first field of a given name wins, as with GetField / GetFieldByName
+        fields.setdefault(field.GetName(), field.GetText())
+    return fields
+
+def _footprint_get_fields_v6(footprint):
+    return dict(footprint.GetProperties())
+
+# the field accessors changed between KiCad versions, so resolve them once
+if is_v10():
+    _footprint_has_field = _footprint_has_field_v10
+    _footprint_get_field = _footprint_get_field_v10
+elif is_v8() or is_v9():
+    _footprint_has_field = _footprint_has_field_v8
+    _footprint_get_field = _footprint_get_field_v8
+else:
+    _footprint_has_field = _footprint_has_field_v6
+    _footprint_get_field = _footprint_get_field_v6
+
+# GetFields is the only way to list the fields from KiCad 8 on, v10 included
+if is_v10() or is_v8() or is_v9():
+    _footprint_get_fields = _footprint_get_fields_v8
+else:
+    _footprint_get_fields = _footprint_get_fields_v6
+
 def footprint_has_field(footprint, field_name):
-    version = get_version()
-    
-    if is_v10(version):
-        return footprint.HasField(field_name)
-    elif is_v8(version) or is_v9(version):
-        return footprint.HasFieldByName(field_name)
-    else:
-        return footprint.HasProperty(field_name)
+    return _footprint_has_field(footprint, field_name)
 
 def footprint_get_field(footprint, field_name):
-    version = get_version()
-    
-    if is_v10(version):
-        return footprint.GetField(field_name).GetText()
-    elif is_v8(version) or is_v9(version):
-        return footprint.GetFieldByName(field_name).GetText()
-    else:
-        return footprint.GetProperty(field_name)
+    return _footprint_get_field(footprint, field_name)
+
+def footprint_get_fields(footprint):
+    """Returns all fields of the given footprint as a `{name: text}` dictionary, read in a single pass.
+
+    The tables are generated from one such snapshot per footprint, which every field helper looks its fields up in.
+    """
+    return _footprint_get_fields(footprint)
+
+def create_temp_file(directory, prefix = '.', suffix = '.tmp'):
+    """Creates a new file with a unique name in the directory, with the permissions of any other new file.
+
+    Unlike `tempfile.mkstemp`, which creates the file private, the file is created with the mode
+    0o666 and the umask applies, so the umask never has to be read. Returns the open descriptor and the path.
+    """
+    while True:
+        path = os.path.join(directory, prefix + secrets.token_hex(8) + suffix)
+        try:
+            return os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666), path
+        except FileExistsError:
+            continue
+
+def get_file_version(path):
+    """Returns the modification time and size of a file, which change whenever it is saved, None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
 
 def get_user_options_file_path():
     boardFilePath = pcbnew.GetBoard().GetFileName()
     return os.path.join(os.path.dirname(boardFilePath), optionsFileName)
 
+def get_cache_directory():
+    """Returns the per-user directory the generated files are cached in."""
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, cacheFolder)
+
 def load_user_options(default_options):
     try:
         with open(get_user_options_file_path(), 'r') as f:
@@ -79,6 +146,7 @@ def save_user_options(options):
         with open(get_user_options_file_path(), 'w') as f:
             json.dump(options, f)
     except:
+        import wx
         wx.MessageBox("Error saving user options", "Error", wx.OK | wx.ICON_ERROR)
 
 def get_plot_plan(board, active_only=True):
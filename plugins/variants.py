@@ -0,0 +1,73 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import re
+import fnmatch
+from typing import Dict, List, Optional
+
+# `FIELD=PATTERN` or `FIELD!=PATTERN`
+RULE_PATTERN = re.compile(r'^\s*([^=!]+?)\s*(!?=)\s*(.*?)\s*$')
+
+
+class Variant:
+    '''An assembly variant, the footprints matching any of its rules are not fitted.
+
+    A rule `FIELD=PATTERN` matches the footprints whose field matches the glob pattern, a rule
+    `FIELD!=PATTERN` the footprints whose field doesn't. Field names and patterns are case
+    insensitive, a footprint without the field has it empty. Footprints that are DNP or excluded
+    from the position or BOM files are so in every variant.
+
+    Args:
+        name: Name of the variant, added to the names of its files
+        rules: The rules of the footprints that are not fitted
+    '''
+    def __init__(self, name: str, rules: List[str]):
+        name = name.strip()
+        if not name or re.search(r'[^\w\-]', name):
+            raise ValueError("Invalid variant name '{}', only letters, digits, '_' and '-' are allowed".format(name))
+
+        self.name = name
+        self.rules = []
+        for rule in rules:
+            match = RULE_PATTERN.match(rule)
+            if match is None:
+                raise ValueError("Invalid rule '{}' of variant '{}', expected FIELD=PATTERN or FIELD!=PATTERN".format(rule, name))
+            self.rules.append((match.group(1).lower(), match.group(2) == '!=', match.group(3).lower()))
+
+    def is_fitted(self, fields: Dict[str, str]) -> bool:
+        '''Whether a footprint is fitted, given its fields keyed by lower case name.'''
+        for field, negated, pattern in self.rules:
+            if fnmatch.fnmatchcase(fields.get(field, '').lower(), pattern) != negated:
+                return False
+        return True
+
+
+def parse_variants(option: Optional[Dict[str, List[str]]]) -> List[Variant]:
+    '''Get the variants of the variants option, `{name: [rule, ...]}`.'''
+    variants = [Variant(name, list(rules)) for name, rules in (option or {}).items()]
+
+    names = [variant.name.lower() for variant in variants]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate variant names: {}".format(", ".join(variant.name for variant in variants)))
+
+    return variants
+
+def parse_variant_argument(text: str):
+    '''Get the name and rules of a variant given as `NAME:RULE;RULE...` on the command line.'''
+    name, separator, rules = text.partition(':')
+    if not separator:
+        raise ValueError("Invalid variant '{}', expected NAME:RULE;RULE...".format(text))
+
+    rules = [rule.strip() for rule in rules.split(';') if rule.strip()]
+    # validate the variant while the command line is parsed
+    return Variant(name, rules).name, rules
+
+def variant_file_name(filename: str, variant: Optional[str]) -> str:
+    '''Get the name of a file of a variant, the file name itself if there is no variant.'''
+    if variant is None:
+        return filename
+
+    base, extension = os.path.splitext(filename)
+    return '{}_{}{}'.format(base, variant, extension)
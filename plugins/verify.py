@@ -0,0 +1,585 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import re
+import math
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+# Application definitions.
+from .config import verifyChunkSize, verifyMaxErrors, drillDiameterRange, outlineClosureTolerance
+
+# a word of a Gerber data block, e.g. `G01X1000Y-2000D01`, `D10` or `G36`
+GERBER_WORD = re.compile(rb'(?:G0*(\d+))?(?:X([+-]?\d+))?(?:Y([+-]?\d+))?(?:I[+-]?\d+)?(?:J[+-]?\d+)?(?:D0*(\d+))?')
+GERBER_FORMAT = re.compile(rb'FS[LT]?[AI]?X(\d)(\d)Y(\d)(\d)')
+GERBER_APERTURE = re.compile(rb'ADD(\d+)')
+# the file function is a `%TF.FileFunction,...*%` attribute, or a `G04 #@! TF.FileFunction,...*` comment in X1 files
+FILE_FUNCTION = re.compile(rb'TF\.FileFunction,([^*%\r\n]*)')
+
+EXCELLON_TOOL = re.compile(rb'T(\d+)(?:[FSB][\d.]+)*C([\d.]+)')
+EXCELLON_SELECT = re.compile(rb'T(\d+)$')
+EXCELLON_COORDINATES = re.compile(rb'(?:G\d+)?X([+-]?[\d.]+)?(?:Y([+-]?[\d.]+))?|(?:G\d+)?Y([+-]?[\d.]+)')
+
+DRILL_EXTENSIONS = ('.drl', '.xln', '.exc')
+# Protel extensions of the copper and outline layers, KiCad's inner layers are `.g1`, `.g2`, ...
+COPPER_EXTENSIONS = re.compile(r'^\.(?:gtl|gbl|g\d+)$')
+OUTLINE_EXTENSIONS = ('.gm1', '.gko')
+
+
+class GerberStats:
+    '''Statistics of a Gerber file, parsed incrementally as its data is fed in.
+
+    Only the state of the current block and a chunk of the file are kept, so the memory doesn't
+    grow with the file. The extents cover the coordinates of draws and flashes, not the size of
+    the apertures. Outlines are checked for closure by the ends of their segments, which cancel
+    out pairwise. The ends left over are connected if they are within the closure tolerance of
+    another segment, as KiCad chains outline ends with small gaps, or ends on a T-junction.
+
+    Errors make the file unusable, warnings are anomalies that may be intended, e.g. an empty copper layer.
+
+    Args:
+        copper: Whether the file is a copper layer, by its name, which is also told by its file function
+        outline: Whether the file is the board outline, by its name, which is also told by its file function
+        closure_tolerance: Gap in mm between the ends of outline segments that still closes the outline
+    '''
+    def __init__(self, copper: bool = False, outline: bool = False, closure_tolerance: float = outlineClosureTolerance):
+        self.file_function: Optional[str] = None
+        self.units: Optional[str] = None
+        self.decimals: Optional[int] = None
+        self.apertures = set()
+        self.flashes_by_aperture: Dict[int, int] = defaultdict(int)
+        self.draws = 0
+        self.arcs = 0
+        self.flashes = 0
+        self.regions = 0
+        self.extents: Optional[List[int]] = None
+        self.complete = False
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.copper = copper
+        self.outline = outline
+        self.closure_tolerance = closure_tolerance
+        self.open_ends = set()
+        self.segments = 0
+        self.outline_segments = []
+
+        self.__buffer = b''
+        self.__extended = False
+        self.__x = 0
+        self.__y = 0
+        self.__aperture = None
+        self.__interpolation = 1
+        self.__region = False
+
+    def feed(self, data: bytes):
+        '''Parse the next chunk of the file, blocks split across chunks are parsed with the next chunk.'''
+        buffer = self.__buffer + data
+        position = 0
+
+        # walk the chunk by position, slicing off every parsed command would copy the rest of the chunk each time
+        while position < len(buffer):
+            start = buffer.find(b'%', position)
+            if self.__extended:
+                # extended commands, e.g. `%FSLAX46Y46*%`, are enclosed in `%`
+                if start < 0:
+                    break
+                self.__extended_command(buffer[position:start])
+            else:
+                end = buffer.rfind(b'*', position, len(buffer) if start < 0 else start) + 1
+                if end > position:
+                    for word in buffer[position:end].split(b'*'):
+                        self.__word(word.strip())
+                if start < 0:
+                    position = max(end, position)
+                    break
+            position = start + 1
+            self.__extended = not self.__extended
+
+        self.__buffer = buffer[position:]
+
+    def close(self):
+        '''Complete the parsing once the whole file is fed in.'''
+        if self.__buffer.strip():
+            self.__error("unterminated data at the end of the file")
+        self.__buffer = b''
+
+        if not self.complete:
+            self.__error("truncated, the end of file M02 is missing")
+        if self.is_copper() and self.draws == 0 and self.flashes == 0 and self.regions == 0:
+            # e.g. the unused side of a single-sided board
+            self.__warning("empty copper layer")
+        if self.is_outline() and self.segments == 0:
+            self.__error("empty board outline")
+        if self.open_ends:
+            self.open_ends = self.__unconnected_ends()
+
+    def is_copper(self) -> bool:
+        return self.copper or (self.file_function or '').startswith('Copper')
+
+    def is_outline(self) -> bool:
+        return self.outline or (self.file_function or '').startswith('Profile')
+
+    def as_dict(self) -> dict:
+        scale = 10.0 ** -(self.decimals or 0) * (25.4 if self.units == 'IN' else 1.0)
+        stats = {
+            'type': 'gerber',
+            'file_function': self.file_function,
+            'units': self.units,
+            'extents_mm': [round(value * scale, 6) for value in self.extents] if self.extents is not None else None,
+            'apertures': len(self.apertures),
+            'draws': self.draws,
+            'arcs': self.arcs,
+            'flashes': self.flashes,
+            'flashes_by_aperture': {'D{}'.format(aperture): count for aperture, count in sorted(self.flashes_by_aperture.items())},
+            'regions': self.regions,
+            'errors': self.errors,
+            'warnings': self.warnings,
+        }
+        if self.is_outline():
+            stats['outline'] = {'segments': self.segments, 'open_ends': len(self.open_ends), 'closed': self.segments > 0 and not self.open_ends}
+        return stats
+
+    def __error(self, message: str):
+        if len(self.errors) < verifyMaxErrors:
+            self.errors.append(message)
+
+    def __warning(self, message: str):
+        if len(self.warnings) < verifyMaxErrors:
+            self.warnings.append(message)
+
+    def __unconnected_ends(self):
+        # an open end touches the segment it ends, it is connected if it touches another one as well
+        tolerance = self.closure_tolerance / (25.4 if self.units == 'IN' else 1.0) * 10.0 ** (self.decimals or 0)
+        return {end for end in self.open_ends
+                if sum(1 for segment in self.outline_segments if _segment_distance(end, segment) <= tolerance) < 2}
+
+    def __extended_command(self, command: bytes):
+        for word in command.split(b'*'):
+            word = word.strip()
+            if word.startswith(b'FS'):
+                match = GERBER_FORMAT.match(word)
+                if match is None:
+                    self.__error("unknown coordinate format " + word.decode('ascii', 'replace'))
+                else:
+                    self.decimals = int(match.group(2))
+            elif word.startswith(b'MO'):
+                self.units = word[2:].decode('ascii', 'replace')
+            elif word.startswith(b'AD'):
+                match = GERBER_APERTURE.match(word)
+                if match is not None:
+                    self.apertures.add(int(match.group(1)))
+            elif word.startswith(b'TF.FileFunction'):
+                self.__file_function(word)
+
+    def __file_function(self, word: bytes):
+        match = FILE_FUNCTION.search(word)
+        if match is not None:
+            self.file_function = match.group(1).decode('utf-8', 'replace')
+
+    def __word(self, word: bytes):
+        if not word:
+            return
+        if word.startswith(b'G04'):
+            # comments, which carry the attributes of X1 files
+            if b'TF.FileFunction' in word:
+                self.__file_function(word)
+            return
+        if word == b'M02':
+            self.complete = True
+            return
+
+        match = GERBER_WORD.fullmatch(word)
+        if match is None:
+            self.__error("unknown command " + word[:40].decode('ascii', 'replace'))
+            return
+
+        code, x, y, operation = match.groups()
+        if code is not None:
+            code = int(code)
+            if code in (1, 2, 3):
+                self.__interpolation = code
+            elif code == 36:
+                self.__region = True
+                self.regions += 1
+            elif code == 37:
+                self.__region = False
+
+        if operation is None:
+            if x is None and y is None:
+                return
+            # coordinates without an operation repeat the draw
+            operation = 1
+        else:
+            operation = int(operation)
+
+        if operation >= 10:
+            if operation not in self.apertures:
+                self.__error("aperture D{} is used but not defined".format(operation))
+            self.__aperture = operation
+            return
+
+        if self.units is None or self.decimals is None:
+            self.__error("coordinates before the unit and the coordinate format are declared")
+            self.units = self.units or '?'
+            self.decimals = self.decimals or 0
+
+        start_x, start_y = self.__x, self.__y
+        if x is not None:
+            self.__x = int(x)
+        if y is not None:
+            self.__y = int(y)
+
+        if operation == 1:
+            if not self.__region:
+                if self.__aperture is None:
+                    self.__error("draw without a selected aperture")
+                if self.__interpolation == 1:
+                    self.draws += 1
+                else:
+                    self.arcs += 1
+            self.__extend(start_x, start_y)
+            self.__extend(self.__x, self.__y)
+
+            if self.is_outline():
+                # the ends of connected segments cancel out, a full circle ends where it starts
+                self.segments += 1
+                self.open_ends ^= {(start_x, start_y)}
+                self.open_ends ^= {(self.__x, self.__y)}
+                # arcs are kept by their chord, which is enough to tell the ends they connect
+                self.outline_segments.append((start_x, start_y, self.__x, self.__y))
+        elif operation == 3:
+            if self.__aperture is None:
+                self.__error("flash without a selected aperture")
+            self.flashes += 1
+            self.flashes_by_aperture[self.__aperture] += 1
+            self.__extend(self.__x, self.__y)
+
+    def __extend(self, x: int, y: int):
+        extents = self.extents
+        if extents is None:
+            self.extents = [x, y, x, y]
+        else:
+            if x < extents[0]:
+                extents[0] = x
+            elif x > extents[2]:
+                extents[2] = x
+            if y < extents[1]:
+                extents[1] = y
+            elif y > extents[3]:
+                extents[3] = y
+
+
+class ExcellonStats:
+    '''Statistics of an Excellon drill file, parsed incrementally as its data is fed in.
+
+    Args:
+        expected_units: Unit the drill file is generated with, `METRIC` or `INCH`
+    '''
+    def __init__(self, expected_units: str = 'METRIC'):
+        self.expected_units = expected_units
+        self.file_function: Optional[str] = None
+        self.units: Optional[str] = None
+        self.tools: Dict[int, float] = {}
+        self.hits: Dict[int, int] = defaultdict(int)
+        self.slots: Dict[int, int] = defaultdict(int)
+        self.extents: Optional[List[float]] = None
+        self.complete = False
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+
+        self.__buffer = b''
+        self.__x = None
+        self.__y = None
+        self.__header = False
+        self.__tool = None
+        self.__routing = False
+
+    def feed(self, data: bytes):
+        '''Parse the next chunk of the file, lines split across chunks are parsed with the next chunk.'''
+        buffer = self.__buffer + data
+        end = buffer.rfind(b'\n') + 1
+
+        for line in buffer[:end].split(b'\n'):
+            self.__line(line.strip())
+
+        self.__buffer = buffer[end:]
+
+    def close(self):
+        '''Complete the parsing once the whole file is fed in.'''
+        self.__line(self.__buffer.strip())
+        self.__buffer = b''
+
+        if not self.complete:
+            self.__error("truncated, the end of program M30 is missing")
+        if self.units is None:
+            self.__error("drill unit not declared")
+        elif self.units != self.expected_units:
+            self.__error("drill unit {}, expected {}".format(self.units, self.expected_units))
+
+        scale = 25.4 if self.units == 'INCH' else 1.0
+        for tool, diameter in sorted(self.tools.items()):
+            if not drillDiameterRange[0] <= diameter * scale <= drillDiameterRange[1]:
+                # large mounting holes and cutouts are drilled too
+                self.__warning("tool T{} of {:g} mm is out of range, wrong drill unit?".format(tool, diameter * scale))
+
+    def as_dict(self) -> dict:
+        scale = 25.4 if self.units == 'INCH' else 1.0
+        return {
+            'type': 'excellon',
+            'file_function': self.file_function,
+            'units': self.units,
+            'extents_mm': [round(value * scale, 6) for value in self.extents] if self.extents is not None else None,
+            'tools_mm': {'T{}'.format(tool): round(diameter * scale, 6) for tool, diameter in sorted(self.tools.items())},
+            'hits': {'T{}'.format(tool): count for tool, count in sorted(self.hits.items())},
+            'slots': {'T{}'.format(tool): count for tool, count in sorted(self.slots.items())},
+            'errors': self.errors,
+            'warnings': self.warnings,
+        }
+
+    def __error(self, message: str):
+        if len(self.errors) < verifyMaxErrors:
+            self.errors.append(message)
+
+    def __warning(self, message: str):
+        if len(self.warnings) < verifyMaxErrors:
+            self.warnings.append(message)
+
+    def __line(self, line: bytes):
+        if not line:
+            return
+        if line.startswith(b';'):
+            # comments, which carry the attributes
+            match = FILE_FUNCTION.search(line)
+            if match is not None:
+                self.file_function = match.group(1).decode('utf-8', 'replace')
+            return
+
+        if line == b'M48':
+            self.__header = True
+        elif line in (b'%', b'M95'):
+            self.__header = False
+        elif line.startswith(b'METRIC') or line == b'M71':
+            self.units = 'METRIC'
+        elif line.startswith(b'INCH') or line == b'M72':
+            self.units = 'INCH'
+        elif line == b'M30':
+            self.complete = True
+        elif line == b'M15':
+            # a routed slot, plunged at the position of the preceding G00
+            self.slots[self.__tool] += 1
+        elif line == b'G05':
+            self.__routing = False
+        elif line.startswith(b'T'):
+            self.__tool_line(line)
+        elif not self.__header:
+            self.__coordinates(line)
+
+    def __tool_line(self, line: bytes):
+        match = EXCELLON_TOOL.match(line)
+        if match is not None:
+            self.tools[int(match.group(1))] = float(match.group(2))
+            return
+
+        match = EXCELLON_SELECT.match(line)
+        if match is not None:
+            tool = int(match.group(1))
+            self.__tool = tool if tool != 0 else None
+            if self.__tool is not None and self.__tool not in self.tools:
+                self.__error("tool T{} is used but not defined".format(tool))
+
+    def __coordinates(self, line: bytes):
+        if line.startswith(b'G00'):
+            self.__routing = True
+        if line.startswith(b'M16'):
+            return
+
+        match = EXCELLON_COORDINATES.match(line)
+        if match is None:
+            return
+
+        if self.__tool is None:
+            self.__error("hit without a selected tool")
+
+        if b'G85' in line:
+            self.slots[self.__tool] += 1
+        elif not self.__routing:
+            self.hits[self.__tool] += 1
+
+        # coordinates are modal, only the decimal coordinates KiCad writes tell their scale
+        x, y = match.group(1), match.group(2) or match.group(3)
+        if x is not None and b'.' in x:
+            self.__x = float(x)
+        if y is not None and b'.' in y:
+            self.__y = float(y)
+        if self.__x is None or self.__y is None:
+            return
+
+        extents = self.extents
+        if extents is None:
+            self.extents = [self.__x, self.__y, self.__x, self.__y]
+        else:
+            extents[0], extents[2] = min(extents[0], self.__x), max(extents[2], self.__x)
+            extents[1], extents[3] = min(extents[1], self.__y), max(extents[3], self.__y)
+
+
+def _segment_distance(point, segment) -> float:
+    '''Get the distance of a point from a segment given as (start x, start y, end x, end y).'''
+    x, y = point
+    x0, y0, x1, y1 = segment
+    dx, dy = x1 - x0, y1 - y0
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length))
+    return math.hypot(x - (x0 + t * dx), y - (y0 + t * dy))
+
+def is_drill_file(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in DRILL_EXTENSIONS
+
+def is_gerber_file(name: str) -> bool:
+    extension = os.path.splitext(name)[1].lower()
+    return extension.startswith('.g') and extension != '.gbrjob'
+
+def is_copper_file(name: str) -> bool:
+    '''Whether a Gerber file is a copper layer by its name, see `GerberStats.is_copper` for its content.'''
+    extension = os.path.splitext(name)[1].lower()
+    return COPPER_EXTENSIONS.match(extension) is not None or name.lower().endswith(('_cu.gbr', '-cu.gbr'))
+
+def is_outline_file(name: str) -> bool:
+    '''Whether a Gerber file is the board outline by its name, see `GerberStats.is_outline` for its content.'''
+    extension = os.path.splitext(name)[1].lower()
+    return extension in OUTLINE_EXTENSIONS or name.lower().endswith(('_cuts.gbr', '-cuts.gbr'))
+
+def verify_file(path: str, name: Optional[str] = None, expected_drill_units: str = 'METRIC',
+                closure_tolerance: float = outlineClosureTolerance):
+    '''Parse a Gerber or drill file in chunks.
+
+    Returns:
+        The statistics of the file, None if it is neither a Gerber nor a drill file.
+    '''
+    name = name or os.path.basename(path)
+    if is_drill_file(name):
+        stats = ExcellonStats(expected_drill_units)
+    elif is_gerber_file(name):
+        stats = GerberStats(copper=is_copper_file(name), outline=is_outline_file(name), closure_tolerance=closure_tolerance)
+    else:
+        return None
+
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(verifyChunkSize)
+            if not data:
+                break
+            stats.feed(data)
+    stats.close()
+
+    return stats
+
+
+class OutputVerifier:
+    '''Verifies the generated Gerber and drill files on their way into the archives.
+
+    Every file is parsed as it is added to an archive, before it is removed. Anomalies, such as a
+    missing or open board outline, a truncated file or a drill file in the wrong unit, are logged
+    and recorded with the statistics of all files for the JSON sidecar. Only in strict mode the
+    export fails as soon as a file shows an error, warnings never fail it.
+
+    Args:
+        allow_open_outline: Don't report an open outline, e.g. if V-cuts or an alternative outline layer are plotted into it
+        expected_drill_units: Unit the drill files are generated with
+        strict: Fail the export on errors
+        closure_tolerance: Gap in mm between the ends of outline segments that still closes the outline
+    '''
+    def __init__(self, allow_open_outline: bool = False, expected_drill_units: str = 'METRIC', strict: bool = False,
+                 closure_tolerance: float = outlineClosureTolerance):
+        self.allow_open_outline = allow_open_outline
+        self.expected_drill_units = expected_drill_units
+        self.strict = strict
+        self.closure_tolerance = closure_tolerance
+        self.files: Dict[str, dict] = {}
+        self.anomalies: List[str] = []
+        self.warnings: List[str] = []
+        self.__lock = threading.Lock()
+
+    def wrap(self, archive, folder: Optional[str] = None) -> "VerifyingArchive":
+        '''Get an archive that verifies every file added to it before it is added to the given archive.
+
+        Args:
+            folder: Folder of the output profile the files are recorded in, None for the output folder
+        '''
+        return VerifyingArchive(self, archive, folder)
+
+    def verify(self, path: str, folder: Optional[str] = None):
+        '''Verify a file.
+
+        Raises:
+            RuntimeError: If the file shows an error in strict mode
+        '''
+        name = os.path.basename(path)
+        stats = verify_file(path, name, self.expected_drill_units, self.closure_tolerance)
+        if stats is None:
+            return
+
+        errors = list(stats.errors)
+        if isinstance(stats, GerberStats) and stats.is_outline() and stats.open_ends and not self.allow_open_outline:
+            errors.append("board outline not closed, {} open ends".format(len(stats.open_ends)))
+
+        key = name if folder is None else '{}/{}'.format(folder, name)
+        with self.__lock:
+            self.files[key] = stats.as_dict()
+            self.anomalies += ['{}: {}'.format(key, error) for error in errors]
+            self.warnings += ['{}: {}'.format(key, warning) for warning in stats.warnings]
+
+        for warning in stats.warnings:
+            logging.warning("Fabrication Toolkit - Verification of {}: {}".format(key, warning))
+        self.__report("Verification of {} failed: {}".format(key, "; ".join(errors)), errors)
+
+    def verify_outputs(self, folders: Iterable[Optional[str]] = (None,)):
+        '''Verify the set of files of each output folder, once all files are verified.
+
+        Raises:
+            RuntimeError: If a folder has no board outline in strict mode
+        '''
+        errors = []
+        for folder in folders:
+            prefix = '' if folder is None else folder + '/'
+            files = {key: stats for key, stats in self.files.items() if key.startswith(prefix) and '/' not in key[len(prefix):]}
+            if not any('outline' in stats for stats in files.values()):
+                errors.append("{}no Edge_Cuts board outline".format(prefix))
+
+        with self.__lock:
+            self.anomalies += errors
+
+        self.__report("Verification failed: " + "; ".join(errors), errors)
+
+    def as_dict(self) -> dict:
+        with self.__lock:
+            return {'files': {key: self.files[key] for key in sorted(self.files)}, 'anomalies': list(self.anomalies),
+                    'warnings': list(self.warnings)}
+
+    def __report(self, message: str, errors: List[str]):
+        if not errors:
+            return
+        if self.strict:
+            raise RuntimeError(message)
+        logging.warning("Fabrication Toolkit - " + message)
+
+
+class VerifyingArchive:
+    '''Verifies every file added to it before it goes into the archive, see `OutputVerifier`.'''
+    def __init__(self, verifier: OutputVerifier, archive, folder: Optional[str] = None):
+        self.verifier = verifier
+        self.archive = archive
+        self.folder = folder
+
+    def add(self, path: str, name: Optional[str] = None, remove: bool = False, compress: bool = True):
+        '''Verify a file and add it to the archive, see `ArchiveWriter.add`.'''
+        self.verifier.verify(path, self.folder)
+        self.archive.add(path, name, remove=remove, compress=compress)
+
+    def add_files(self, paths: Iterable[str], remove: bool = False):
+        '''Verify several files and add them to the archive, see `add`.'''
+        for path in paths:
+            self.add(path, remove=remove)
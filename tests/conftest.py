@@ -0,0 +1,14 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import sys
+
+# the tests run against the pure-python stand-in of pcbnew the benchmarks use, so no KiCad installation is needed
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks', 'standin'))
+sys.path.insert(0, ROOT_DIR)
+
+# the plugin package registers itself with the editor when pcbnew is already loaded, so it goes first
+import plugins  # noqa: E402,F401
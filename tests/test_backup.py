@@ -0,0 +1,118 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import json
+import datetime
+
+# Application definitions.
+from plugins.backup import BackupStore, GARBAGE_GRACE_PERIOD, file_digest
+
+
+def write(path, content: bytes) -> str:
+    with open(path, 'wb') as f:
+        f.write(content)
+    return str(path)
+
+def backdate(store: BackupStore, run_id: str, created: datetime.datetime):
+    '''Set the creation time of a run, and the time its files were stored.'''
+    path = os.path.join(store.manifests, run_id + '.json')
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['created'] = created.isoformat(timespec='seconds')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+    for entry in manifest['files']:
+        stored = os.path.join(store.objects, entry['sha256'][:2], entry['sha256'])
+        os.utime(stored, (created.timestamp(), created.timestamp()))
+
+def stored_objects(store: BackupStore):
+    return sorted(digest for bucket in os.listdir(store.objects) for digest in os.listdir(os.path.join(store.objects, bucket)))
+
+
+def test_backup_and_restore(tmp_path):
+    store = BackupStore(str(tmp_path / 'backups'))
+    os.makedirs(tmp_path / 'output' / 'kicad')
+    files = [write(tmp_path / 'output' / 'bom.csv', b'bom'), write(tmp_path / 'output' / 'kicad' / 'bom.csv', b'bom')]
+
+    run_id = store.backup(files, name='board', base=str(tmp_path / 'output'), board='board')
+    run = store.get_run()
+    assert run['id'] == run_id
+    assert [entry['name'] for entry in run['files']] == ['bom.csv', 'kicad/bom.csv']
+    # identical files are stored once
+    assert stored_objects(store) == [file_digest(files[0])]
+
+    restored = store.restore(None, str(tmp_path / 'restored'))
+    assert [os.path.relpath(path, tmp_path / 'restored') for path in restored] == ['bom.csv', os.path.join('kicad', 'bom.csv')]
+
+def test_runs_of_the_same_second(tmp_path):
+    store = BackupStore(str(tmp_path / 'backups'))
+    path = write(tmp_path / 'bom.csv', b'bom')
+
+    run_ids = [store.backup([path]) for _ in range(3)]
+
+    assert len(set(run_ids)) == 3
+    assert [run['id'] for run in store.runs()] == run_ids
+
+def test_prune_keeps_the_latest_runs_of_each_board(tmp_path):
+    store = BackupStore(str(tmp_path / 'backups'))
+    now = datetime.datetime(2024, 6, 10, 12, 0, 0)
+
+    run_ids = {}
+    for board in ('a', 'b'):
+        for i in range(4):
+            path = write(tmp_path / 'bom.csv', '{}{}'.format(board, i).encode())
+            run_id = store.backup([path], board=board)
+            backdate(store, run_id, now - datetime.timedelta(days=30, hours=4 - i))
+            run_ids[(board, i)] = run_id
+
+    removed = store.prune(keep_last=2, keep_days=0, now=now)
+
+    assert sorted(removed) == sorted(run_ids[(board, i)] for board in ('a', 'b') for i in (0, 1))
+    assert sorted(run['id'] for run in store.runs()) == sorted(run_ids[(board, i)] for board in ('a', 'b') for i in (2, 3))
+    # the files of the removed runs are collected with them
+    assert len(stored_objects(store)) == 4
+
+def test_prune_keeps_the_latest_run_of_each_recent_day(tmp_path):
+    store = BackupStore(str(tmp_path / 'backups'))
+    now = datetime.datetime(2024, 6, 10, 12, 0, 0)
+
+    created = [
+        now - datetime.timedelta(days=10),                  # too old
+        now - datetime.timedelta(days=2, hours=3),          # earlier run of the same day
+        now - datetime.timedelta(days=2, hours=1),
+        now - datetime.timedelta(hours=2),
+        now - datetime.timedelta(hours=1),
+    ]
+    run_ids = []
+    for i, time in enumerate(created):
+        run_id = store.backup([write(tmp_path / 'bom.csv', str(i).encode())], board='a')
+        backdate(store, run_id, time)
+        run_ids.append(run_id)
+
+    removed = store.prune(keep_last=1, keep_days=3, now=now)
+
+    assert sorted(removed) == sorted([run_ids[0], run_ids[1], run_ids[3]])
+    assert [run['id'] for run in store.runs()] == [run_ids[2], run_ids[4]]
+
+def test_garbage_collection_spares_recent_files(tmp_path):
+    store = BackupStore(str(tmp_path / 'backups'))
+    old = store.backup([write(tmp_path / 'bom.csv', b'old')])
+    recent = store.backup([write(tmp_path / 'bom.csv', b'recent')])
+    kept = store.backup([write(tmp_path / 'bom.csv', b'kept')])
+    kept_digest = store.get_run(kept)['files'][0]['sha256']
+
+    # the runs are gone, only the file of the old one is past the grace period
+    old_digest = store.get_run(old)['files'][0]['sha256']
+    recent_digest = store.get_run(recent)['files'][0]['sha256']
+    backdate(store, old, datetime.datetime.now() - datetime.timedelta(seconds=2 * GARBAGE_GRACE_PERIOD))
+    backdate(store, kept, datetime.datetime.now() - datetime.timedelta(seconds=2 * GARBAGE_GRACE_PERIOD))
+    os.remove(os.path.join(store.manifests, old + '.json'))
+    os.remove(os.path.join(store.manifests, recent + '.json'))
+
+    store.collect_garbage()
+
+    assert stored_objects(store) == sorted([recent_digest, kept_digest])
+    assert old_digest not in stored_objects(store)
@@ -0,0 +1,74 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import random
+import pytest
+
+# Application definitions.
+from plugins import placement
+from plugins.placement import PlacementTable, rotate_point, rotate_box, bounding_box_center, normalize_angle, ki_round
+
+
+def make_table(count: int, seed: int = 1) -> PlacementTable:
+    rng = random.Random(seed)
+    rotations = [0.0, -0.0, 90.0, 180.0, -90.0, 270.0, 45.0, 12.5, -135.0, 359.9]
+
+    table = PlacementTable()
+    for _ in range(count):
+        offset = (rng.choice([0.0, -0.0, 0.25, -1.5]), rng.choice([0.0, -0.0, 0.1, 2.0]))
+        db_offset = (rng.choice([0.0, 0.3]), rng.choice([0.0, -0.2]))
+        table.append((rng.randint(-10 ** 9, 10 ** 9), rng.randint(-10 ** 9, 10 ** 9)), rng.choice(rotations), rng.random() < 0.3,
+                     offset, rng.choice([0.0, 90.0, -180.0]), db_offset, rng.choice([0.0, 180.0, -90.0]))
+    return table
+
+def compute_without_numpy(monkeypatch, table, *args):
+    # as if NumPy isn't installed
+    monkeypatch.setattr(placement, '_numpy', False)
+    return table.compute(*args)
+
+
+@pytest.mark.parametrize('auto_translate', [False, True])
+@pytest.mark.parametrize('mirror_bottom', [False, True])
+def test_numpy_and_fallback_parity(monkeypatch, auto_translate, mirror_bottom):
+    numpy = pytest.importorskip('numpy')
+    table = make_table(2000)
+    aux_origin = (1234567, -7654321)
+
+    vectorized = table.compute(aux_origin, auto_translate, mirror_bottom)
+    assert placement._numpy is numpy
+    fallback = compute_without_numpy(monkeypatch, table, aux_origin, auto_translate, mirror_bottom)
+
+    # exactly the same doubles, down to the sign of zero
+    for column, expected in zip(vectorized, fallback):
+        assert column.tobytes() == expected.tobytes()
+
+def test_empty_table(monkeypatch):
+    assert [len(column) for column in PlacementTable().compute((0, 0), True)] == [0, 0, 0]
+    assert [len(column) for column in compute_without_numpy(monkeypatch, PlacementTable(), (0, 0), True)] == [0, 0, 0]
+
+def test_placement(monkeypatch):
+    table = PlacementTable()
+    table.append((11000000, 5000000), 90.0, False, (1.0, 0.0), 0.0, (0.0, 0.0), 0.0)
+    table.append((11000000, 5000000), 90.0, True, (1.0, 0.0), 0.0, (0.0, 0.0), 0.0)
+
+    for x, y, rotation in (table.compute((1000000, 1000000), False), compute_without_numpy(monkeypatch, table, (1000000, 1000000), False)):
+        assert list(x) == pytest.approx([10.0, 10.0])
+        assert list(y) == pytest.approx([-3.0, -3.0])
+        assert list(rotation) == [90.0, 90.0]
+
+
+def test_rotate_point():
+    assert rotate_point(100, 0, 90) == (0, -100)
+    assert rotate_point(100, 0, -90) == (0, 100)
+    assert rotate_point(100, 50, 180) == (-100, -50)
+    assert rotate_point(100, 0, 45) == (ki_round(100 / 2 ** 0.5), -ki_round(100 / 2 ** 0.5))
+    assert normalize_angle(-90) == 270
+    assert normalize_angle(720) == 0
+
+def test_rotate_box_center():
+    box = (-100, -50, 300, 150)
+
+    assert bounding_box_center(rotate_box(box, 0)) == bounding_box_center(box) == (100, 50)
+    assert bounding_box_center(rotate_box(box, 90)) == (50, -100)
+    assert bounding_box_center(rotate_box(box, 180)) == (-100, -50)
@@ -0,0 +1,63 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import pytest
+
+# Application definitions.
+from plugins.profiles import OutputProfile, DEFAULT_PROFILE, POSITION_COLUMNS, get_profiles, profile_file_name
+
+
+def test_default_profile_comes_first():
+    profiles = get_profiles(None)
+
+    assert [profile.name for profile in profiles] == [DEFAULT_PROFILE]
+    assert profiles[0].folder is None
+    assert profiles[0].gerber_format == (True, False)
+    assert list(profiles[0].position_columns) == list(POSITION_COLUMNS)
+
+def test_builtin_profile():
+    profiles = get_profiles(['kicad', DEFAULT_PROFILE, 'kicad'])
+
+    assert [profile.name for profile in profiles] == [DEFAULT_PROFILE, 'kicad']
+    kicad = profiles[1]
+    assert kicad.folder == 'kicad'
+    assert kicad.gerber_format == (False, True)
+    assert not kicad.translations
+    assert kicad.position_columns['Designator'] == 'Ref'
+
+def test_defined_profile_inherits_its_base():
+    profiles = get_profiles(['fab'], {'fab': {'base': 'kicad', 'gerber_x2': False, 'bom_columns': {'Designator': 'Refs'}}})
+
+    fab = profiles[1]
+    assert fab.gerber_format == (False, False)
+    assert not fab.mirror_bottom_rotation
+    assert fab.bom_columns == {'Designator': 'Refs'}
+
+def test_defined_profile_defaults_to_the_default_profile():
+    fab = get_profiles(['fab'], {'fab': {'translations': False}})[1]
+
+    assert fab.gerber_format == (True, False)
+    assert not fab.translations
+
+def test_defined_profile_overrides_a_builtin_one():
+    kicad = get_profiles(['kicad'], {'kicad': {'base': 'kicad', 'gerber_x2': False}})[1]
+
+    assert kicad.gerber_format == (False, False)
+
+@pytest.mark.parametrize('names, definitions', [
+    (['missing'], {}),
+    (['a'], {'a': {'base': 'b'}, 'b': {'base': 'a'}}),
+    (['fab'], {'fab': {'unknown_setting': True}}),
+    (['fab'], {'fab': {'position_columns': {'Side': 'Layer'}}}),
+    (['bad name'], {'bad name': {}}),
+])
+def test_invalid_profiles(names, definitions):
+    with pytest.raises(ValueError):
+        get_profiles(names, definitions)
+
+def test_profile_file_name():
+    assert profile_file_name('bom.csv', None) == 'bom.csv'
+    assert profile_file_name('bom.csv', OutputProfile(DEFAULT_PROFILE)) == 'bom.csv'
+    assert profile_file_name('bom.csv', OutputProfile('kicad')) == os.path.join('kicad', 'bom.csv')
@@ -0,0 +1,83 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import os
+import zipfile
+
+# Application definitions.
+from plugins.publish import MemoryFiles, content_digest, publish, open_output
+from plugins.config import publishLockFileName
+
+
+def write(path, content: bytes) -> str:
+    with open(path, 'wb') as f:
+        f.write(content)
+    return str(path)
+
+def write_zip(path, files, date_time) -> str:
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, content in files:
+            archive.writestr(zipfile.ZipInfo(name, date_time), content)
+    return str(path)
+
+
+def test_publish_writes_only_changed_files(tmp_path):
+    output = tmp_path / 'output'
+    output.mkdir()
+
+    paths, publication = publish([(b'a', 'a.csv'), (b'b', 'kicad/b.csv')], str(output))
+    assert paths == [str(output / 'a.csv'), str(output / 'kicad' / 'b.csv')]
+    assert publication.added == ['a.csv', 'kicad/b.csv']
+    os.utime(paths[0], (1, 1))
+
+    _, publication = publish([(b'a', 'a.csv'), (b'c', 'kicad/b.csv')], str(output))
+    assert publication.as_dict() == {'added': [], 'changed': ['kicad/b.csv'], 'unchanged': ['a.csv']}
+    # unchanged files are left untouched
+    assert os.path.getmtime(paths[0]) == 1
+    assert (output / 'kicad' / 'b.csv').read_bytes() == b'c'
+    assert publication.summary() == "0 added, 1 changed, 1 unchanged"
+
+def test_publish_moves_staged_files(tmp_path):
+    output = tmp_path / 'output'
+    output.mkdir()
+    staged = write(tmp_path / 'board.gtl', b'G04*')
+
+    _, publication = publish([(staged, 'board.gtl')], str(output))
+    assert publication.added == ['board.gtl']
+    assert not os.path.exists(staged)
+    assert (output / 'board.gtl').read_bytes() == b'G04*'
+
+    staged = write(tmp_path / 'board.gtl', b'G04*')
+    _, publication = publish([(staged, 'board.gtl')], str(output))
+    assert publication.unchanged == ['board.gtl']
+    # files left unchanged stay staged, they are removed with the staging folder
+    assert os.path.exists(staged)
+
+def test_publish_leaves_no_temporary_files(tmp_path):
+    output = tmp_path / 'output'
+    output.mkdir()
+
+    publish([(b'a', 'a.csv')], str(output))
+    publish([(b'b', 'a.csv')], str(output))
+
+    assert sorted(os.listdir(output)) == sorted(['a.csv', publishLockFileName])
+
+def test_zip_digest_ignores_times_and_order(tmp_path):
+    first = write_zip(tmp_path / 'first.zip', [('a.gtl', b'a'), ('b.gbl', b'b')], (2020, 1, 1, 0, 0, 0))
+    second = write_zip(tmp_path / 'second.zip', [('b.gbl', b'b'), ('a.gtl', b'a')], (2024, 6, 1, 12, 0, 0))
+    third = write_zip(tmp_path / 'third.zip', [('a.gtl', b'a'), ('b.gbl', b'c')], (2020, 1, 1, 0, 0, 0))
+
+    assert content_digest(first) == content_digest(second)
+    assert content_digest(first) != content_digest(third)
+
+def test_memory_files(tmp_path):
+    files = MemoryFiles()
+    with open_output(files, 'bom.csv', newline='\r\n') as f:
+        f.write('a,b\n1,2\n')
+
+    assert files.files == {'bom.csv': '﻿a,b\r\n1,2\r\n'.encode('utf-8')}
+
+    with open_output(str(tmp_path), os.path.join('kicad', 'bom.csv'), newline='\r\n') as f:
+        f.write('a,b\n1,2\n')
+    assert (tmp_path / 'kicad' / 'bom.csv').read_bytes() == files.files['bom.csv']
@@ -0,0 +1,63 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import pytest
+
+# Application definitions.
+from plugins.variants import Variant, parse_variants, parse_variant_argument, variant_file_name
+
+
+@pytest.mark.parametrize('rule, fields, fitted', [
+    ('Value=10k', {'value': '10k'}, False),
+    ('Value=10k', {'value': '10K'}, False),
+    ('value=10*', {'value': '100n'}, False),
+    ('Value=10k', {'value': '4k7'}, True),
+    ('Value!=10k', {'value': '4k7'}, False),
+    ('Value!=10k', {'value': '10k'}, True),
+    ('Variant=', {}, False),
+    ('Variant!=', {}, True),
+    ('Variant!=', {'variant': 'lite'}, False),
+    (' Config = *lite* ', {'config': 'no_LITE_build'}, False),
+])
+def test_rule_matching(rule, fields, fitted):
+    assert Variant('lite', [rule]).is_fitted(fields) == fitted
+
+def test_any_rule_unfits():
+    variant = Variant('lite', ['Value=10k', 'Reference=J*'])
+
+    assert variant.is_fitted({'value': '4k7', 'reference': 'R1'})
+    assert not variant.is_fitted({'value': '10k', 'reference': 'R1'})
+    assert not variant.is_fitted({'value': '4k7', 'reference': 'J1'})
+
+def test_no_rules_fits_everything():
+    assert Variant('full', []).is_fitted({'value': '10k'})
+
+@pytest.mark.parametrize('name, rules', [
+    ('', []),
+    ('a b', []),
+    ('lite', ['Value']),
+    ('lite', ['=10k']),
+])
+def test_invalid_variants(name, rules):
+    with pytest.raises(ValueError):
+        Variant(name, rules)
+
+def test_parse_variants():
+    variants = parse_variants({'lite': ['Value=10k'], 'full': []})
+
+    assert [variant.name for variant in variants] == ['lite', 'full']
+    assert parse_variants(None) == []
+    with pytest.raises(ValueError):
+        parse_variants({'lite': [], 'Lite ': []})
+
+def test_parse_variant_argument():
+    assert parse_variant_argument('lite:Value=10k; Reference!=J* ;') == ('lite', ['Value=10k', 'Reference!=J*'])
+    with pytest.raises(ValueError):
+        parse_variant_argument('lite')
+    with pytest.raises(ValueError):
+        parse_variant_argument('lite:Value')
+
+def test_variant_file_name():
+    assert variant_file_name('positions.csv', None) == 'positions.csv'
+    assert variant_file_name('positions.csv', 'lite') == 'positions_lite.csv'
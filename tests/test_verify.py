@@ -0,0 +1,157 @@
+# For better annotation.
+from __future__ import annotations
+
+# System base libraries
+import pytest
+
+# Application definitions.
+from plugins.verify import GerberStats, ExcellonStats, OutputVerifier, is_copper_file, is_outline_file
+
+HEADER = b'%FSLAX46Y46*%\n%MOMM*%\n%ADD10C,0.100000*%\nD10*\n'
+SQUARE = b'X0Y0D02*\nX10000000Y0D01*\nX10000000Y10000000D01*\nX0Y10000000D01*\nX0Y0D01*\n'
+
+
+def parse_gerber(data: bytes, chunk_size: int = None, **kwargs) -> GerberStats:
+    stats = GerberStats(**kwargs)
+    chunk_size = chunk_size or len(data)
+    for i in range(0, len(data), chunk_size):
+        stats.feed(data[i:i + chunk_size])
+    stats.close()
+    return stats
+
+def parse_drill(data: bytes, **kwargs) -> ExcellonStats:
+    stats = ExcellonStats(**kwargs)
+    stats.feed(data)
+    stats.close()
+    return stats
+
+def square_outline(gap: int) -> bytes:
+    return 'X0Y0D02*\nX10000000Y0D01*\nX10000000Y10000000D01*\nX0Y10000000D01*\nX{}Y0D01*\n'.format(gap).encode()
+
+
+def test_gerber_statistics():
+    stats = parse_gerber(HEADER + b'%ADD11R,1.0X1.0*%\nD11*\nX1000000Y2000000D03*\nX3000000Y2000000D03*\n' + SQUARE + b'M02*\n')
+
+    assert stats.units == 'MM'
+    assert stats.decimals == 6
+    assert stats.flashes == 2
+    assert stats.flashes_by_aperture == {11: 2}
+    assert stats.draws == 4
+    assert stats.as_dict()['extents_mm'] == [0.0, 0.0, 10.0, 10.0]
+    assert stats.errors == [] and stats.warnings == []
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64])
+def test_gerber_blocks_split_across_chunks(chunk_size):
+    data = HEADER + b'%TF.FileFunction,Copper,L1,Top*%\n' + SQUARE + b'M02*\n'
+    whole, chunked = parse_gerber(data), parse_gerber(data, chunk_size)
+
+    assert chunked.as_dict() == whole.as_dict()
+    assert chunked.file_function == 'Copper,L1,Top'
+    assert chunked.is_copper()
+
+def test_gerber_truncated():
+    stats = parse_gerber(HEADER + SQUARE)
+
+    assert any('M02' in error for error in stats.errors)
+
+def test_empty_copper_layer_is_a_warning():
+    stats = parse_gerber(HEADER + b'M02*\n', copper=True)
+
+    assert stats.errors == []
+    assert stats.warnings == ["empty copper layer"]
+
+def test_empty_outline_is_an_error():
+    stats = parse_gerber(HEADER + b'M02*\n', outline=True)
+
+    assert "empty board outline" in stats.errors
+
+@pytest.mark.parametrize('gap, tolerance, closed', [
+    (0, 0.02, True),
+    (10000, 0.02, True),
+    (50000, 0.02, False),
+    (50000, 0.1, True),
+])
+def test_outline_closure_tolerance(gap, tolerance, closed):
+    stats = parse_gerber(HEADER + square_outline(gap) + b'M02*\n', outline=True, closure_tolerance=tolerance)
+
+    assert stats.as_dict()['outline']['closed'] == closed
+
+def test_outline_t_junction_is_closed():
+    # a slot from the middle of the bottom edge to the middle of the top edge
+    slot = b'X5000000Y0D02*\nX5000000Y10000000D01*\n'
+    stats = parse_gerber(HEADER + SQUARE + slot + b'M02*\n', outline=True)
+
+    assert not stats.open_ends
+
+def test_outline_dangling_segment_is_open():
+    stub = b'X5000000Y0D02*\nX5000000Y5000000D01*\n'
+    stats = parse_gerber(HEADER + SQUARE + stub + b'M02*\n', outline=True)
+
+    assert len(stats.open_ends) == 1
+
+def test_outline_by_file_name():
+    assert is_outline_file('board.gm1')
+    assert is_outline_file('board-Edge_Cuts.gbr')
+    assert is_copper_file('board.gtl')
+    assert is_copper_file('board.g2')
+    assert not is_copper_file('board.gto')
+
+
+def test_drill_statistics():
+    stats = parse_drill(b'M48\nMETRIC\nT1C0.300\nT2C1.000\n%\nG90\nG05\nT1\nX1.0Y2.0\nX3.0Y4.0\nT2\nX5.0Y1.0\nT0\nM30\n')
+
+    assert stats.units == 'METRIC'
+    assert stats.tools == {1: 0.3, 2: 1.0}
+    assert stats.hits == {1: 2, 2: 1}
+    assert stats.extents == [1.0, 1.0, 5.0, 4.0]
+    assert stats.errors == [] and stats.warnings == []
+
+def test_drill_slots():
+    stats = parse_drill(b'M48\nMETRIC\nT1C1.000\n%\nT1\nX1.0Y1.0G85X2.0Y1.0\nG00X3.0Y3.0\nM15\nG01X4.0Y3.0\nM16\nG05\nM30\n')
+
+    assert stats.slots == {1: 2}
+    assert stats.hits.get(1, 0) == 0
+
+def test_drill_unit_mismatch_is_an_error():
+    stats = parse_drill(b'M48\nINCH\nT1C0.012\n%\nT1\nX1.0Y1.0\nM30\n')
+
+    assert stats.errors == ["drill unit INCH, expected METRIC"]
+
+def test_drill_out_of_range_is_a_warning():
+    stats = parse_drill(b'M48\nMETRIC\nT1C12.000\n%\nT1\nX1.0Y1.0\nM30\n')
+
+    assert stats.errors == []
+    assert len(stats.warnings) == 1
+
+def test_drill_undefined_tool():
+    stats = parse_drill(b'M48\nMETRIC\nT1C0.300\n%\nT2\nX1.0Y1.0\nM30\n')
+
+    assert "tool T2 is used but not defined" in stats.errors
+
+
+def test_verifier_warns_unless_strict(tmp_path):
+    path = tmp_path / 'board.gm1'
+    path.write_bytes(HEADER + square_outline(50000) + b'M02*\n')
+
+    verifier = OutputVerifier()
+    verifier.verify(str(path))
+    assert verifier.anomalies == ["board.gm1: board outline not closed, 1 open ends"]
+
+    with pytest.raises(RuntimeError):
+        OutputVerifier(strict=True).verify(str(path))
+
+    verifier = OutputVerifier(allow_open_outline=True)
+    verifier.verify(str(path))
+    assert verifier.anomalies == []
+
+def test_verifier_missing_outline(tmp_path):
+    path = tmp_path / 'board.gtl'
+    path.write_bytes(HEADER + SQUARE + b'M02*\n')
+
+    verifier = OutputVerifier()
+    verifier.verify(str(path))
+    verifier.verify_outputs()
+
+    assert verifier.anomalies == ["no Edge_Cuts board outline"]
+    with pytest.raises(RuntimeError):
+        OutputVerifier(strict=True).verify_outputs()